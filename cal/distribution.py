@@ -1,13 +1,70 @@
-import random
+import os
+import mmap
 import bisect
 import math
+import heapq
+import functools
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import scipy.integrate as integrate
 from scipy.stats import norm, chi2
+from scipy.special import ndtr, ndtri
 from typing import Union
 
 
+def _get_rng(rng=None) -> np.random.Generator:
+    """将rng参数统一转换为numpy的Generator, rng可以为None、整数种子或Generator"""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+SAMPLE_CHUNK_SIZE = 2 ** 20 # 流式取样时每块的默认样本数
+INVERSE_CDF_TABLE_SIZE = 16385 # 反向累积分布函数查找表的节点数
+INVERSE_CDF_CACHE_SIZE = 256 # 最多缓存的查找表个数, 按LRU淘汰
+INVERSE_CDF_SEED_NODES = 4096 # 混合分布的inverse_cdf求初值时节点数的上限
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None # parallel_sample的共享文件所在目录, None时使用临时目录
+
+
+@functools.lru_cache(maxsize=INVERSE_CDF_CACHE_SIZE)
+def _inverse_cdf_table(kind: str, param=None, size=INVERSE_CDF_TABLE_SIZE) -> np.ndarray:
+    """
+    预先计算反向累积分布函数在等距概率节点 p_i = i / (size - 1) 上的值, 相同参数的分布共用一张表
+    p=0和p=1处的值可能为无穷, 用半个步长处的分位数代替
+    :param kind: 'norm'为标准正态分布(所有正态分布经平移缩放共用), 'chi2'为卡方分布
+    :param param: 卡方分布的自由度
+    """
+    p = np.linspace(0, 1, size)
+    p[0] = 0.5 / (size - 1)
+    p[-1] = 1 - 0.5 / (size - 1)
+    if kind == 'norm':
+        table = norm.ppf(p)
+    elif kind == 'chi2':
+        table = chi2.ppf(p, param)
+    else:
+        raise ValueError('Unsupported distribution type')
+    table.flags.writeable = False
+    return table
+
+
+def _sample_from_table(table: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """
+    在查找表中对均匀分布的样本u做线性插值, 节点等距, 直接计算下标而无需二分查找
+    插值是单调的且在节点处与精确分位数相等, 因此样本分布与精确分布的KS距离不超过 1 / (len(table) - 1)
+    """
+    position = u * (len(table) - 1)
+    index = np.minimum(position.astype(np.intp), len(table) - 2)
+    fraction = position - index
+    lower = table[index]
+    return lower + (table[index + 1] - lower) * fraction
+
+
 # 构建一个类，其他的类都继承于该类，包含以下属性：样本数
 class Distribution:
+    __slots__ = ('sample_num',) # 不创建实例__dict__, 减少大量小对象的内存占用
+
     def __init__(self, sample_num):
         self.sample_num = sample_num
 
@@ -44,13 +101,33 @@ class Distribution:
         """反向累积分布函数, 返回累积概率为p的x, 即cdf的逆函数"""
         pass
 
-    def sample(self, sample_num):
-        """从该分布中取样"""
+    def sample(self, num, rng=None):
+        """
+        从该分布中取样, 返回长度为num的列表, 与sample_array(num, rng).tolist()相同
+        所有分布(包括MixtureDistribution)的取样都使用numpy的随机数生成器, 不受random.seed影响, 需要复现结果时传入rng
+        :param rng: 随机数生成器, 可以为None、整数种子或np.random.Generator
+        """
+        return self.sample_array(num, rng).tolist()
+
+    def sample_array(self, num, rng=None):
+        """从该分布中批量取样, 返回numpy数组"""
         pass
 
+    def sample_chunks(self, num, chunk_size=SAMPLE_CHUNK_SIZE, rng=None, **kwargs):
+        """
+        流式取样, 依次产生每块至多chunk_size个样本的numpy数组, 共num个, 任意时刻只持有一块
+        各块依次从同一个随机数生成器中取样, 拼接后与sample_array(num, rng)使用相同种子的结果相同
+        :param kwargs: 传给sample_array的其他参数, 例如fast
+        """
+        rng = _get_rng(rng)
+        for start in range(0, num, chunk_size):
+            yield self.sample_array(min(chunk_size, num - start), rng, **kwargs)
+
 
 # 构建一个类，继承基类，代表离散型随机变量的正态分布，包含以下属性：均值、方差、样本数
 class SingleNormalDistribution(Distribution):
+    __slots__ = ('mean', 'variance')
+
     def __init__(self, mean, variance, sample_num):
         """
         :param mean: 均值
@@ -86,34 +163,41 @@ class SingleNormalDistribution(Distribution):
         else:
             sample_num = self.sample_num - other.sample_num
             mean = (self.mean * self.sample_num - other.mean * other.sample_num) / (sample_num)
-            variance = (self.variance * self.sample_num - other.variance * other.sample_num) / (sample_num) + (
+            variance = (self.variance * self.sample_num - other.variance * other.sample_num) / (sample_num) - (
                         self.mean - other.mean) ** 2 * self.sample_num * other.sample_num / (sample_num) ** 2
             return SingleNormalDistribution(mean, variance, sample_num)
         
     def pdf(self, x):
-        """概率密度函数"""
-        return 1 / (self.variance ** 0.5 * 2 * math.pi) * math.exp(-(x - self.mean) ** 2 / (2 * self.variance))
+        """概率密度函数, x可以为标量或numpy数组"""
+        x = np.asarray(x, dtype=float)
+        return np.exp(-(x - self.mean) ** 2 / (2 * self.variance)) / np.sqrt(2 * math.pi * self.variance)
     
     def cdf(self, x):
-        """累积分布函数"""
+        """累积分布函数, x可以为标量或numpy数组"""
         return norm.cdf(x, self.mean, self.variance ** 0.5)
     
     def inverse_cdf(self, p):
-        """反向累积分布函数"""
+        """反向累积分布函数, p可以为标量或numpy数组"""
         return norm.ppf(p, self.mean, self.variance ** 0.5)
 
-    def sample(self, num):
-        """从该正态分布中取样"""
-        samples = []
-        for i in range(num):
-            u = random.random()
-            x = self.inverse_cdf(u)
-            samples.append(x)
-        return samples
+    def sample_array(self, num, rng=None, fast=False):
+        """
+        从该正态分布中批量取样, 一次向量化调用生成全部样本
+        :param num: 样本数
+        :param rng: 随机数生成器, 可以为None、整数种子或np.random.Generator, 用于复现结果
+        :param fast: 为True时使用缓存的插值查找表代替inverse_cdf, 与精确分布的KS距离不超过1 / (INVERSE_CDF_TABLE_SIZE - 1)
+        :return: 长度为num的numpy数组
+        """
+        rng = _get_rng(rng)
+        if fast:
+            return self.mean + self.variance ** 0.5 * _sample_from_table(_inverse_cdf_table('norm'), rng.random(num))
+        return rng.normal(self.mean, self.variance ** 0.5, num)
 
 
 # 构建一个类，继承基类，代表卡方分布，包含以下属性：自由度、样本数
 class ChiSquareDistribution(Distribution):
+    __slots__ = ('dof',)
+
     def __init__(self, dof, sample_num):
         """
         :param dof: 自由度
@@ -130,6 +214,8 @@ class ChiSquareDistribution(Distribution):
 
     # 两个卡方分布相加
     def __add__(self, other):
+        if self.sample_num + other.sample_num == 0:
+            return ChiSquareDistribution(0, 0) # 两个空分布相加仍为空分布, 避免除以0
         # 自由度加权相加
         dof = self.sample_num / (self.sample_num + other.sample_num) * self.dof + other.sample_num / (self.sample_num + other.sample_num) * other.dof
         sample_num = self.sample_num + other.sample_num
@@ -140,42 +226,198 @@ class ChiSquareDistribution(Distribution):
         if other.sample_num > self.sample_num:
             raise Exception("sample_num should be less than self.sample_num") # 限制其他的样本数不能超过自己的样本数，否则抛出异常
         elif other.sample_num == self.sample_num:
-            return ChiSquareDistribution(lambda: 0, 0)
+            return ChiSquareDistribution(0, 0)
         else:
             dof = self.sample_num / (self.sample_num - other.sample_num) * self.dof - other.sample_num / (self.sample_num - other.sample_num) * other.dof
             sample_num = self.sample_num - other.sample_num
             return ChiSquareDistribution(dof, sample_num)
         
     def pdf(self, x):
-        """概率密度函数"""
+        """概率密度函数, x可以为标量或numpy数组"""
         return chi2.pdf(x, self.dof)
     
     def cdf(self, x):
-        """累积分布函数"""
+        """累积分布函数, x可以为标量或numpy数组"""
         return chi2.cdf(x, self.dof)
 
     def inverse_cdf(self, p):
-        """反向累积分布函数"""
+        """反向累积分布函数, p可以为标量或numpy数组"""
         return chi2.ppf(p, self.dof)
 
-
-    # 从该卡方分布中取样
-    def sample(self, num):
-        samples = []
-        for i in range(num):
-            u = random.random()
-            x = self.inverse_cdf(u)
-            samples.append(x)
+    def sample_array(self, num, rng=None, fast=False):
+        """
+        从该卡方分布中批量取样, 自由度为k的卡方分布等于2倍的形状参数为k/2的伽马分布, 自由度可以不是整数
+        自由度为0(例如空分布)时为0处的点分布, 样本全为0
+        :param num: 样本数
+        :param rng: 随机数生成器, 可以为None、整数种子或np.random.Generator, 用于复现结果
+        :param fast: 为True时使用按自由度缓存的插值查找表代替inverse_cdf, 与精确分布的KS距离不超过1 / (INVERSE_CDF_TABLE_SIZE - 1)
+        :return: 长度为num的numpy数组
+        """
+        rng = _get_rng(rng)
+        if fast and self.dof > 0:
+            return _sample_from_table(_inverse_cdf_table('chi2', self.dof), rng.random(num))
+        samples = rng.standard_gamma(self.dof / 2, num)
+        samples *= 2
         return samples
 
 
+# 构建一个类，单遍流式累积数据的样本数、均值和离差平方和，生成SingleNormalDistribution
+class NormalAccumulator:
+    def __init__(self, chunk_size=65536):
+        """
+        :param chunk_size: 从逐个产生原始值的迭代器中累积时, 每次缓存的值的个数
+        """
+        self.sample_num = 0 # 样本数
+        self.mean = 0.0 # 均值
+        self.m2 = 0.0 # 离差平方和, 方差为m2 / sample_num
+        self.chunk_size = chunk_size
+
+    def __str__(self):
+        return "mean: " + str(self.mean) + ", variance: " + str(self.variance) + ", sample_num: " + str(self.sample_num)
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def variance(self):
+        return self.m2 / self.sample_num if self.sample_num > 0 else 0.0
+
+    def update(self, chunk) -> 'NormalAccumulator':
+        """
+        累积一个数据块: 先对块内数据两遍法求均值和离差平方和, 再用Chan公式与已有统计量合并
+        :param chunk: numpy数组或可以转换为数组的序列
+        """
+        chunk = np.asarray(chunk, dtype=float).ravel()
+        num = chunk.size
+        if num == 0:
+            return self
+        chunk_mean = chunk.mean()
+        chunk_m2 = np.dot(chunk - chunk_mean, chunk - chunk_mean)
+        sample_num = self.sample_num + num
+        delta = chunk_mean - self.mean
+        self.mean += delta * num / sample_num
+        self.m2 += chunk_m2 + delta ** 2 * self.sample_num * num / sample_num
+        self.sample_num = sample_num
+        return self
+
+    def consume(self, chunks) -> 'NormalAccumulator':
+        """依次累积迭代器产生的每个数据块, 任意时刻只持有一个数据块"""
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def consume_values(self, values) -> 'NormalAccumulator':
+        """从逐个产生原始值的迭代器中累积, 每次取chunk_size个值组成数据块, 内存占用有界"""
+        iterator = iter(values)
+        while True:
+            chunk = np.fromiter(itertools.islice(iterator, self.chunk_size), dtype=float)
+            if chunk.size == 0:
+                return self
+            self.update(chunk)
+
+    def to_distribution(self) -> SingleNormalDistribution:
+        """返回累积结果, 方差为总体方差, 与SingleNormalDistribution的__add__/__sub__语义一致"""
+        return SingleNormalDistribution(float(self.mean), float(self.variance), self.sample_num)
+
+
+def _pairwise_merge(distributions: list[SingleNormalDistribution]) -> SingleNormalDistribution:
+    """
+    将正态分布列表两两合并(树形归约), 每次合并都使用__add__中的Chan合并公式
+    相比从左到右依次累加, 每个分布参与的合并次数为O(log n), 舍入误差更小
+    """
+    distributions = [dist for dist in distributions if dist.sample_num > 0] # 样本数为0的分布不影响结果
+    if not distributions:
+        return SingleNormalDistribution(0, 0, 0)
+    while len(distributions) > 1:
+        merged = [distributions[i] + distributions[i + 1] for i in range(0, len(distributions) - 1, 2)]
+        if len(distributions) % 2 == 1:
+            merged.append(distributions[-1])
+        distributions = merged
+    dist = distributions[0]
+    return SingleNormalDistribution(dist.mean, dist.variance, dist.sample_num)
+
+
+def _position_index(items: list) -> dict:
+    """建立列表中对象的位置索引, 格式为{id(item): [position, ...]}, 同一对象可能出现多次"""
+    index = {}
+    for position, item in enumerate(items):
+        index.setdefault(id(item), []).append(position)
+    return index
+
+
+def _swap_remove(items: list, index: dict, item) -> tuple[int, int]:
+    """
+    用列表末尾的元素覆盖item所在位置后删除末尾元素, 时间复杂度为O(1), 但不保留列表顺序
+    :return: (item原来的位置, 被移动的末尾元素原来的位置)
+    """
+    positions = index.get(id(item))
+    if not positions:
+        raise ValueError('distribution not in mixture distribution')
+    position = positions.pop()
+    if not positions:
+        del index[id(item)]
+    last = len(items) - 1
+    if position != last:
+        moved = items[last]
+        items[position] = moved
+        moved_positions = index[id(moved)]
+        moved_positions[moved_positions.index(last)] = position
+    items.pop()
+    return position, last
+
+
+def _merge_cost(a: SingleNormalDistribution, b: SingleNormalDistribution, total) -> float:
+    """
+    合并两个成分的代价(Runnalls的KL散度上界), 权重为样本数占总样本数的比例
+    方差为0时用极小值代替, 相同的点分布合并代价为0
+    """
+    merged = a + b
+    wa, wb = a.sample_num / total, b.sample_num / total
+    return 0.5 * ((wa + wb) * math.log(max(merged.variance, 1e-300))
+                  - wa * math.log(max(a.variance, 1e-300)) - wb * math.log(max(b.variance, 1e-300)))
+
+
+def _draw_mixture(rng: np.random.Generator, means, stds, probs, out: np.ndarray, grouped=False):
+    """
+    从混合分布中取len(out)个样本写入out: 先用多项分布抽出各成分的样本数, 再向量化生成样本
+    :param grouped: 为True时样本按成分顺序分组排列, 省去最后打乱顺序的开销
+    """
+    num = len(out)
+    counts = rng.multinomial(num, probs)
+    out[:] = np.repeat(means, counts) + np.repeat(stds, counts) * rng.standard_normal(num)
+    if not grouped:
+        rng.shuffle(out)
+
+
+def _parallel_sample_worker(path, num, start, count, means, stds, probs, seed_sequence):
+    """在子进程中取样, 把结果写入共享映射文件中数组的[start, start + count)区间"""
+    # 转换为ndarray, Generator.shuffle对np.memmap等子类会逐个元素交换, 非常慢
+    samples = np.memmap(path, dtype=float, mode='r+', shape=(num,)).view(np.ndarray)
+    _draw_mixture(np.random.default_rng(seed_sequence), means, stds, probs, samples[start:start + count])
+
+
 # 构建一个类，代表多个正态分布的混合分布，包含以下属性：正态分布列表
 class MixtureDistribution:
     def __init__(self, distribution_list: list[Union[SingleNormalDistribution, 'MixtureDistribution']]):
-        self.distribution_list = distribution_list
-        self.merge_dist = self.merge() 
-        self.components = self.traverse_distribution() # 从混合分布中取出所有的单正态分布
+        """
+        构造时只复制列表, merge_dist、components和取样用的数组在第一次访问时计算并缓存
+        被添加的混合分布在父分布计算缓存后不应再被修改, 否则需要调用父分布的invalidate
+        """
+        for dist in distribution_list:
+            if not isinstance(dist, (SingleNormalDistribution, MixtureDistribution)):
+                raise ValueError('Unsupported distribution type')
+        self.distribution_list = list(distribution_list) # 复制列表, 避免append/remove修改调用者的列表
         self.samples = 0
+        self.invalidate()
+
+    def invalidate(self):
+        """清除缓存的merge_dist、components和取样用的数组, 直接修改distribution_list或子混合分布后调用"""
+        self._merge_dist = None
+        self._components = None
+        self._means = self._stds = self._sample_nums = None
+        self._total_sample_num = None
+        self._distribution_index = None # 位置索引, 在第一次remove时建立
+        self._component_index = None
 
     def __str__(self):
         return "distribution_list: " + str([str(distribution) for distribution in self.distribution_list])
@@ -188,47 +430,432 @@ class MixtureDistribution:
         distribution_list = self.distribution_list + other.distribution_list
         return MixtureDistribution(distribution_list)
 
+    @property
+    def merge_dist(self) -> SingleNormalDistribution:
+        """混合分布内的正态分布合成的正态分布, 第一次访问时计算"""
+        if self._merge_dist is None:
+            self._merge_dist = self.merge()
+        return self._merge_dist
+
+    @merge_dist.setter
+    def merge_dist(self, value: SingleNormalDistribution):
+        self._merge_dist = value
+
+    @property
+    def components(self) -> list[SingleNormalDistribution]:
+        """底层的所有单正态分布, 第一次访问时展平并建立取样用的数组"""
+        self._ensure_components()
+        return self._components
+
+    def _ensure_components(self):
+        """components和取样用的数组未缓存时, 展平子分布并建立数组"""
+        if self._components is None:
+            self._components = self.traverse_distribution()
+            self._build_component_arrays()
+
     # 混合分布内的正态分布合成为一个正态分布，返回该正态分布
     def merge(self):
-
-        merge_dist = SingleNormalDistribution(0, 0, 0)
-
-        for dist in self.distribution_list:
-            if isinstance(dist, MixtureDistribution):
-                merge_dist += dist.merge()
+        # 子混合分布的merge_dist缓存后直接复用; 未缓存的先按后序非递归地计算, 嵌套很深时也不会超过递归深度限制
+        stack = [dist for dist in self.distribution_list if isinstance(dist, MixtureDistribution) and dist._merge_dist is None]
+        while stack:
+            mix = stack[-1]
+            pending = [dist for dist in mix.distribution_list if isinstance(dist, MixtureDistribution) and dist._merge_dist is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if mix._merge_dist is None:
+                mix._merge_dist = _pairwise_merge([dist.merge_dist if isinstance(dist, MixtureDistribution) else dist
+                                                   for dist in mix.distribution_list])
+        distributions = [dist.merge_dist if isinstance(dist, MixtureDistribution) else dist for dist in self.distribution_list]
+        return _pairwise_merge(distributions)
+
+    # 遍历分布,获取底层的所有正态分布, 用显式的栈代替递归
+    def traverse_distribution(self):
+        distributions = []
+        stack = [iter(self.distribution_list)]
+        while stack:
+            for dist in stack[-1]:
+                if isinstance(dist, SingleNormalDistribution):
+                    distributions.append(dist)
+                elif isinstance(dist, MixtureDistribution):
+                    if dist._components is not None:
+                        # 子混合分布已缓存components时直接复用
+                        distributions.extend(dist._components)
+                    else:
+                        # 先展开子混合分布, 之后继续遍历当前列表的剩余部分
+                        stack.append(iter(dist.distribution_list))
+                        break
+                else:
+                    # 错误条件:既不是正态分布也不是混合分布
+                    raise ValueError('Unsupported distribution type')
             else:
-                merge_dist += dist
+                stack.pop()
+        return distributions
 
-        return merge_dist
+    # 缓存所有成分的均值、标准差和样本数, 供向量化取样使用, 取样权重与样本数成正比
+    # 数组预留容量, 前len(self.components)个元素有效, 使append的均摊时间复杂度为O(1)
+    def _build_component_arrays(self):
+        size = len(self._components)
+        capacity = max(size, 8)
+        self._means = np.zeros(capacity)
+        self._stds = np.zeros(capacity)
+        self._sample_nums = np.zeros(capacity)
+        self._means[:size] = [dist.mean for dist in self._components]
+        self._stds[:size] = np.sqrt([dist.variance for dist in self._components])
+        self._sample_nums[:size] = [dist.sample_num for dist in self._components]
+        self._total_sample_num = self._sample_nums[:size].sum()
+
+    def _append_component(self, component: SingleNormalDistribution):
+        size = len(self._components)
+        if size == len(self._means):
+            # 容量不足时扩容为两倍
+            self._means = np.concatenate([self._means, np.zeros(size)])
+            self._stds = np.concatenate([self._stds, np.zeros(size)])
+            self._sample_nums = np.concatenate([self._sample_nums, np.zeros(size)])
+        self._means[size] = component.mean
+        self._stds[size] = component.variance ** 0.5
+        self._sample_nums[size] = component.sample_num
+        self._total_sample_num += component.sample_num
+        self._components.append(component)
+        if self._component_index is not None:
+            self._component_index.setdefault(id(component), []).append(size)
+
+    def _remove_component(self, component: SingleNormalDistribution):
+        if self._component_index is None:
+            self._component_index = _position_index(self._components)
+        position, last = _swap_remove(self._components, self._component_index, component)
+        self._means[position] = self._means[last]
+        self._stds[position] = self._stds[last]
+        self._sample_nums[position] = self._sample_nums[last]
+        self._total_sample_num -= component.sample_num
+
+    def append(self, dist: Union[SingleNormalDistribution, 'MixtureDistribution']):
+        """
+        向混合分布中添加一个正态分布或混合分布, 原地增量更新已缓存的merge_dist、components和取样权重, 未缓存的仍在访问时计算
+        添加正态分布的均摊时间复杂度为O(1), 添加混合分布为O(其成分数)
+        """
+        if not isinstance(dist, (SingleNormalDistribution, MixtureDistribution)):
+            raise ValueError('Unsupported distribution type')
+        self.distribution_list.append(dist)
+        if self._distribution_index is not None:
+            self._distribution_index.setdefault(id(dist), []).append(len(self.distribution_list) - 1)
+        if self._components is not None:
+            for component in (dist.components if isinstance(dist, MixtureDistribution) else [dist]):
+                self._append_component(component)
+        if self._merge_dist is not None:
+            merged = dist.merge_dist if isinstance(dist, MixtureDistribution) else dist
+            self._merge_dist = _pairwise_merge([self._merge_dist, merged])
+
+    def remove(self, dist: Union[SingleNormalDistribution, 'MixtureDistribution']):
+        """
+        从混合分布中移除一个之前添加的正态分布或混合分布(按对象身份查找), 用__sub__原地更新merge_dist
+        移除正态分布的时间复杂度为O(1), 移除后distribution_list和components不保留原有顺序
+        被添加的混合分布在移除前不应再被修改
+        """
+        if self._distribution_index is None:
+            self._distribution_index = _position_index(self.distribution_list)
+        _swap_remove(self.distribution_list, self._distribution_index, dist)
+        if self._components is not None:
+            for component in (dist.components if isinstance(dist, MixtureDistribution) else [dist]):
+                self._remove_component(component)
+        if self._merge_dist is not None:
+            merged = dist.merge_dist if isinstance(dist, MixtureDistribution) else dist
+            if merged.sample_num > 0:
+                self._merge_dist = self._merge_dist - merged
+                # 浮点误差可能使方差略小于0
+                self._merge_dist.variance = max(self._merge_dist.variance, 0)
+
+    def compact(self, max_components=None, tolerance=None) -> 'MixtureDistribution':
+        """
+        合并相似的成分, 返回成分数更少的新混合分布, 原分布不变
+        成分按均值排序, 每次用__add__合并均值相邻的成分中合并代价(见_merge_cost)最小的一对, 合并后成分仍保持有序
+        新分布的merge_dist与原分布相同; 样本数为0的成分不影响分布, 直接丢弃
+        :param max_components: 成分数的上限, 超过时继续合并
+        :param tolerance: 合并代价不超过tolerance时继续合并
+        """
+        if max_components is None and tolerance is None:
+            raise ValueError('max_components or tolerance should be given')
+        if max_components is not None and max_components < 1:
+            raise ValueError('max_components should be at least 1')
+        nodes = sorted((dist for dist in self.components if dist.sample_num > 0), key=lambda dist: dist.mean)
+        total = sum(dist.sample_num for dist in nodes)
+        size = len(nodes)
+        next_node = list(range(1, size + 1)) # 已合并的节点从链表中移除
+        prev_node = list(range(-1, size - 1))
+        versions = [0] * size # 节点被合并后版本号增加, 堆中旧的代价失效
+        heap = [(_merge_cost(nodes[i], nodes[i + 1], total), i, i + 1, 0, 0) for i in range(size - 1)]
+        heapq.heapify(heap)
+        count = size
+        while heap:
+            cost, i, j, version_i, version_j = heap[0]
+            if versions[i] != version_i or versions[j] != version_j or next_node[i] != j:
+                heapq.heappop(heap)
+                continue
+            if not ((max_components is not None and count > max_components) or (tolerance is not None and cost <= tolerance)):
+                break
+            heapq.heappop(heap)
+            nodes[i] = nodes[i] + nodes[j]
+            versions[i] += 1
+            versions[j] = -1
+            next_node[i] = next_node[j]
+            if next_node[j] < size:
+                prev_node[next_node[j]] = i
+            count -= 1
+            if prev_node[i] >= 0:
+                k = prev_node[i]
+                heapq.heappush(heap, (_merge_cost(nodes[k], nodes[i], total), k, i, versions[k], versions[i]))
+            if next_node[i] < size:
+                k = next_node[i]
+                heapq.heappush(heap, (_merge_cost(nodes[i], nodes[k], total), i, k, versions[i], versions[k]))
+        result = MixtureDistribution([nodes[i] for i in range(size) if versions[i] >= 0])
+        merge_dist = self.merge_dist
+        result.merge_dist = SingleNormalDistribution(merge_dist.mean, merge_dist.variance, merge_dist.sample_num)
+        return result
+
+    def _weighted_arrays(self):
+        """返回样本数为正的成分的均值、标准差和按样本数归一化的权重, 样本数为0的成分不影响分布"""
+        size = len(self.components)
+        sample_nums = self._sample_nums[:size]
+        keep = sample_nums > 0
+        return self._means[:size][keep], self._stds[:size][keep], sample_nums[keep] / sample_nums[keep].sum()
+
+    def _weighted_sum(self, kernel, point_kernel, x):
+        """
+        计算各成分的kernel((x - mean) / std, std)按样本数加权之和, x可以为标量或numpy数组
+        标准差为0的成分是位于均值处的点质量, 改用point_kernel(x - mean)
+        x分块与所有成分广播计算, 每块的中间数组不超过约2^20个元素
+        """
+        self._ensure_components()
+        if self._total_sample_num <= 0:
+            raise ValueError('empty mixture distribution')
+        x = np.asarray(x, dtype=float)
+        means, stds, weights = self._weighted_arrays()
+        point = stds == 0
+        point_means, point_weights = means[point], weights[point]
+        means, stds, weights = means[~point], stds[~point], weights[~point]
+        flat_x = x.ravel()
+        result = np.empty(flat_x.shape)
+        block = max(1, 2 ** 20 // (len(means) + len(point_means)))
+        for start in range(0, len(flat_x), block):
+            chunk = flat_x[start:start + block, None]
+            result[start:start + block] = kernel((chunk - means) / stds, stds) @ weights
+            if len(point_means):
+                result[start:start + block] += point_kernel(chunk - point_means) @ point_weights
+        return result.reshape(x.shape)[()]
 
+    def pdf(self, x):
+        """
+        概率密度函数, 为各成分概率密度按样本数加权之和, x可以为标量或numpy数组
+        标准差为0的成分在其均值处的概率密度为无穷, 其他位置为0
+        """
+        return self._weighted_sum(lambda z, stds: np.exp(-0.5 * z * z) / (math.sqrt(2 * math.pi) * stds),
+                                  lambda diff: np.where(diff == 0, np.inf, 0.0), x)
 
-    #递归遍历分布,获取底层的所有正态分布
-    def traverse_distribution(self):
-    
-        distributions = [] 
-
-        for dist in self.distribution_list:
-            if isinstance(dist, SingleNormalDistribution):
-                # 终止条件:如果是正态分布,添加到结果列表中
-                distributions.append(dist)
-            elif isinstance(dist, MixtureDistribution):
-                # 递归条件:如果是混合分布,遍历其每个成分分布
-                distributions.extend(dist.components)
-            
-            else:
-            # 错误条件:既不是正态分布也不是混合分布
-                raise ValueError('Unsupported distribution type')
-        
-        return distributions
+    def cdf(self, x):
+        """累积分布函数, 为各成分累积分布函数按样本数加权之和, x可以为标量或numpy数组"""
+        return self._weighted_sum(lambda z, stds: ndtr(z), lambda diff: (diff >= 0).astype(float), x)
+
+    def _cdf_and_pdf(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        同时计算一维数组x处的累积分布函数和概率密度, 与cdf/pdf相同地分块广播, 共用标准化后的z
+        标准差为0的成分只计入cdf的跳跃, 不计入概率密度(用于牛顿迭代, 跳跃处由区间二分收敛)
+        """
+        means, stds, weights = self._weighted_arrays()
+        point = stds == 0
+        point_means, point_weights = means[point], weights[point]
+        means, stds, weights = means[~point], stds[~point], weights[~point]
+        pdf_weights = weights / (math.sqrt(2 * math.pi) * stds)
+        cdf, pdf = np.empty(x.shape), np.empty(x.shape)
+        block = max(1, 2 ** 20 // (len(means) + len(point_means)))
+        for start in range(0, len(x), block):
+            chunk = x[start:start + block, None]
+            z = (chunk - means) / stds
+            cdf[start:start + block] = ndtr(z) @ weights
+            pdf[start:start + block] = np.exp(-0.5 * z * z) @ pdf_weights
+            if len(point_means):
+                cdf[start:start + block] += (chunk >= point_means) @ point_weights
+        return cdf, pdf
+
+    def _inverse_cdf_seeds(self, q: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        为inverse_cdf求初值和包含解的区间(lo, hi)
+        候选节点为各成分自身尺度的分位点(均值加减至多8个标准差), 排序后从中均匀选取节点计算cdf和pdf, 节点处的cdf确定区间,
+        区间内用三次Hermite插值的反函数作为初值; 超出节点范围的p以各成分p分位数的最小值和最大值为区间, 加权平均为初值
+        节点数不超过INVERSE_CDF_SEED_NODES, 也不超过p的个数(至少64), 因此求初值的计算量与成分数成线性关系
+        """
+        means, stds, weights = self._weighted_arrays()
+        size = len(means)
+        level_num = min(max(INVERSE_CDF_SEED_NODES // size, 9), 257)
+        candidates = np.unique((means[:, None] + stds[:, None] * np.linspace(-8, 8, level_num)).ravel())
+        node_num = min(len(candidates), INVERSE_CDF_SEED_NODES, max(len(q), 64))
+        nodes = candidates[np.linspace(0, len(candidates) - 1, node_num).round().astype(int)]
+        node_cdf, node_pdf = self._cdf_and_pdf(nodes)
+        node_cdf = np.maximum.accumulate(node_cdf) # 消除舍入误差造成的微小下降
+        index = np.searchsorted(node_cdf, q, side='right') - 1
+        inside = (index >= 0) & (index < len(nodes) - 1)
+        i = index[inside]
+        x0, x1 = nodes[i], nodes[i + 1]
+        f0, f1 = node_cdf[i], node_cdf[i + 1]
+        width = x1 - x0
+        d0, d1 = node_pdf[i] * width, node_pdf[i + 1] * width
+        # 区间内的Hermite插值写成t的三次多项式a + b * t + c * t^2 + d * t^3, t = (x - x0) / width
+        a = f0 - q[inside]
+        b = d0
+        c = 3 * (f1 - f0) - 2 * d0 - d1
+        d = 2 * (f0 - f1) + d0 + d1
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            t = np.clip(np.nan_to_num(-a / (f1 - f0)), 0, 1)
+            for _ in range(2):
+                slope = (3 * d * t + 2 * c) * t + b
+                t = np.clip(np.where(slope > 0, t - (((d * t + c) * t + b) * t + a) / slope, t), 0, 1)
+        lo, hi, x = np.empty(q.shape), np.empty(q.shape), np.empty(q.shape)
+        lo[inside], hi[inside], x[inside] = x0, x1, x0 + t * width
+        outside = ~inside
+        if outside.any():
+            quantiles = means + stds * ndtri(q[outside, None])
+            lo[outside], hi[outside] = quantiles.min(axis=1), quantiles.max(axis=1)
+            x[outside] = quantiles @ weights
+        return x, lo, hi
+
+    def inverse_cdf(self, p, tol=1e-12, max_iter=100):
+        """
+        反向累积分布函数, p可以为标量或numpy数组, 所有p同时向量化求解
+        由_inverse_cdf_seeds得到初值和区间后做牛顿迭代, 每步用cdf的符号收缩区间, 牛顿步越出区间或导数为0时改用二分
+        :param tol: 相邻两次迭代的相对变化不超过tol, 或cdf与p的差在舍入误差以内时停止
+        :param max_iter: 最大迭代次数
+        """
+        self._ensure_components()
+        if self._total_sample_num <= 0:
+            raise ValueError('empty mixture distribution')
+        p = np.asarray(p, dtype=float)
+        flat_p = p.ravel()
+        result = np.full(flat_p.shape, np.nan)
+        result[flat_p == 0] = -np.inf
+        result[flat_p == 1] = np.inf
+        active = np.nonzero((flat_p > 0) & (flat_p < 1))[0]
+        q = flat_p[active]
+        x, lo, hi = self._inverse_cdf_seeds(q)
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            for _ in range(max_iter):
+                if not len(active):
+                    break
+                cdf, pdf = self._cdf_and_pdf(x)
+                diff = cdf - q
+                below = diff < 0
+                lo = np.where(below, x, lo)
+                hi = np.where(below, hi, x)
+                newton = x - diff / pdf
+                inside = np.isfinite(newton) & (newton >= lo) & (newton <= hi)
+                scale = tol * (1 + np.abs(x))
+                converged = np.abs(newton - x) <= scale
+                # cdf的误差约为p的几个ulp, 尾部pdf很小时x无法再精确到tol, 此时cdf已与p相等即停止
+                exact = np.abs(diff) <= 4 * np.finfo(float).eps * q
+                collapsed = hi - lo <= scale
+                done = converged | collapsed | exact
+                # 收敛时牛顿步可能因舍入误差略微越出区间, 此时保留x; 区间收缩到tol以内时取cdf不小于p的右端,
+                # 在点质量处(cdf跳跃)得到准确的均值
+                step = np.where(inside, newton, 0.5 * (lo + hi))
+                x = np.where(converged | exact, np.where(inside, newton, x), np.where(collapsed, hi, step))
+                result[active[done]] = x[done]
+                keep = ~done
+                active, q, x, lo, hi = active[keep], q[keep], x[keep], lo[keep], hi[keep]
+            result[active] = x
+        return result.reshape(p.shape)[()]
+
+    def sample_chunks(self, num, chunk_size=SAMPLE_CHUNK_SIZE, rng=None):
+        """
+        流式取样, 依次产生每块至多chunk_size个样本的numpy数组, 共num个, 任意时刻只持有一块
+        sample_array需要对全部样本抽取多项分布并打乱顺序, 无法分块; 这里由rng派生(spawn)两个独立的随机数流,
+        分别逐个抽取样本所属的成分和标准正态分布的值, 因此使用相同种子时拼接的结果与chunk_size无关
+        (与sample_array的结果不同, 但服从相同的分布)
+        """
+        self._ensure_components()
+        if self._total_sample_num <= 0:
+            raise ValueError('cannot sample from an empty mixture distribution')
+        means, stds, probs = self._sampling_arrays()
+        cumulative = np.cumsum(probs)
+        choice_rng, normal_rng = _get_rng(rng).spawn(2)
+        for start in range(0, num, chunk_size):
+            size = min(chunk_size, num - start)
+            index = np.minimum(np.searchsorted(cumulative, choice_rng.random(size), side='right'), len(means) - 1)
+            yield means[index] + stds[index] * normal_rng.standard_normal(size)
 
     # 从混合分布中取样，从列表中的正态分布取样的概率与正态分布的样本数成正比
-    def sample(self, num):
-        distributions = self.traverse_distribution()
-        samples = []
-        total_sample_num = sum(dist.sample_num for dist in distributions)
-        for dist in distributions:
-            dist_sample_num = int(num * dist.sample_num / total_sample_num)
-            dist_samples = dist.sample(dist_sample_num)
-            samples += dist_samples
+    def sample(self, num, rng=None):
+        """返回长度为num的样本列表, 与sample_array(num, rng).tolist()相同, 随机数的来源见Distribution.sample"""
+        return self.sample_array(num, rng).tolist()
+
+    def sample_array(self, num, rng=None, grouped=False):
+        """
+        从混合分布中批量取样, 一次性抽出各成分的样本数(多项分布), 再向量化生成样本, 保证恰好返回num个样本
+        :param num: 样本数
+        :param rng: 随机数生成器, 可以为None、整数种子或np.random.Generator, 用于复现结果
+        :param grouped: 为True时样本按成分顺序分组排列, 省去最后打乱顺序的开销
+        :return: 长度为num的numpy数组
+        """
+        self._ensure_components()
+        if self._total_sample_num <= 0:
+            raise ValueError('cannot sample from an empty mixture distribution')
+        means, stds, probs = self._sampling_arrays()
+        samples = np.empty(num)
+        _draw_mixture(_get_rng(rng), means, stds, probs, samples, grouped)
+        return samples
+
+    def _sampling_arrays(self):
+        """返回取样所需的成分均值、标准差和取样概率数组"""
+        size = len(self.components)
+        sample_nums = self._sample_nums[:size]
+        return self._means[:size], self._stds[:size], sample_nums / sample_nums.sum()
+
+    def parallel_sample(self, num, seed=None, workers=None, chunk_size=2 ** 22) -> np.ndarray:
+        """
+        多进程并行取样, num个样本按chunk_size切分为若干块分给进程池
+        每块使用由同一个SeedSequence派生(spawn)的独立随机数流, 因此相同seed的结果可以复现, 且与进程数无关
+        各进程直接把样本写入共享映射的文件(在SHARED_MEMORY_DIR中, Linux下为内存中的/dev/shm), 不需要序列化传回大量结果;
+        返回的数组直接使用这块映射而不复制, 文件在返回前已删除, 映射在数组及其所有视图都被回收后释放
+        :param num: 样本数
+        :param seed: 整数种子或np.random.SeedSequence, 为None时使用系统熵
+        :param workers: 进程数, 为None时使用CPU核数
+        :param chunk_size: 每块的样本数
+        :return: 长度为num的numpy数组
+        """
+        self._ensure_components()
+        if self._total_sample_num <= 0:
+            raise ValueError('cannot sample from an empty mixture distribution')
+        means, stds, probs = self._sampling_arrays()
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        starts = range(0, num, chunk_size)
+        chunk_seeds = seed_sequence.spawn(len(starts))
+        size = max(num, 1) * 8
+        fd, path = tempfile.mkstemp(suffix='.samples', dir=SHARED_MEMORY_DIR)
+        try:
+            os.ftruncate(fd, size)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_parallel_sample_worker, path, num, start, min(chunk_size, num - start),
+                                           means, stds, probs, chunk_seed)
+                           for start, chunk_seed in zip(starts, chunk_seeds)]
+                for future in futures:
+                    future.result()
+            # 数组通过memoryview引用mmap对象, 映射的生命周期由引用计数管理, 不会在数组存活时被关闭
+            samples = np.frombuffer(mmap.mmap(fd, size), dtype=float, count=num)
+        finally:
+            os.close(fd)
+            os.unlink(path)
         return samples
-        
\ No newline at end of file
+
+
+def sample_to_npy(distribution, path, num, chunk_size=SAMPLE_CHUNK_SIZE, rng=None, **kwargs) -> np.memmap:
+    """
+    将distribution.sample_chunks产生的样本逐块写入内存映射的.npy文件, 内存占用与num无关
+    :param distribution: 任意实现了sample_chunks的分布
+    :param kwargs: 传给sample_chunks的其他参数
+    :return: 写入完成的内存映射数组
+    """
+    samples = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(num,))
+    start = 0
+    for chunk in distribution.sample_chunks(num, chunk_size, rng, **kwargs):
+        samples[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    samples.flush()
+    return samples
@@ -0,0 +1,261 @@
+import os
+import sys
+import random
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import functools
+from distribution import *
+from distribution_table import DistributionTable
+
+
+# 计时工具，返回函数执行的秒数
+def timeit(func, repeat=3):
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# 比较逐个取样(原sample的实现: 每个样本调用一次inverse_cdf)和批量取样(sample_array)的吞吐量
+def bench_sample_array(num=100000):
+    rng = np.random.default_rng(0)
+    for dist in [SingleNormalDistribution(10, 4, 100), ChiSquareDistribution(4, 10)]:
+        t_list = timeit(lambda: [dist.inverse_cdf(random.random()) for _ in range(num)], repeat=1)
+        t_array = timeit(lambda: dist.sample_array(num, rng))
+        t_fast = timeit(lambda: dist.sample_array(num, rng, fast=True))
+        print(f"{type(dist).__name__:<26} num={num:<9} "
+              f"loop: {num / t_list:>14,.0f}/s  sample_array: {num / t_array:>14,.0f}/s  "
+              f"fast: {num / t_fast:>14,.0f}/s  speedup: {t_list / t_array:,.1f}x / {t_list / t_fast:,.1f}x")
+
+
+# 比较混合分布的逐成分取样(旧实现)和向量化取样(打乱/分组)的吞吐量
+def bench_mixture_sample(num=1000000, component_num=1000):
+    rng = np.random.default_rng(0)
+    mix = MixtureDistribution([SingleNormalDistribution(m, 1, n) for m, n in
+                               zip(rng.normal(0, 10, component_num), rng.integers(1, 100, component_num))])
+
+    def per_component():
+        samples = []
+        for dist in mix.components:
+            samples.extend(dist.sample_array(int(num * dist.sample_num / mix._total_sample_num), rng))
+        return samples
+
+    t_loop = timeit(per_component)
+    t_shuffled = timeit(lambda: mix.sample_array(num, rng))
+    t_grouped = timeit(lambda: mix.sample_array(num, rng, grouped=True))
+    print(f"components={component_num} num={num}  per-component loop: {t_loop * 1000:.1f}ms  "
+          f"sample_array: {t_shuffled * 1000:.1f}ms  grouped: {t_grouped * 1000:.1f}ms")
+
+
+# 比较逐个__add__合并和DistributionTable整体合并的耗时
+def bench_distribution_table(row_num=50000, group_num=100):
+    rng = np.random.default_rng(0)
+    distributions = [SingleNormalDistribution(m, v, n) for m, v, n in
+                     zip(rng.normal(0, 10, row_num), rng.uniform(0.5, 5, row_num), rng.integers(1, 100, row_num).tolist())]
+    keys = rng.integers(0, group_num, row_num)
+    table = DistributionTable.from_distributions(distributions)
+
+    def group_by_add():
+        groups = {}
+        for key, dist in zip(keys.tolist(), distributions):
+            groups[key] = groups[key] + dist if key in groups else dist
+        return groups
+
+    t_fold = timeit(lambda: functools.reduce(lambda a, b: a + b, distributions))
+    t_reduce = timeit(table.reduce)
+    t_group_fold = timeit(group_by_add)
+    t_group_reduce = timeit(lambda: table.reduce_by(keys))
+    t_pairwise = timeit(lambda: table + table)
+    print(f"rows={row_num}  reduce: __add__ fold {t_fold * 1000:.1f}ms, table {t_reduce * 1000:.2f}ms  "
+          f"group_by({group_num}): __add__ {t_group_fold * 1000:.1f}ms, table {t_group_reduce * 1000:.2f}ms  "
+          f"pairwise table: {t_pairwise * 1000:.2f}ms")
+
+
+# 逐层嵌套构建混合分布: 构造时只复制列表, merge_dist和components在第一次访问时非递归地计算
+def bench_nested_merge(depths=(1000, 4000, 10000)):
+    for depth in depths:
+        mix = MixtureDistribution([SingleNormalDistribution(0, 1, 1)])
+        start = time.perf_counter()
+        for i in range(depth):
+            mix = MixtureDistribution([mix, SingleNormalDistribution(i, 1, 1)])
+        t_build = time.perf_counter() - start
+        start = time.perf_counter()
+        t_first_merge = time.perf_counter() - start
+        start = time.perf_counter()
+        mix.components
+        t_first_components = time.perf_counter() - start
+        t_merge = timeit(mix.merge)
+        print(f"depth={depth:<6} build: {t_build * 1000:.1f}ms  first merge_dist: {t_first_merge * 1000:.1f}ms  "
+              f"first components: {t_first_components * 1000:.1f}ms  top-level merge: {t_merge * 1e6:.1f}us")
+
+# 逐个添加成分构建混合分布: __add__每次重建(平方复杂度) vs append原地增量更新
+def bench_incremental_mixture(sizes=(500, 1000, 2000)):
+    for size in sizes:
+        distributions = [SingleNormalDistribution(i, 1, 1) for i in range(size)]
+
+        def rebuild():
+            mix = MixtureDistribution(distributions[:1])
+            for dist in distributions[1:]:
+                mix = mix + MixtureDistribution([dist])
+            return mix
+
+        def incremental():
+            mix = MixtureDistribution(distributions[:1])
+            for dist in distributions[1:]:
+                mix.append(dist)
+            for dist in distributions[1:]:
+                mix.remove(dist)
+            return mix
+
+        t_rebuild = timeit(rebuild, repeat=1)
+        t_incremental = timeit(incremental)
+        print(f"size={size:<6} __add__ rebuild: {t_rebuild * 1000:.1f}ms  "
+              f"append+remove: {t_incremental * 1000:.1f}ms ({t_incremental / size * 1e6:.1f}us per component)")
+
+
+# 在10^6个网格点上计算概率密度: Python循环逐点计算 vs 对数组一次性计算
+def bench_density_grid(point_num=1000000):
+    grid = np.linspace(-20, 40, point_num)
+    normal = SingleNormalDistribution(10, 4, 100)
+    mix = MixtureDistribution([SingleNormalDistribution(m, 1 + m % 3, 10 + m) for m in range(10)])
+    t_loop = timeit(lambda: [normal.pdf(x) for x in grid[:point_num // 100]], repeat=1) * 100
+    t_normal = timeit(lambda: normal.pdf(grid))
+    t_mix_pdf = timeit(lambda: mix.pdf(grid))
+    t_mix_cdf = timeit(lambda: mix.cdf(grid))
+    print(f"points={point_num}  normal pdf loop (extrapolated): {t_loop * 1000:.0f}ms  array: {t_normal * 1000:.1f}ms  "
+          f"mixture({len(mix.components)} components) pdf: {t_mix_pdf * 1000:.1f}ms  cdf: {t_mix_cdf * 1000:.1f}ms")
+
+
+# 多进程并行取样随进程数的扩展性
+def bench_parallel_sample(num=10 ** 8, worker_counts=(1, 2, 4, 8)):
+    mix = MixtureDistribution([SingleNormalDistribution(m, 1 + m % 3, 10 + m) for m in range(100)])
+    t_single = timeit(lambda: mix.sample_array(num, 0), repeat=1)
+    print(f"num={num}  sample_array (1 process): {t_single:.2f}s")
+    for workers in worker_counts:
+        t = timeit(lambda: mix.parallel_sample(num, seed=0, workers=workers), repeat=1)
+        print(f"workers={workers:<3} parallel_sample: {t:.2f}s  speedup: {t_single / t:.2f}x")
+
+
+# 带__dict__的子类, 用于对比使用__slots__之前的内存布局
+class DictNormalDistribution(SingleNormalDistribution):
+    pass
+
+
+# 比较使用__slots__前后每个实例占用的字节数和__add__的吞吐量
+def bench_slots_memory(instance_num=100000):
+    for cls in [DictNormalDistribution, SingleNormalDistribution]:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        instances = [cls(float(i), 1.0, i + 1) for i in range(instance_num)]
+        size = (tracemalloc.get_traced_memory()[0] - before) / instance_num
+        tracemalloc.stop()
+        pairs = list(zip(instances[:-1], instances[1:]))
+        t_add = timeit(lambda: [a + b for a, b in pairs])
+        print(f"{cls.__name__:<26} bytes per instance (incl. list slot): {size:.0f}  "
+              f"__add__: {len(pairs) / t_add:,.0f}/s")
+
+
+# 压缩混合分布的成分数: 取样和概率密度的耗时 vs 与原分布的KS距离
+def bench_compact(component_num=5000, num=1000000, grid_num=10000):
+    rng = np.random.default_rng(0)
+    # 多次__add__得到的成分大多集中在少数几个簇中
+    centers = rng.normal(0, 20, 10)
+    mix = MixtureDistribution([])
+    for m, v, n in zip(centers[rng.integers(0, 10, component_num)] + rng.normal(0, 0.5, component_num),
+                       rng.uniform(0.8, 1.2, component_num), rng.integers(1, 100, component_num).tolist()):
+        mix = mix + MixtureDistribution([SingleNormalDistribution(m, v, n)])
+    x = np.linspace(-80, 80, grid_num)
+    exact_cdf = mix.cdf(x)
+    t_sample = timeit(lambda: mix.sample_array(num, rng))
+    t_pdf = timeit(lambda: mix.pdf(x))
+    print(f"original    components={len(mix.components):<6} sample: {t_sample * 1000:.1f}ms  pdf: {t_pdf * 1000:.1f}ms")
+    for kwargs in ({'tolerance': 1e-5}, {'tolerance': 1e-3}, {'max_components': 100}, {'max_components': 20}):
+        t_compact = timeit(lambda: mix.compact(**kwargs), repeat=1)
+        compacted = mix.compact(**kwargs)
+        t_sample = timeit(lambda: compacted.sample_array(num, rng))
+        t_pdf = timeit(lambda: compacted.pdf(x))
+        ks = np.abs(compacted.cdf(x) - exact_cdf).max()
+        print(f"{str(kwargs):<26} components={len(compacted.components):<6} compact: {t_compact * 1000:.1f}ms  "
+              f"sample: {t_sample * 1000:.1f}ms  pdf: {t_pdf * 1000:.1f}ms  KS distance: {ks:.2e}")
+
+
+# 混合分布的分位数: 向量化求解inverse_cdf vs 取样后估计的分位数
+def bench_inverse_cdf(quantile_num=100000, component_nums=(2, 10, 100), sample_num=10 ** 6, large_component_nums=(1000, 5000)):
+    rng = np.random.default_rng(0)
+    p = rng.random(quantile_num)
+    for component_num in component_nums:
+        mix = MixtureDistribution([SingleNormalDistribution(m, v, n) for m, v, n in zip(
+            rng.normal(0, 10, component_num), rng.uniform(0.5, 4, component_num), rng.integers(1, 100, component_num).tolist())])
+        t_exact = timeit(lambda: mix.inverse_cdf(p))
+        error = np.abs(mix.cdf(mix.inverse_cdf(p)) - p).max()
+        t_sampled = timeit(lambda: np.quantile(mix.sample_array(sample_num, rng), p), repeat=1)
+        sampled_error = np.abs(mix.cdf(np.quantile(mix.sample_array(sample_num, rng), p)) - p).max()
+        print(f"components={component_num:<5} quantiles={quantile_num}  inverse_cdf: {t_exact * 1000:.1f}ms "
+              f"(max |cdf(x) - p| {error:.1e})  sampling {sample_num}: {t_sampled * 1000:.1f}ms (max error {sampled_error:.1e})")
+    # 成分很多时求单个分位数, 求初值的节点数有上限, 耗时与成分数成线性关系
+    for component_num in large_component_nums:
+        mix = MixtureDistribution([SingleNormalDistribution(m, v, 1) for m, v in zip(
+            rng.normal(0, 10, component_num), rng.uniform(0.5, 4, component_num))])
+        t_single = timeit(lambda: mix.inverse_cdf(0.5))
+        print(f"components={component_num:<5} single quantile  inverse_cdf: {t_single * 1000:.1f}ms")
+
+
+# 流式取样写入.npy文件: 峰值内存与样本数无关 vs 一次性sample_array
+def bench_sample_chunks(num=10 ** 7, chunk_size=2 ** 20):
+    def peak(func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        result = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, result
+
+    mix = MixtureDistribution([SingleNormalDistribution(m, 1 + m % 3, 10 + m) for m in range(100)])
+    for dist in [SingleNormalDistribution(10, 4, 100), mix]:
+        t_array, peak_array = peak(lambda: dist.sample_array(num, 0))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'samples.npy')
+            t_file, peak_file = peak(lambda: sample_to_npy(dist, path, num, chunk_size, rng=0))
+        print(f"{type(dist).__name__:<26} num={num}  sample_array: {t_array * 1000:.0f}ms peak {peak_array / 2 ** 20:.0f}MiB  "
+              f"sample_to_npy: {t_file * 1000:.0f}ms peak {peak_file / 2 ** 20:.0f}MiB")
+
+
+# 卡方分布取样: 对均匀分布调用chi2.ppf(原实现) vs 伽马分布直接取样 vs 插值查找表
+def bench_chi_square(num=10 ** 7, dofs=(1, 3.75, 50)):
+    rng = np.random.default_rng(0)
+    for dof in dofs:
+        dist = ChiSquareDistribution(dof, 10)
+        t_ppf = timeit(lambda: dist.inverse_cdf(rng.random(num)), repeat=1)
+        t_gamma = timeit(lambda: dist.sample_array(num, rng))
+        t_fast = timeit(lambda: dist.sample_array(num, rng, fast=True))
+        print(f"dof={dof:<6} num={num}  chi2.ppf: {t_ppf * 1000:.0f}ms  gamma: {t_gamma * 1000:.0f}ms  "
+              f"fast table: {t_fast * 1000:.0f}ms  speedup: {t_ppf / t_gamma:.1f}x")
+
+
+BENCHMARKS = {
+    'sample_array': bench_sample_array,
+    'mixture_sample': bench_mixture_sample,
+    'distribution_table': bench_distribution_table,
+    'nested_merge': bench_nested_merge,
+    'incremental_mixture': bench_incremental_mixture,
+    'density_grid': bench_density_grid,
+    'parallel_sample': bench_parallel_sample,
+    'slots_memory': bench_slots_memory,
+    'compact': bench_compact,
+    'inverse_cdf': bench_inverse_cdf,
+    'sample_chunks': bench_sample_chunks,
+    'chi_square': bench_chi_square,
+}
+
+
+if __name__ == '__main__':
+    # 用法: python distribution_benchmark.py [benchmark名称 ...], 不指定时运行全部
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
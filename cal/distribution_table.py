@@ -0,0 +1,96 @@
+import numpy as np
+from distribution import SingleNormalDistribution
+
+
+# 构建一个类，按列存储大量正态分布，包含以下属性：均值数组、方差数组、样本数数组
+class DistributionTable:
+    def __init__(self, mean, variance, sample_num):
+        """
+        与SingleNormalDistribution的加减法语义相同, 但对整个数组一次性运算
+        :param mean: 均值数组
+        :param variance: 方差数组
+        :param sample_num: 样本数数组
+        """
+        self.mean = np.asarray(mean, dtype=float) # 均值
+        self.variance = np.asarray(variance, dtype=float) # 方差
+        sample_num = np.asarray(sample_num)
+        # 整数样本数保持整数列, 使取出的SingleNormalDistribution的sample_num与原来的类型相同
+        self.sample_num = sample_num.astype(np.int64 if sample_num.dtype.kind in 'biu' else float) # 样本数
+        if not (self.mean.shape == self.variance.shape == self.sample_num.shape) or self.mean.ndim != 1:
+            raise ValueError('mean, variance and sample_num should be 1-d arrays of the same length')
+
+    @classmethod
+    def from_distributions(cls, distributions: list[SingleNormalDistribution]) -> 'DistributionTable':
+        """由SingleNormalDistribution列表构建"""
+        return cls([dist.mean for dist in distributions],
+                   [dist.variance for dist in distributions],
+                   [dist.sample_num for dist in distributions])
+
+    def to_distributions(self) -> list[SingleNormalDistribution]:
+        """转换为SingleNormalDistribution列表"""
+        return [SingleNormalDistribution(mean, variance, sample_num) for mean, variance, sample_num in
+                zip(self.mean.tolist(), self.variance.tolist(), self.sample_num.tolist())]
+
+    def __str__(self):
+        return "DistributionTable(" + str(len(self)) + " rows)"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.mean)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return SingleNormalDistribution(float(self.mean[index]), float(self.variance[index]), self.sample_num[index].item())
+        return DistributionTable(self.mean[index], self.variance[index], self.sample_num[index])
+
+    # 逐行将两个表中的正态分布相加，样本数为0的行结果为空分布(0, 0, 0)
+    def __add__(self, other):
+        sample_num = self.sample_num + other.sample_num
+        nonempty = sample_num > 0
+        safe_num = np.where(nonempty, sample_num, 1)
+        mean = (self.mean * self.sample_num + other.mean * other.sample_num) / safe_num
+        variance = (self.variance * self.sample_num + other.variance * other.sample_num) / safe_num + (
+                self.mean - other.mean) ** 2 * self.sample_num * other.sample_num / safe_num ** 2
+        return DistributionTable(np.where(nonempty, mean, 0), np.where(nonempty, variance, 0), sample_num)
+
+    # 逐行从该表中分离另一个表中的正态分布（减法）
+    def __sub__(self, other):
+        if np.any(other.sample_num > self.sample_num):
+            raise Exception("sample_num should be less than self.sample_num") # 限制其他的样本数不能超过自己的样本数，否则抛出异常
+        sample_num = self.sample_num - other.sample_num
+        nonempty = sample_num > 0
+        safe_num = np.where(nonempty, sample_num, 1)
+        mean = (self.mean * self.sample_num - other.mean * other.sample_num) / safe_num
+        variance = (self.variance * self.sample_num - other.variance * other.sample_num) / safe_num - (
+                self.mean - other.mean) ** 2 * self.sample_num * other.sample_num / safe_num ** 2
+        return DistributionTable(np.where(nonempty, mean, 0), np.where(nonempty, variance, 0), sample_num)
+
+    def reduce(self) -> SingleNormalDistribution:
+        """将表中所有正态分布合成为一个正态分布, 结果与依次调用__add__相同"""
+        total = self.sample_num.sum()
+        if total <= 0:
+            return SingleNormalDistribution(0, 0, 0)
+        mean = np.dot(self.sample_num, self.mean) / total
+        # 两遍法: 组内方差加上组均值相对总均值的离差, 避免E[x^2]-E[x]^2的相消误差
+        variance = np.dot(self.sample_num, self.variance + (self.mean - mean) ** 2) / total
+        return SingleNormalDistribution(float(mean), float(variance), total.item())
+
+    def reduce_by(self, keys) -> tuple[np.ndarray, 'DistributionTable']:
+        """
+        按key分组合成正态分布
+        :param keys: 与表等长的分组键数组
+        :return: (排序后的唯一键数组, 每个键对应一行合成结果的表)
+        """
+        unique_keys, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        inverse = inverse.ravel()
+        group_num = len(unique_keys)
+        total = np.bincount(inverse, weights=self.sample_num, minlength=group_num)
+        nonempty = total > 0
+        safe_total = np.where(nonempty, total, 1)
+        mean = np.bincount(inverse, weights=self.sample_num * self.mean, minlength=group_num) / safe_total
+        variance = np.bincount(inverse, weights=self.sample_num * (self.variance + (self.mean - mean[inverse]) ** 2),
+                               minlength=group_num) / safe_total
+        return unique_keys, DistributionTable(np.where(nonempty, mean, 0), np.where(nonempty, variance, 0),
+                                              total.astype(self.sample_num.dtype))
@@ -0,0 +1,59 @@
+import unittest
+import functools
+import numpy as np
+from distribution import SingleNormalDistribution
+from distribution_table import DistributionTable
+
+
+class TestDistributionTable(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.distributions = [SingleNormalDistribution(m, v, n) for m, v, n in
+                              zip(rng.normal(0, 10, 50), rng.uniform(0.5, 5, 50), rng.integers(1, 100, 50))]
+        self.table = DistributionTable.from_distributions(self.distributions)
+
+    def assertDistributionAlmostEqual(self, a, b):
+        self.assertAlmostEqual(a.mean, b.mean)
+        self.assertAlmostEqual(a.variance, b.variance)
+        self.assertAlmostEqual(a.sample_num, b.sample_num)
+
+    def test_round_trip(self):
+        for a, b in zip(self.table.to_distributions(), self.distributions):
+            self.assertDistributionAlmostEqual(a, b)
+        self.assertDistributionAlmostEqual(self.table[3], self.distributions[3])
+
+    def test_integer_sample_num(self):
+        self.assertIsInstance(self.table[3].sample_num, int)
+        self.assertIsInstance(self.table.to_distributions()[0].sample_num, int)
+        self.assertIsInstance(self.table.reduce().sample_num, int)
+        self.assertIsInstance((self.table[:25] + self.table[25:])[0].sample_num, int)
+        self.assertIsInstance(self.table.reduce_by(np.arange(50) % 3)[1][0].sample_num, int)
+        self.assertIsInstance(DistributionTable([0.0], [1.0], [2.5])[0].sample_num, float)
+
+    def test_reduce(self):
+        expected = functools.reduce(lambda a, b: a + b, self.distributions)
+        self.assertDistributionAlmostEqual(self.table.reduce(), expected)
+
+    def test_reduce_by(self):
+        keys = np.arange(50) % 3
+        unique_keys, grouped = self.table.reduce_by(keys)
+        np.testing.assert_array_equal(unique_keys, [0, 1, 2])
+        for key in unique_keys:
+            expected = functools.reduce(lambda a, b: a + b, self.distributions[key::3])
+            self.assertDistributionAlmostEqual(grouped[int(key)], expected)
+
+    def test_add_sub(self):
+        first, second = self.table[:25], self.table[25:]
+        added = first + second
+        for i in range(25):
+            self.assertDistributionAlmostEqual(added[i], self.distributions[i] + self.distributions[i + 25])
+        separated = added - second
+        for i in range(25):
+            self.assertDistributionAlmostEqual(separated[i], self.distributions[i])
+        self.assertEqual((first - first).sample_num.sum(), 0)
+        with self.assertRaises(Exception):
+            first - added
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,12 @@
+import os
+import random
+import tempfile
 import unittest
+import warnings
+import numpy as np
+from scipy.stats import kstest
 from distribution import *
+from distribution import _inverse_cdf_table
 import matplotlib.pyplot as plt
 
 class TestSingleNormalDistribution(unittest.TestCase):
@@ -15,12 +22,422 @@ class TestSingleNormalDistribution(unittest.TestCase):
     def test_str(self):
         self.assertEqual(str(self.distribution1), "mean: 10, variance: 4, sample_num: 100")
 
+    def test_slots(self):
+        for dist in [self.distribution1, ChiSquareDistribution(4, 10)]:
+            self.assertFalse(hasattr(dist, '__dict__'))
+            with self.assertRaises(AttributeError):
+                dist.other = 1
+
     def test_add(self):
         distribution3 = self.distribution1 + self.distribution2
         self.assertEqual(distribution3.mean, 15) # 断言两个正态分布相加后的均值
         self.assertEqual(distribution3.variance, 6.75) # 断言两个正态分布相加后的方差
         self.assertEqual(distribution3.sample_num, 300)
 
+    def test_sub(self):
+        distribution3 = (self.distribution1 + self.distribution2) - self.distribution2
+        self.assertAlmostEqual(distribution3.mean, 10)
+        self.assertAlmostEqual(distribution3.variance, 4)
+        self.assertEqual(distribution3.sample_num, 100)
+
+
+class TestSampleArray(unittest.TestCase):
+    def test_normal_sample_array(self):
+        dist = SingleNormalDistribution(10, 4, 100)
+        samples = dist.sample_array(100000, rng=np.random.default_rng(0))
+        self.assertIsInstance(samples, np.ndarray)
+        self.assertEqual(samples.shape, (100000,))
+        self.assertAlmostEqual(samples.mean(), 10, delta=0.05)
+        self.assertAlmostEqual(samples.var(), 4, delta=0.1)
+
+    def test_chi_square_sample_array(self):
+        dist = ChiSquareDistribution(4, 10)
+        samples = dist.sample_array(100000, rng=1)
+        self.assertEqual(samples.shape, (100000,))
+        self.assertAlmostEqual(samples.mean(), 4, delta=0.1)
+
+    def test_chi_square_non_integer_dof(self):
+        # __add__按样本数加权得到的自由度一般不是整数
+        dist = ChiSquareDistribution(3, 10) + ChiSquareDistribution(4, 30)
+        self.assertAlmostEqual(dist.dof, 3.75)
+        samples = dist.sample_array(100000, rng=2)
+        self.assertLess(kstest(samples, chi2(dist.dof).cdf).statistic, 0.01)
+        self.assertEqual(len(dist.sample(10)), 10)
+
+    def test_chi_square_empty(self):
+        dist = ChiSquareDistribution(4, 10)
+        empty = dist - dist
+        self.assertEqual((empty.dof, empty.sample_num), (0, 0))
+        total = empty + ChiSquareDistribution(0, 0)
+        self.assertEqual((total.dof, total.sample_num), (0, 0))
+        self.assertEqual((empty + dist).dof, 4)
+        np.testing.assert_array_equal(empty.sample_array(5, rng=0), np.zeros(5))
+        np.testing.assert_array_equal(empty.sample_array(5, rng=0, fast=True), np.zeros(5))
+
+    def test_seed_reproducible(self):
+        dist = SingleNormalDistribution(0, 1, 10)
+        np.testing.assert_array_equal(dist.sample_array(1000, rng=42), dist.sample_array(1000, rng=42))
+
+    def test_sample_seeding(self):
+        # 所有分布的sample都由sample_array生成: 由rng复现, 不受random.seed影响
+        mix = MixtureDistribution([SingleNormalDistribution(0, 1, 10), SingleNormalDistribution(5, 2, 30)])
+        for dist in [SingleNormalDistribution(0, 1, 10), ChiSquareDistribution(3, 10), mix]:
+            samples = dist.sample(100, rng=42)
+            self.assertIsInstance(samples, list)
+            self.assertEqual(samples, dist.sample_array(100, rng=42).tolist())
+            random.seed(0)
+            first = dist.sample(100)
+            random.seed(0)
+            self.assertNotEqual(first, dist.sample(100))
+
+
+class TestVectorizedEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.normal = SingleNormalDistribution(10, 4, 100)
+        self.chi = ChiSquareDistribution(4, 10)
+        self.mix = MixtureDistribution([SingleNormalDistribution(15, 4, 10), SingleNormalDistribution(5, 7, 100)])
+        self.x = np.linspace(-20, 40, 60000).reshape(3, -1)
+
+    def test_normal(self):
+        self.assertAlmostEqual(self.normal.pdf(10), 1 / np.sqrt(2 * np.pi * 4))
+        np.testing.assert_allclose(self.normal.pdf(self.x), norm.pdf(self.x, 10, 2))
+        self.assertEqual(self.normal.cdf(self.x).shape, self.x.shape)
+        p = np.array([0.1, 0.5, 0.9])
+        np.testing.assert_allclose(self.normal.cdf(self.normal.inverse_cdf(p)), p)
+
+    def test_chi_square(self):
+        self.assertEqual(self.chi.pdf(self.x).shape, self.x.shape)
+        p = np.array([0.1, 0.5, 0.9])
+        np.testing.assert_allclose(self.chi.cdf(self.chi.inverse_cdf(p)), p)
+
+    def test_mixture(self):
+        expected = (10 * norm.pdf(self.x, 15, 2) + 100 * norm.pdf(self.x, 5, 7 ** 0.5)) / 110
+        np.testing.assert_allclose(self.mix.pdf(self.x), expected)
+        expected = (10 * norm.cdf(self.x, 15, 2) + 100 * norm.cdf(self.x, 5, 7 ** 0.5)) / 110
+        np.testing.assert_allclose(self.mix.cdf(self.x), expected)
+        self.assertAlmostEqual(self.mix.pdf(5.0), (10 * norm.pdf(5, 15, 2) + 100 * norm.pdf(5, 5, 7 ** 0.5)) / 110)
+        grid = self.x.ravel()
+        self.assertAlmostEqual(np.sum(self.mix.pdf(grid)) * (grid[1] - grid[0]), 1, places=4)
+
+    def test_mixture_degenerate_components(self):
+        # 样本数为0的成分不影响分布; 标准差为0的成分为点质量, cdf在其均值处跳跃
+        a = SingleNormalDistribution(1, 2, 3)
+        mix = MixtureDistribution([a, a - a, SingleNormalDistribution(2, 2, 3)])
+        self.assertAlmostEqual(mix.pdf(1.0), (norm.pdf(1, 1, 2 ** 0.5) + norm.pdf(1, 2, 2 ** 0.5)) / 2)
+        self.assertAlmostEqual(mix.cdf(0.0), (norm.cdf(0, 1, 2 ** 0.5) + norm.cdf(0, 2, 2 ** 0.5)) / 2)
+        point = MixtureDistribution([SingleNormalDistribution(0, 0, 1), SingleNormalDistribution(2, 4, 3)])
+        x = np.array([-1.0, -1e-12, 0.0, 1.0])
+        np.testing.assert_allclose(point.cdf(x), (np.where(x >= 0, 1, 0) + 3 * norm.cdf(x, 2, 2)) / 4)
+        np.testing.assert_allclose(point.pdf(x[[0, 1, 3]]), 3 * norm.pdf(x[[0, 1, 3]], 2, 2) / 4)
+        self.assertEqual(point.pdf(0.0), np.inf)
+
+    def test_mixture_inverse_cdf(self):
+        p = np.linspace(0, 1, 3000).reshape(3, -1)
+        x = self.mix.inverse_cdf(p)
+        self.assertEqual(x.shape, p.shape)
+        np.testing.assert_allclose(self.mix.cdf(x.ravel()[1:-1]), p.ravel()[1:-1], rtol=0, atol=1e-14)
+        self.assertEqual(x.ravel()[0], -np.inf)
+        self.assertEqual(x.ravel()[-1], np.inf)
+        self.assertTrue(np.all(np.diff(x.ravel()) > 0))
+        self.assertIsInstance(self.mix.inverse_cdf(0.5), float)
+        self.assertTrue(np.isnan(self.mix.inverse_cdf(1.5)))
+        # 单个成分时与正态分布的分位数相同; 方差相差悬殊的成分
+        single = MixtureDistribution([SingleNormalDistribution(3, 4, 10)])
+        np.testing.assert_allclose(single.inverse_cdf([1e-10, 0.3, 0.99]), norm.ppf([1e-10, 0.3, 0.99], 3, 2))
+        narrow = MixtureDistribution([SingleNormalDistribution(0, 1e-8, 1), SingleNormalDistribution(100, 1e4, 1)])
+        p = np.array([1e-12, 0.25, 0.5, 0.75, 1 - 1e-12])
+        np.testing.assert_allclose(narrow.cdf(narrow.inverse_cdf(p)), p, rtol=1e-10)
+        with self.assertRaises(ValueError):
+            MixtureDistribution([SingleNormalDistribution(0, 0, 0)]).inverse_cdf(0.5)
+        # 样本数为0的成分被忽略; 点质量处cdf跳跃, 跳跃范围内的p都对应其均值
+        a = SingleNormalDistribution(1, 2, 3)
+        mix = MixtureDistribution([a, a - a, SingleNormalDistribution(2, 2, 3)])
+        p = np.array([0.1, 0.5, 0.9])
+        np.testing.assert_allclose(mix.cdf(mix.inverse_cdf(p)), p, rtol=1e-12)
+        point = MixtureDistribution([SingleNormalDistribution(0, 0, 1), SingleNormalDistribution(2, 4, 3)])
+        x = point.inverse_cdf([0.2, 0.3])
+        np.testing.assert_allclose(x, 0, atol=1e-9)
+        self.assertTrue(np.all(point.cdf(x) >= [0.2, 0.3]))
+        # 成分很多时求初值的节点数有上限
+        rng = np.random.default_rng(0)
+        many = MixtureDistribution([SingleNormalDistribution(m, v, 1) for m, v in zip(rng.normal(0, 10, 3000), rng.uniform(0.01, 4, 3000))])
+        p = np.array([1e-6, 0.3, 0.7])
+        np.testing.assert_allclose(many.cdf(many.inverse_cdf(p)), p, rtol=1e-10)
+
+    def test_mixture_inverse_cdf_no_warnings(self):
+        # 点质量附近pdf可能下溢为非规格化数, 牛顿步的除法溢出不应产生RuntimeWarning
+        mix = MixtureDistribution([SingleNormalDistribution(-48, 0.614, 2), SingleNormalDistribution(-4, 0, 4),
+                                   SingleNormalDistribution(-2, 0, 2), SingleNormalDistribution(-33, 0, 2)])
+        p = np.linspace(0.01, 0.99, 99)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            x = mix.inverse_cdf(p)
+        self.assertTrue(np.all(mix.cdf(x) >= p - 1e-12))
+
+
+class TestNormalAccumulator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.data = rng.normal(1e6, 3, 100000)
+
+    def test_consume_chunks(self):
+        dist = NormalAccumulator().consume(np.array_split(self.data, 37)).to_distribution()
+        self.assertAlmostEqual(dist.mean, self.data.mean(), places=6)
+        self.assertAlmostEqual(dist.variance, self.data.var(), places=6)
+        self.assertEqual(dist.sample_num, len(self.data))
+
+    def test_consume_values(self):
+        dist = NormalAccumulator(chunk_size=1000).consume_values(x for x in self.data.tolist()).to_distribution()
+        self.assertAlmostEqual(dist.mean, self.data.mean(), places=6)
+        self.assertAlmostEqual(dist.variance, self.data.var(), places=6)
+
+    def test_add_compatible(self):
+        first = NormalAccumulator().update(self.data[:30000]).to_distribution()
+        second = NormalAccumulator().update(self.data[30000:]).to_distribution()
+        added = first + second
+        self.assertAlmostEqual(added.mean, self.data.mean(), places=6)
+        self.assertAlmostEqual(added.variance, self.data.var(), places=6)
+        self.assertAlmostEqual((added - second).variance, first.variance, places=6)
+
+    def test_empty(self):
+        dist = NormalAccumulator().consume([]).to_distribution()
+        self.assertEqual(dist.sample_num, 0)
+        self.assertEqual(dist.variance, 0)
+
+
+class TestFastSample(unittest.TestCase):
+    def test_normal_ks(self):
+        dist = SingleNormalDistribution(10, 4, 100)
+        samples = dist.sample_array(100000, rng=0, fast=True)
+        statistic = kstest(samples, norm(10, 2).cdf).statistic
+        # 取样误差约为1.36/sqrt(n)=0.0043, 查找表误差不超过1/(INVERSE_CDF_TABLE_SIZE-1)
+        self.assertLess(statistic, 0.0043 + 1 / (INVERSE_CDF_TABLE_SIZE - 1))
+
+    def test_chi_square_ks(self):
+        for dof in [1, 4, 2.5]:
+            samples = ChiSquareDistribution(dof, 10).sample_array(100000, rng=1, fast=True)
+            statistic = kstest(samples, chi2(dof).cdf).statistic
+            self.assertLess(statistic, 0.0043 + 1 / (INVERSE_CDF_TABLE_SIZE - 1))
+
+    def test_table_shared(self):
+        SingleNormalDistribution(0, 1, 1).sample_array(10, fast=True)
+        hits = _inverse_cdf_table.cache_info().hits
+        SingleNormalDistribution(5, 3, 7).sample_array(10, fast=True)
+        self.assertEqual(_inverse_cdf_table.cache_info().hits, hits + 1)
+
+
+class TestMixtureMerge(unittest.TestCase):
+    def test_nested_merge(self):
+        rng = np.random.default_rng(0)
+        distributions = [SingleNormalDistribution(m, v, n) for m, v, n in
+                         zip(rng.normal(0, 10, 100), rng.uniform(0.5, 5, 100), rng.integers(1, 100, 100).tolist())]
+        nested = MixtureDistribution(distributions[:1])
+        for dist in distributions[1:]:
+            nested = MixtureDistribution([nested, dist])
+        flat = MixtureDistribution(distributions)
+        self.assertAlmostEqual(nested.merge_dist.mean, flat.merge_dist.mean)
+        self.assertAlmostEqual(nested.merge_dist.variance, flat.merge_dist.variance)
+        self.assertEqual(nested.merge_dist.sample_num, flat.merge_dist.sample_num)
+
+    def test_precision(self):
+        # 均值很大、方差很小时, 依次累加会积累舍入误差
+        distributions = [SingleNormalDistribution(1e8 + i % 2, 0, 1) for i in range(10000)]
+        merge_dist = MixtureDistribution(distributions).merge_dist
+        self.assertAlmostEqual(merge_dist.mean, 1e8 + 0.5, places=10)
+        self.assertAlmostEqual(merge_dist.variance, 0.25, places=10)
+
+    def test_empty(self):
+        merge_dist = MixtureDistribution([SingleNormalDistribution(0, 0, 0)]).merge_dist
+        self.assertEqual(merge_dist.sample_num, 0)
+
+
+class TestMixtureIncremental(unittest.TestCase):
+    def assertSameMixture(self, mix, distribution_list):
+        expected = MixtureDistribution(distribution_list)
+        self.assertAlmostEqual(mix.merge_dist.mean, expected.merge_dist.mean)
+        self.assertAlmostEqual(mix.merge_dist.variance, expected.merge_dist.variance)
+        self.assertAlmostEqual(mix.merge_dist.sample_num, expected.merge_dist.sample_num)
+        self.assertCountEqual([id(dist) for dist in mix.components], [id(dist) for dist in expected.components])
+        size = len(mix.components)
+        np.testing.assert_array_equal(mix._means[:size], [dist.mean for dist in mix.components])
+        np.testing.assert_array_equal(mix._sample_nums[:size], [dist.sample_num for dist in mix.components])
+
+    def test_append_remove(self):
+        rng = np.random.default_rng(0)
+        distributions = [SingleNormalDistribution(m, v, n) for m, v, n in
+                         zip(rng.normal(0, 10, 40), rng.uniform(0.5, 5, 40), rng.integers(1, 100, 40).tolist())]
+        sub_mix = MixtureDistribution(distributions[30:])
+        mix = MixtureDistribution(distributions[:2])
+        for dist in distributions[2:30]:
+            mix.append(dist)
+        mix.append(sub_mix)
+        self.assertSameMixture(mix, distributions[:30] + [sub_mix])
+        for dist in distributions[5:20]:
+            mix.remove(dist)
+        mix.remove(sub_mix)
+        self.assertSameMixture(mix, distributions[:5] + distributions[20:30])
+        self.assertEqual(len(mix.sample_array(100, rng=0)), 100)
+
+    def test_remove_all(self):
+        dist = SingleNormalDistribution(1, 2, 3)
+        mix = MixtureDistribution([dist])
+        mix.remove(dist)
+        self.assertEqual(mix.merge_dist.sample_num, 0)
+        self.assertEqual(mix.components, [])
+        with self.assertRaises(ValueError):
+            mix.remove(dist)
+        with self.assertRaises(ValueError):
+            mix.sample_array(10)
+
+    def test_does_not_modify_argument(self):
+        distribution_list = [SingleNormalDistribution(1, 2, 3)]
+        MixtureDistribution(distribution_list).append(SingleNormalDistribution(4, 5, 6))
+        self.assertEqual(len(distribution_list), 1)
+
+
+class TestSampleChunks(unittest.TestCase):
+    def test_same_as_single_draw(self):
+        for dist, kwargs in [(SingleNormalDistribution(10, 4, 100), {}), (ChiSquareDistribution(4, 10), {}),
+                             (ChiSquareDistribution(4, 10), {'fast': True})]:
+            chunks = list(dist.sample_chunks(10001, chunk_size=1000, rng=3, **kwargs))
+            self.assertEqual([len(chunk) for chunk in chunks], [1000] * 10 + [1])
+            np.testing.assert_array_equal(np.concatenate(chunks), dist.sample_array(10001, 3, **kwargs))
+
+    def test_mixture(self):
+        mix = MixtureDistribution([SingleNormalDistribution(15, 4, 10), SingleNormalDistribution(5, 7, 100)])
+        samples = np.concatenate(list(mix.sample_chunks(100000, chunk_size=333, rng=0)))
+        np.testing.assert_array_equal(samples, next(mix.sample_chunks(100000, chunk_size=100000, rng=0)))
+        self.assertLess(kstest(samples, mix.cdf).statistic, 0.01)
+
+    def test_sample_to_npy(self):
+        dist = SingleNormalDistribution(10, 4, 100)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'samples.npy')
+            samples = sample_to_npy(dist, path, 5000, chunk_size=512, rng=1)
+            del samples
+            np.testing.assert_array_equal(np.load(path), dist.sample_array(5000, 1))
+
+
+class TestMixtureLazy(unittest.TestCase):
+    def test_lazy_statistics(self):
+        distributions = [SingleNormalDistribution(i, 1 + i % 3, 10 + i) for i in range(10)]
+        mix = MixtureDistribution(distributions[:5]) + MixtureDistribution(distributions[5:])
+        self.assertIsNone(mix._merge_dist)
+        self.assertIsNone(mix._components)
+        mix.append(distributions[0])
+        mix.remove(distributions[0])
+        self.assertIsNone(mix._merge_dist)
+        expected = MixtureDistribution(distributions)
+        self.assertAlmostEqual(mix.merge_dist.mean, expected.merge_dist.mean)
+        self.assertIs(mix.merge_dist, mix.merge_dist)
+        self.assertEqual(len(mix.sample_array(10, rng=0)), 10)
+        self.assertCountEqual([id(dist) for dist in mix.components], [id(dist) for dist in distributions])
+
+    def test_deep_nesting(self):
+        # 嵌套层数超过递归深度限制时也能计算
+        nested = MixtureDistribution([SingleNormalDistribution(0, 1, 1)])
+        for i in range(1, 10000):
+            nested = MixtureDistribution([nested, SingleNormalDistribution(i % 7, 1, 1)])
+        flat = MixtureDistribution(nested.components)
+        self.assertEqual(len(nested.components), 10000)
+        self.assertAlmostEqual(nested.merge_dist.mean, flat.merge_dist.mean)
+        self.assertAlmostEqual(nested.merge_dist.variance, flat.merge_dist.variance)
+
+    def test_invalidate(self):
+        sub_mix = MixtureDistribution([SingleNormalDistribution(1, 1, 1)])
+        mix = MixtureDistribution([sub_mix, SingleNormalDistribution(3, 1, 1)])
+        self.assertAlmostEqual(mix.merge_dist.mean, 2)
+        sub_mix.append(SingleNormalDistribution(1, 1, 1))
+        mix.invalidate()
+        self.assertAlmostEqual(mix.merge_dist.mean, 5 / 3)
+        self.assertEqual(len(mix.components), 3)
+
+    def test_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            MixtureDistribution([ChiSquareDistribution(1, 1)])
+
+
+class TestMixtureCompact(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.distributions = [SingleNormalDistribution(m, v, n) for m, v, n in
+                              zip(rng.normal(0, 10, 500), rng.uniform(0.5, 2, 500), rng.integers(1, 100, 500).tolist())]
+        self.mix = MixtureDistribution(self.distributions)
+
+    def test_max_components(self):
+        compacted = self.mix.compact(max_components=20)
+        self.assertEqual(len(compacted.components), 20)
+        self.assertEqual(len(self.mix.components), 500)
+        self.assertEqual(compacted.merge_dist.mean, self.mix.merge_dist.mean)
+        self.assertEqual(compacted.merge_dist.variance, self.mix.merge_dist.variance)
+        self.assertEqual(sum(dist.sample_num for dist in compacted.components), self.mix.merge_dist.sample_num)
+        x = np.linspace(-40, 40, 1001)
+        self.assertLess(np.abs(compacted.cdf(x) - self.mix.cdf(x)).max(), 0.01)
+
+    def test_tolerance(self):
+        loose = self.mix.compact(tolerance=1e-3)
+        tight = self.mix.compact(tolerance=1e-5)
+        self.assertLess(len(loose.components), len(tight.components))
+        self.assertLess(len(tight.components), 500)
+        # 代价为0时只合并相同的成分
+        dist = SingleNormalDistribution(1, 2, 3)
+        mix = MixtureDistribution([dist, dist, SingleNormalDistribution(0, 0, 0), SingleNormalDistribution(5, 2, 3)])
+        self.assertEqual(len(mix.compact(tolerance=0).components), 2)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            self.mix.compact()
+        with self.assertRaises(ValueError):
+            self.mix.compact(max_components=0)
+
+
+class TestMixtureSample(unittest.TestCase):
+    def setUp(self):
+        self.mix1 = MixtureDistribution([SingleNormalDistribution(15, 4, 10), SingleNormalDistribution(5, 7, 100)])
+        self.mix2 = MixtureDistribution([self.mix1, SingleNormalDistribution(32, 4, 200)])
+
+    def test_exact_count(self):
+        for num in [0, 1, 9, 1000]:
+            self.assertEqual(len(self.mix2.sample(num)), num)
+            self.assertEqual(len(self.mix2.sample_array(num, rng=0)), num)
+            self.assertEqual(len(self.mix2.sample_array(num, rng=0, grouped=True)), num)
+
+    def test_component_weights(self):
+        samples = self.mix2.sample_array(200000, rng=np.random.default_rng(3))
+        self.assertAlmostEqual(samples.mean(), self.mix2.merge_dist.mean, delta=0.1)
+        self.assertAlmostEqual(samples.var(), self.mix2.merge_dist.variance, delta=1)
+
+    def test_grouped(self):
+        samples = self.mix2.sample_array(200000, rng=5, grouped=True)
+        # 各成分的均值相距较远, 分组输出时样本按成分顺序排列
+        self.assertLess(samples[:1000].mean(), 20)
+        self.assertGreater(samples[-1000:].mean(), 25)
+        self.assertAlmostEqual(samples.mean(), self.mix2.merge_dist.mean, delta=0.1)
+
+    def test_seed_reproducible(self):
+        np.testing.assert_array_equal(self.mix2.sample_array(100, rng=7), self.mix2.sample_array(100, rng=7))
+
+    def test_parallel_sample(self):
+        samples = self.mix2.parallel_sample(100000, seed=11, workers=2, chunk_size=30000)
+        self.assertEqual(samples.shape, (100000,))
+        self.assertAlmostEqual(samples.mean(), self.mix2.merge_dist.mean, delta=0.2)
+        # 结果只取决于seed和chunk_size, 与进程数无关
+        np.testing.assert_array_equal(samples, self.mix2.parallel_sample(100000, seed=11, workers=1, chunk_size=30000))
+        # 各块使用独立的随机数流
+        self.assertFalse(np.array_equal(samples[:30000], samples[30000:60000]))
+
+    def test_parallel_sample_no_copy(self):
+        samples = self.mix2.parallel_sample(1000, seed=3, workers=1, chunk_size=300)
+        # 结果直接使用子进程写入的映射, 没有复制到新的数组
+        self.assertFalse(samples.flags.owndata)
+        self.assertTrue(samples.flags.writeable)
+        expected = samples.copy()
+        view = samples[100:]
+        del samples
+        np.testing.assert_array_equal(view, expected[100:])
+        self.assertEqual(len(self.mix2.parallel_sample(0, seed=3, workers=1)), 0)
+
+
 if __name__ == '__main__':
     # unittest.main()
 
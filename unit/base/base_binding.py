@@ -1,12 +1,371 @@
+import bisect
+import weakref
+import operator
+import functools
 from typing import Union, Optional, Tuple
 
 class UnexpectedBindingType(Exception):
     pass
 
+_PROXY_TYPES = (weakref.ProxyType, weakref.CallableProxyType)
+_PROXY_TYPES_SET = frozenset(_PROXY_TYPES)
+
+def _unwrap(obj):
+    """若obj为弱引用代理, 返回其指向的对象"""
+    return obj._referent() if type(obj) in _PROXY_TYPES else obj
+
+def _remove_dead_binding(owner_ref: weakref.ref, obj_key: str, obj_id: int, proxy):
+    """弱引用的回调: 被绑定的对象被回收时, 删除owner中残留的绑定"""
+    owner = owner_ref()
+    if owner is not None:
+        owner._remove_dead_binding(obj_key, obj_id, proxy)
+
+class BindingList(list):
+    """
+    key对应多个绑定时的值, 是元素为(obj, self_key)的list, 按绑定的先后顺序排列, list的所有操作都可以使用(包括重复的元素)
+    另外按对象身份维护每个元素的序号, 查找对象的绑定为O(1); 解除单个绑定时用序号二分定位, 之后由list在C中移动后面的元素
+    append/extend/pop()和按对象删除时增量更新索引, 其他修改列表的操作(insert、排序、切片赋值等)之后重建索引
+    """
+    __slots__ = ('_index', '_next_seq', '_removed')
+
+    def __init__(self, items=()):
+        list.__init__(self, items)
+        self._rebuild()
+
+    def _rebuild(self):
+        """重新编号, 第i个元素的序号为i"""
+        # {id(obj): 序号或序号的列表}, 序号按元素的先后顺序递增, 同一对象有多个元素时才使用列表
+        objs = list(map(operator.itemgetter(0), self))
+        if not _PROXY_TYPES_SET.isdisjoint(map(type, objs)):
+            objs = [_unwrap(obj) for obj in objs]
+        ids = list(map(id, objs))
+        index = dict(zip(ids, range(len(ids))))
+        if len(index) != len(ids):
+            # 存在重复的对象时逐个加入
+            index = {}
+            for seq, obj_id in enumerate(ids):
+                seqs = index.get(obj_id)
+                if seqs is None:
+                    index[obj_id] = seq
+                elif type(seqs) is int:
+                    index[obj_id] = [seqs, seq]
+                else:
+                    seqs.append(seq)
+        self._index = index
+        self._next_seq = len(ids)
+        self._removed = [] # 重建后被删除的元素的序号, 有序
+
+    def _position(self, seq: int) -> int:
+        removed = self._removed
+        return seq - bisect.bisect_left(removed, seq) if removed else seq
+
+    def _add_seq(self, obj_id: int, seq: int):
+        seqs = self._index.get(obj_id)
+        if seqs is None:
+            self._index[obj_id] = seq
+        elif type(seqs) is int:
+            self._index[obj_id] = [seqs, seq]
+        else:
+            seqs.append(seq)
+
+    def _find(self, obj_id: int, self_key) -> Optional[int]:
+        """返回对象最早的元素(指定self_key时为最早的self_key相同的元素)的序号, 不存在时返回None"""
+        seqs = self._index.get(obj_id)
+        if seqs is None:
+            return None
+        if type(seqs) is int:
+            if self_key is None or list.__getitem__(self, self._position(seqs))[1] == self_key:
+                return seqs
+            return None
+        for seq in seqs:
+            if self_key is None or list.__getitem__(self, self._position(seq))[1] == self_key:
+                return seq
+        return None
+
+    def _remove_seq(self, obj_id: int, seq: int) -> Tuple['BaseBinding', str]:
+        """删除序号为seq的元素并返回该元素"""
+        position = self._position(seq)
+        seqs = self._index[obj_id]
+        if type(seqs) is int:
+            del self._index[obj_id]
+        else:
+            seqs.remove(seq)
+            if len(seqs) == 1:
+                self._index[obj_id] = seqs[0]
+        item = list.__getitem__(self, position)
+        if position == len(self) - 1:
+            self._next_seq = seq
+            removed = self._removed
+            while removed and removed[-1] == self._next_seq - 1:
+                self._next_seq = removed.pop()
+        else:
+            bisect.insort(self._removed, seq)
+        # 先更新索引再删除元素, 删除时若触发对象的__del__, 其中对列表的操作看到的是一致的状态
+        list.__delitem__(self, position)
+        if len(self._removed) > 64 and len(self._removed) > len(self):
+            self._rebuild()
+        return item
+
+    def get(self, obj: 'BaseBinding', self_key: Optional[str] = None) -> Optional[Tuple['BaseBinding', str]]:
+        """
+        返回obj对应的(obj, self_key), 不存在时返回None
+        不指定self_key时返回obj最早的绑定
+        """
+        # 列表中的对象都是存活的(弱引用的对象被回收时会被回调删除), 因此id不会与其他对象冲突
+        seq = self._find(id(_unwrap(obj)), self_key)
+        return None if seq is None else list.__getitem__(self, self._position(seq))
+
+    def remove_binding(self, obj: 'BaseBinding', self_key: Optional[str] = None) -> Optional[Tuple['BaseBinding', str]]:
+        """删除obj最早的绑定(指定self_key时为最早的self_key相同的绑定)并返回该元素, 不存在时返回None"""
+        obj_id = id(_unwrap(obj))
+        seq = self._find(obj_id, self_key)
+        return None if seq is None else self._remove_seq(obj_id, seq)
+
+    def remove_dead(self, obj_id: int, proxy):
+        """删除已被回收的对象的弱引用绑定"""
+        seqs = self._index.get(obj_id)
+        if seqs is None:
+            return
+        for seq in ([seqs] if type(seqs) is int else list(seqs)):
+            if list.__getitem__(self, self._position(seq))[0] is proxy:
+                self._remove_seq(obj_id, seq)
+
+    def append(self, item: Tuple['BaseBinding', str]):
+        obj = item[0]
+        obj_id = id(obj._referent() if type(obj) in _PROXY_TYPES else obj)
+        seq = self._next_seq
+        seqs = self._index.get(obj_id)
+        if seqs is None:
+            self._index[obj_id] = seq
+        else:
+            self._add_seq(obj_id, seq)
+        self._next_seq = seq + 1
+        list.append(self, item)
+
+    def extend(self, items):
+        if not self:
+            # 空列表时一次重建索引(例如从快照恢复)
+            list.extend(self, items)
+            self._rebuild()
+            return
+        for item in list(items):
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def pop(self, index=-1):
+        if index == -1 or index == len(self) - 1:
+            item = list.__getitem__(self, -1)
+            obj_id = id(_unwrap(item[0]))
+            seqs = self._index[obj_id]
+            return self._remove_seq(obj_id, seqs if type(seqs) is int else seqs[-1])
+        item = list.pop(self, index)
+        self._rebuild()
+        return item
+
+    def remove(self, item):
+        """与list.remove相同, 删除第一个等于item的元素"""
+        if type(item) is tuple and len(item) == 2 and hasattr(item[0], "bindname"):
+            if self.remove_binding(item[0], item[1]) is None:
+                raise ValueError('list.remove(x): x not in list')
+            return
+        list.remove(self, item)
+        self._rebuild()
+
+    def clear(self):
+        list.clear(self)
+        self._rebuild()
+
+    def copy(self) -> 'BindingList':
+        # 复制索引而不是重建, 避免对每个元素重新计算id
+        result = BindingList.__new__(BindingList)
+        list.extend(result, self)
+        result._index = {obj_id: seqs if type(seqs) is int else seqs.copy() for obj_id, seqs in self._index.items()}
+        result._next_seq = self._next_seq
+        result._removed = self._removed.copy()
+        return result
+
+    def __contains__(self, item) -> bool:
+        if type(item) is tuple and len(item) == 2 and hasattr(item[0], "bindname"):
+            return self.get(item[0], item[1]) is not None
+        return list.__contains__(self, item)
+
+    def __reduce__(self):
+        # 反序列化后对象的id会改变, 按列表序列化, 加载时重建索引
+        return (BindingList, (list(self),))
+
+    def _rebuilt_after(name):
+        method = getattr(list, name)
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            self._rebuild()
+            return self if result is self else result
+        return wrapper
+
+    # 其他修改列表的操作之后重建索引
+    insert = _rebuilt_after('insert')
+    sort = _rebuilt_after('sort')
+    reverse = _rebuilt_after('reverse')
+    __setitem__ = _rebuilt_after('__setitem__')
+    __delitem__ = _rebuilt_after('__delitem__')
+    __imul__ = _rebuilt_after('__imul__')
+    del _rebuilt_after
+
+
 class BaseBinding:
-    def __init__(self):
+    """
+    可相互绑定的对象的基类, 绑定关系保存在self.bindings中
+    弱引用模式的限制: self.bindings中保存的是weakref.proxy而不是对象本身,
+        因此bindings[obj_key][0] is obj不成立, 应使用bindings[obj_key][0] == obj或bindings[obj_key][0]._referent() is obj;
+        proxy不能被复制, 弱引用模式的对象不支持pickle和copy/deepcopy(抛出TypeError), 需要保存绑定关系时使用binding_snapshot
+    """
+    _binding_hooks = [] # 绑定变化的钩子, 见add_binding_hook
+    _method_layers = [] # 方法的包装层[(layer, {方法名: wrap})], 见add_method_layer
+    _original_methods = {} # 被包装的方法的原始定义{方法名: 类属性}
+    def __init__(self, weak_binding: bool = False):
+        """
+        param weak_binding: 是否使用弱引用绑定模式, 该模式下self只通过weakref.proxy持有绑定的对象,
+            双方都使用弱引用模式时不会形成引用循环, 对象失去外部引用后立即被回收并解除绑定, 限制见类的说明
+        """
         self.bindname = 'bindname' # BaseBinding
-        self.bindings = {} # 每个值的格式：{obj_key: (obj, self_key)} 或 {obj_key: [(obj, self_key), ...]}
+        self.bindings = {} # 每个值的格式：{obj_key: (obj, self_key)} 或 {obj_key: BindingList[(obj, self_key), ...]}
+        self.weak_binding = weak_binding
+
+    def _referent(self) -> 'BaseBinding':
+        """返回self, 通过弱引用代理调用时返回代理指向的对象"""
+        return self
+
+    def __reduce_ex__(self, protocol):
+        # 通过proxy序列化会得到被绑定对象的强引用副本, 与原有的绑定关系不一致, 因此直接拒绝
+        if self.__dict__.get('weak_binding'):
+            raise TypeError('weak_binding objects cannot be pickled or copied, use binding_snapshot instead')
+        return super().__reduce_ex__(protocol)
+
+    def _ref(self, obj: 'BaseBinding', obj_key: str):
+        """返回存入self.bindings的对象引用, 弱引用模式下为weakref.proxy, 对象被回收时自动删除对应的绑定"""
+        if not self.weak_binding:
+            return obj
+        obj = _unwrap(obj)
+        return weakref.proxy(obj, functools.partial(_remove_dead_binding, weakref.ref(self), obj_key, id(obj)))
+
+    def _remove_dead_binding(self, obj_key: str, obj_id: int, proxy):
+        value = self.bindings.get(obj_key)
+        if isinstance(value, BindingList):
+            value.remove_dead(obj_id, proxy)
+        elif isinstance(value, Tuple) and value[0] is proxy:
+            self.bindings[obj_key] = None
+
+    def _list_binding(self, obj_key: str) -> BindingList:
+        """返回obj_key对应的BindingList, 若为外部直接赋值的list, 则先转换为BindingList"""
+        value = self.bindings[obj_key]
+        if not isinstance(value, BindingList):
+            value = self.bindings[obj_key] = BindingList(value)
+        return value
+
+    @staticmethod
+    def add_binding_hook(hook):
+        """
+        注册绑定变化的钩子, hook需要实现on_bind(owner, obj_key, obj, self_key)和on_unbind(owner, obj_key, obj, self_key),
+        在owner.bindings[obj_key]中增加或删除与obj的单向绑定之前调用, obj为被绑定的对象本身(而不是弱引用代理)
+        弱引用模式下对象被回收时自动删除的绑定不会通知钩子
+        """
+        BaseBinding._binding_hooks = BaseBinding._binding_hooks + [hook] # 复制列表, 使遍历钩子的过程中可以增删钩子
+
+    @staticmethod
+    def remove_binding_hook(hook):
+        """注销绑定变化的钩子"""
+        BaseBinding._binding_hooks = [h for h in BaseBinding._binding_hooks if h is not hook]
+
+    @staticmethod
+    def add_method_layer(layer, wrappers: dict):
+        """
+        注册一层方法包装(例如加锁、计时), wrappers为{方法名: wrap}, wrap(method)返回替换method的函数,
+        静态方法传入和返回的都是普通函数; layer用于注销时识别, 已注册的layer再次注册时替换原有的包装
+        多层包装按注册的顺序嵌套, 后注册的在外层; 注册或注销任意一层后都从原方法重新组合剩余的层, 因此可以按任意顺序注销
+        调用时不应有其他线程正在调用被包装的方法
+        """
+        BaseBinding._method_layers = [item for item in BaseBinding._method_layers if item[0] != layer] + [(layer, dict(wrappers))]
+        BaseBinding._compose_methods()
+
+    @staticmethod
+    def remove_method_layer(layer):
+        """注销一层方法包装, 不再被任何层包装的方法恢复为原方法"""
+        BaseBinding._method_layers = [item for item in BaseBinding._method_layers if item[0] != layer]
+        BaseBinding._compose_methods()
+
+    @staticmethod
+    def _compose_methods():
+        originals = BaseBinding._original_methods
+        layers = BaseBinding._method_layers
+        names = {name for _, wrappers in layers for name in wrappers}
+        for name in names | set(originals):
+            original = originals.get(name)
+            if original is None:
+                original = originals[name] = BaseBinding.__dict__[name]
+            if name not in names:
+                setattr(BaseBinding, name, original)
+                del originals[name]
+                continue
+            static = isinstance(original, staticmethod)
+            method = original.__func__ if static else original
+            for _, wrappers in layers:
+                wrap = wrappers.get(name)
+                if wrap is not None:
+                    method = wrap(method)
+            setattr(BaseBinding, name, staticmethod(method) if static else method)
+
+    # 以下四个方法是修改self.bindings中绑定关系的唯一入口, 修改前通知已注册的钩子
+    def _set_binding(self, obj_key: str, obj: 'BaseBinding', self_key: str):
+        """将obj_key设定为与obj的单个绑定, 调用前obj_key上应没有绑定"""
+        for hook in BaseBinding._binding_hooks:
+            hook.on_bind(self, obj_key, _unwrap(obj), self_key)
+        self.bindings[obj_key] = (self._ref(obj, obj_key), self_key)
+
+    def _append_binding(self, obj_key: str, obj: 'BaseBinding', self_key: str):
+        """在obj_key对应的BindingList末尾添加与obj的绑定, 与list相同, 可以重复添加相同的(obj, self_key)"""
+        binding_list = self._list_binding(obj_key)
+        for hook in BaseBinding._binding_hooks:
+            hook.on_bind(self, obj_key, _unwrap(obj), self_key)
+        binding_list.append((self._ref(obj, obj_key), self_key))
+
+    def _remove_binding(self, obj_key: str, obj: 'BaseBinding', self_key: Optional[str] = None) -> Optional[str]:
+        """
+        解除obj_key上与obj的绑定, 返回obj访问self的key, 不存在该绑定时返回None
+        param self_key: obj访问self的key, 同一对象以多个self_key绑定在obj_key的列表中时, 优先解除与之对应的绑定, 不指定时解除最早的绑定
+        """
+        value = self.bindings.get(obj_key)
+        if type(value) is tuple:
+            if value[0] != obj:
+                return None
+            for hook in BaseBinding._binding_hooks:
+                hook.on_unbind(self, obj_key, _unwrap(obj), value[1])
+            self.bindings[obj_key] = None
+            return value[1]
+        if isinstance(value, list):
+            binding_list = self._list_binding(obj_key)
+            item = binding_list.get(obj, self_key) if self_key is not None else None
+            if item is None:
+                item = binding_list.get(obj)
+                if item is None:
+                    return None
+            for hook in BaseBinding._binding_hooks:
+                hook.on_unbind(self, obj_key, _unwrap(obj), item[1])
+            binding_list.remove_binding(obj, item[1])
+            return item[1]
+        return None
+
+    def _clear_binding(self, obj_key: str):
+        """解除obj_key上的所有绑定, 单个绑定设为None, 列表设为空的BindingList"""
+        value = self.bindings[obj_key]
+        is_list = isinstance(value, list)
+        if BaseBinding._binding_hooks:
+            for obj, self_key in (value if is_list else (value,) if type(value) is tuple else ()):
+                for hook in BaseBinding._binding_hooks:
+                    hook.on_unbind(self, obj_key, _unwrap(obj), self_key)
+        self.bindings[obj_key] = BindingList() if is_list else None
 
     def one_way_bind(self, obj: Union['BaseBinding', list['BaseBinding']], self_key: Optional[str] = None, obj_key: Optional[str] = None):
         """
@@ -31,32 +390,29 @@ class BaseBinding:
                 else:
                     raise UnexpectedBindingType(f'one_way_bind error: Unexpected Binding Type {type(obj)}')
                 
-        # 按照self.bindings值的格式，将要设定的value
-        if isinstance(obj, list):
-            value = [(o, self_key) for o in obj]
-        else:
-            value = (obj, self_key)
-
         # 如果key不存在，则新增key
         if obj_key not in self.bindings:
             if isinstance(obj, list):
-                self.bindings[obj_key] = []
+                self.bindings[obj_key] = BindingList()
             else:
                 self.bindings[obj_key] = None
 
-        # 若为list，则直接将value添加到列表中
+        # 若为list，则直接将obj添加到列表中
         if isinstance(self.bindings[obj_key], list):
-            if isinstance(value, list):
-                self.bindings[obj_key].extend(value)
-            else:
-                self.bindings[obj_key].append(value)
+            for o in (obj if isinstance(obj, list) else (obj,)):
+                self._append_binding(obj_key, o, self_key)
             return
 
         # 如果有绑定则先解除绑定(已排除key为list的情况)
         if self.bindings[obj_key] is not None:
             self.unbind(obj_key=obj_key)
         # 设定绑定
-        self.bindings[obj_key] = value
+        if isinstance(obj, list):
+            self.bindings[obj_key] = BindingList()
+            for o in obj:
+                self._append_binding(obj_key, o, self_key)
+        else:
+            self._set_binding(obj_key, obj, self_key)
 
     def bind(self, obj: Union['BaseBinding', list['BaseBinding']], self_key: Optional[str] = None, obj_key: Optional[str] = None):
         """
@@ -79,6 +435,81 @@ class BaseBinding:
         else:
             raise UnexpectedBindingType(f'bind error: Unexpected Binding Type {type(obj)}')
         
+    def _bind_one(self, obj: 'BaseBinding', self_key: str, obj_key: str):
+        """one_way_bind中obj为单个对象且key已确定的情况, 不再检查类型"""
+        current = self.bindings.get(obj_key)
+        if isinstance(current, list):
+            self._append_binding(obj_key, obj, self_key)
+            return
+        if current is not None:
+            self.unbind(obj_key=obj_key)
+        self._set_binding(obj_key, obj, self_key)
+
+    def _unbind_one(self, obj: 'BaseBinding', obj_key: str, missing_ok: bool = False, self_key: Optional[str] = None) -> Optional[str]:
+        """
+        one_way_unbind中obj为单个对象且key已确定的情况, 不再检查类型, 返回obj访问self的key
+        解除反向绑定时应指定self_key, 使同一对象以多个key绑定时只解除对应的一个
+        """
+        self_key = self._remove_binding(obj_key, obj, self_key)
+        if self_key is None and not missing_ok:
+            raise Exception('unbind error') # 不存在绑定
+        return self_key
+
+    @staticmethod
+    def bind_many(bindings):
+        """
+        批量双向绑定, 结果与依次调用obj.bind(peer, self_key, obj_key)相同
+        每个对象只做一次类型检查, 不再经过one_way_bind中对list的判断
+        param bindings: 可迭代对象, 每一项为(obj, peer)、(obj, peer, self_key)或(obj, peer, self_key, obj_key), peer只能为单个对象
+        """
+        for item in bindings:
+            obj, peer = item[0], item[1]
+            if not hasattr(obj, "bindname") or not hasattr(peer, "bindname"):
+                raise UnexpectedBindingType(f'bind_many error: Unexpected Binding Type {type(obj)}, {type(peer)}')
+            self_key = item[2] if len(item) > 2 and item[2] is not None else obj.bindname
+            obj_key = item[3] if len(item) > 3 and item[3] is not None else peer.bindname
+            obj._bind_one(peer, self_key, obj_key)
+            peer._bind_one(obj, obj_key, self_key)
+
+    @staticmethod
+    def unbind_many(bindings):
+        """
+        批量双向解除绑定, 结果与依次调用obj.unbind(peer, obj_key)相同
+        param bindings: 可迭代对象, 每一项为(obj, peer)或(obj, peer, obj_key), peer只能为单个对象
+        """
+        for item in bindings:
+            obj, peer = item[0], item[1]
+            if not hasattr(obj, "bindname") or not hasattr(peer, "bindname"):
+                raise UnexpectedBindingType(f'unbind_many error: Unexpected Binding Type {type(obj)}, {type(peer)}')
+            obj_key = item[2] if len(item) > 2 and item[2] is not None else peer.bindname
+            self_key = obj._unbind_one(peer, obj_key)
+            peer._unbind_one(obj, self_key, missing_ok=True, self_key=obj_key)
+
+    @staticmethod
+    def detach(objs):
+        """
+        解除一组对象的所有绑定, 结果与依次对每个对象调用unbind()相同
+        只对组外的对象解除反向绑定, 组内对象之间的绑定直接清空, 总时间复杂度为O(E), E为这组对象的绑定总数
+        param objs: 要解除绑定的对象的可迭代对象
+        """
+        objs = [_unwrap(obj) for obj in objs]
+        members = {id(obj) for obj in objs}
+        for obj in objs:
+            bindings = obj.bindings
+            for obj_key, value in bindings.items():
+                if value is None:
+                    continue
+                if type(value) is tuple:
+                    peer, self_key = value
+                    if id(_unwrap(peer)) not in members:
+                        peer._unbind_one(obj, self_key, missing_ok=True, self_key=obj_key)
+                    obj._clear_binding(obj_key)
+                elif isinstance(value, list):
+                    for peer, self_key in value:
+                        if id(_unwrap(peer)) not in members:
+                            peer._unbind_one(obj, self_key, missing_ok=True, self_key=obj_key)
+                    obj._clear_binding(obj_key)
+
     def one_way_unbind(self, obj: Union['BaseBinding', list['BaseBinding'], None] = None, obj_key: Optional[str] = None):
         """
         仅用于被unbind调用, 实现单向解除绑定
@@ -91,16 +522,16 @@ class BaseBinding:
             if obj_key is None:
                 for obj_key in self.bindings:
                     if isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
-                        self.bindings[obj_key] = None
+                        self._clear_binding(obj_key)
                     elif isinstance(self.bindings[obj_key], list):
-                        self.bindings[obj_key] = []
+                        self._clear_binding(obj_key)
             else:
                 if obj_key not in self.bindings or self.bindings[obj_key] is None:
                     raise Exception('unbind error') # 不存在绑定
                 elif isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
-                    self.bindings[obj_key] = None
+                    self._clear_binding(obj_key)
                 elif isinstance(self.bindings[obj_key], list):
-                    self.bindings[obj_key] = []
+                    self._clear_binding(obj_key)
                 else:
                     raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(self.bindings[obj_key])}')
         else:
@@ -122,13 +553,9 @@ class BaseBinding:
                 elif isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
                     if self.bindings[obj_key][0] != obj:
                         raise Exception('unbind error') # 不存在绑定
-                    self.bindings[obj_key] = None
-                elif isinstance(self.bindings[obj_key], list): # 时间复杂度为O(n)，可以优化
-                    for i, (item, self_key) in enumerate(self.bindings[obj_key]):
-                        if item is obj:
-                            self.bindings[obj_key].pop(i)
-                            break
-                    else:
+                    self._clear_binding(obj_key)
+                elif isinstance(self.bindings[obj_key], list):
+                    if self._remove_binding(obj_key, obj) is None:
                         raise Exception('unbind error') # 不存在绑定
                 else:
                     raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(self.bindings[obj_key])}')
@@ -138,13 +565,9 @@ class BaseBinding:
                 elif isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
                     if self.bindings[obj_key][0] != obj:
                         raise Exception('unbind error')
-                    self.bindings[obj_key] = None
-                elif isinstance(self.bindings[obj_key], list): # 时间复杂度为O(n)，可以优化
-                    for i, (item, self_key) in enumerate(self.bindings[obj_key]):
-                        if item is obj:
-                            self.bindings[obj_key].pop(i)
-                            break
-                    else:
+                    self._clear_binding(obj_key)
+                elif isinstance(self.bindings[obj_key], list):
+                    if self._remove_binding(obj_key, obj) is None:
                         raise Exception('unbind error') # 不存在绑定
                 else:
                     raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(self.bindings[obj_key])}')
@@ -168,26 +591,26 @@ class BaseBinding:
                 for obj_key in self.bindings:
                     if isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
                         self_key = self.bindings[obj_key][1]
-                        self.bindings[obj_key][0].one_way_unbind(self, self_key)
-                        self.bindings[obj_key] = None
+                        self.bindings[obj_key][0]._unbind_one(self, self_key, self_key=obj_key)
+                        self._clear_binding(obj_key)
                     elif isinstance(self.bindings[obj_key], list):
                         for o in self.bindings[obj_key]:
                             self_key = o[1]
-                            o[0].one_way_unbind(self, self_key)
-                        self.bindings[obj_key] = []
+                            o[0]._unbind_one(self, self_key, self_key=obj_key)
+                        self._clear_binding(obj_key)
             else:
                 # 当不指定obj但指定key时, 解除对应key的所有绑定
                 if obj_key not in self.bindings or self.bindings[obj_key] is None:
                     raise Exception('unbind error') # 不存在绑定
                 elif isinstance(self.bindings[obj_key], Tuple) and hasattr(self.bindings[obj_key][0], "bindname"):
                     self_key = self.bindings[obj_key][1]
-                    self.bindings[obj_key][0].one_way_unbind(self, self_key)
-                    self.bindings[obj_key] = None
+                    self.bindings[obj_key][0]._unbind_one(self, self_key, self_key=obj_key)
+                    self._clear_binding(obj_key)
                 elif isinstance(self.bindings[obj_key], list):
                     for o in self.bindings[obj_key]:
                         self_key = o[1]
-                        o[0].one_way_unbind(self, self_key)
-                    self.bindings[obj_key] = []
+                        o[0]._unbind_one(self, self_key, self_key=obj_key)
+                    self._clear_binding(obj_key)
                 else:
                     raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(self.bindings[obj_key])}')
         else:
@@ -212,26 +635,23 @@ class BaseBinding:
                 if self.bindings[obj_key][0] != obj:
                     raise Exception('unbind error') # 不存在绑定
                 self_key = self.bindings[obj_key][1]
-                self.bindings[obj_key][0].one_way_unbind(self, self_key)
-                self.bindings[obj_key] = None
-            elif isinstance(self.bindings[obj_key], list): # 时间复杂度为O(n)，可以优化
+                self.bindings[obj_key][0]._unbind_one(self, self_key, self_key=obj_key)
+                self._clear_binding(obj_key)
+            elif isinstance(self.bindings[obj_key], list):
+                binding_list = self._list_binding(obj_key)
                 if isinstance(obj, list):
                     for o in obj:
-                        for i, (item, self_key) in enumerate(self.bindings[obj_key]):
-                            if item is o:
-                                o.one_way_unbind(self, self_key)
-                                self.bindings[obj_key].pop(i)
-                                break
-                        else:
+                        item = binding_list.get(o)
+                        if item is None:
                             raise Exception('unbind error') # 不存在绑定
+                        o._unbind_one(self, item[1], self_key=obj_key)
+                        self._remove_binding(obj_key, o, item[1])
                 elif hasattr(obj, "bindname"):
-                    for i, (item, self_key) in enumerate(self.bindings[obj_key]):
-                        if item is obj:
-                            obj.one_way_unbind(self, self_key)
-                            self.bindings[obj_key].pop(i)
-                            break
-                    else:
+                    item = binding_list.get(obj)
+                    if item is None:
                         raise Exception('unbind error') # 不存在绑定
+                    obj._unbind_one(self, item[1], self_key=obj_key)
+                    self._remove_binding(obj_key, obj, item[1])
                 else:
                     raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(obj)}')
             else:
@@ -260,11 +680,7 @@ class BaseBinding:
             else:
                 return False
         elif isinstance(self.bindings[obj_key], list):
-            for o in self.bindings[obj_key]:
-                if o[0] == obj:
-                    return True
-            else:
-                return False
+            return self._list_binding(obj_key).get(obj) is not None
         else:
             raise UnexpectedBindingType(f'is_bound error: Unexpected Binding Type {type(self.bindings[obj_key])}')
         
@@ -292,7 +708,7 @@ class BaseBinding:
                     if fix:
                         self_key = self.bindings[obj_key][1]
                         # 由于self对obj的绑定仍然存在，仅修复obj对self的单向绑定one_way_bind
-                        self.bindings[obj_key][0].one_way_bind(obj=self, objkey=self_key, self_key=obj_key)
+                        self.bindings[obj_key][0].one_way_bind(obj=self, obj_key=self_key, self_key=obj_key)
                         return False
                     else:
                         return False
@@ -304,10 +720,11 @@ class BaseBinding:
                         if fix:
                             self_key = o[1]
                             # 由于self对obj的绑定仍然存在，仅修复obj对self的单向绑定one_way_bind
-                            o[0].one_way_bind(obj=self, objkey=self_key, self_key=obj_key)
+                            o[0].one_way_bind(obj=self, obj_key=self_key, self_key=obj_key)
                             return False
                         else:
                             return False
+                return True
                         
         if obj is None:
             if obj_key is None:
@@ -319,6 +736,7 @@ class BaseBinding:
                         for o in self.bindings[obj_key]:
                             if not single_check_one_way_binding(self, o[0], obj_key, fix):
                                 return False
+                return True
             else:
                 if obj_key not in self.bindings or self.bindings[obj_key] is None:
                     return False
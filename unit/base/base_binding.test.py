@@ -1,4 +1,23 @@
-from base_binding import BaseBinding, UnexpectedBindingType
+from base_binding import BaseBinding, BindingList, UnexpectedBindingType
+from binding_graph import BindingGraph
+from binding_checker import BindingChecker, find_violations
+from binding_events import BindingEventBus
+from binding_transaction import BindingTransaction
+import binding_locks
+from binding_locks import enable_thread_safety, disable_thread_safety, binding_lock
+from binding_stats import enable_instrumentation, disable_instrumentation, get_stats
+from binding_snapshot import dump_snapshot, load_snapshot_bytes, save_snapshot, load_snapshot
+import gc
+import json
+import tracemalloc
+import weakref
+import random
+import os
+import tempfile
+import pickle
+import copy
+import sys
+import threading
 import pytest
 
 
@@ -100,6 +119,732 @@ def test_unbind_errors():
     with pytest.raises(Exception):
         obj3.unbind(obj_key="key1")
 
+def test_binding_list():
+    # Test list bindings keep insertion order and behave like a list of tuples
+    hub = BaseBinding()
+    children = [BaseBinding() for _ in range(10)]
+    hub.bind(children[:5])
+    hub.bind(children[5:])
+    assert isinstance(hub.bindings["bindname"], BindingList)
+    assert hub.bindings["bindname"] == [(child, "bindname") for child in children]
+    assert len(hub.bindings["bindname"]) == 10
+    assert hub.bindings["bindname"][3] == (children[3], "bindname")
+    assert (children[3], "bindname") in hub.bindings["bindname"]
+
+    # Test unbinding from the middle keeps the order of the rest
+    hub.unbind([children[2], children[7]])
+    hub.unbind(children[0])
+    remaining = [child for i, child in enumerate(children) if i not in (0, 2, 7)]
+    assert hub.bindings["bindname"] == [(child, "bindname") for child in remaining]
+    assert not hub.is_bound(children[2])
+    assert children[2].bindings["bindname"] is None
+    assert all(hub.is_bound(child) and child.is_bound(hub) for child in remaining)
+    with pytest.raises(Exception):
+        hub.unbind(children[2])
+
+    # Test a plain list assigned from outside is converted on use
+    obj1 = BaseBinding()
+    obj2 = BaseBinding()
+    obj1.bindings["key1"] = []
+    obj1.bind([obj2], obj_key="key1")
+    assert isinstance(obj1.bindings["key1"], BindingList)
+    assert obj1.is_bound(obj2, obj_key="key1")
+
+    # Test rebinding the same pair keeps one entry and moves it to the end, the same as with a plain list
+    hub = BaseBinding()
+    child = BaseBinding()
+    other = BaseBinding()
+    hub.bind([child, other], "hub", "kids")
+    hub.bind([child], "hub", "kids")
+    assert hub.bindings["kids"] == [(other, "hub"), (child, "hub")]
+    assert hub.is_bound(child, "kids") and child.is_bound(hub, "hub")
+    hub.unbind(other, "kids")
+
+    # Test the same object bound under one key with different self_keys keeps one entry per self_key
+    hub.bind([child], "hub2", "kids")
+    assert hub.bindings["kids"] == [(child, "hub"), (child, "hub2")]
+    assert child.bindings["hub"] == (hub, "kids") and child.bindings["hub2"] == (hub, "kids")
+    assert find_violations([hub, child]) == []
+    child.unbind(hub, "hub2")
+    assert hub.bindings["kids"] == [(child, "hub")]
+    assert find_violations([hub, child]) == []
+    hub.bind([child], "hub2", "kids")
+    hub.unbind(child, "kids")
+    assert hub.bindings["kids"] == [(child, "hub2")]
+    assert child.bindings["hub"] is None and child.bindings["hub2"] == (hub, "kids")
+    hub.bind([child], "hub", "kids")
+    child.unbind()
+    assert hub.bindings["kids"] == []
+    hub.bind([child], "hub", "kids")
+    hub.bind([child], "hub2", "kids")
+    hub.unbind() # __del__中的调用
+    assert hub.bindings["kids"] == []
+    assert child.bindings["hub"] is None and child.bindings["hub2"] is None
+
+    # Test one_way_bind on a list appends duplicates, the same as with a plain list
+    a, b = BaseBinding(), BaseBinding()
+    a.one_way_bind([b], "a", "bs")
+    a.one_way_bind([b], "a", "bs")
+    assert a.bindings["bs"] == [(b, "a"), (b, "a")]
+    a.one_way_unbind(b, "bs")
+    assert a.bindings["bs"] == [(b, "a")]
+    a.one_way_unbind(b, "bs")
+
+    # Test BindingList is a list and keeps the index in sync with every list operation
+    x, y, z = BaseBinding(), BaseBinding(), BaseBinding()
+    items = BindingList([(x, "a"), (y, "a"), (x, "b"), (x, "c")])
+    assert isinstance(items, list) and isinstance(a.bindings["bs"], list)
+    assert items.get(x) == (x, "a") and items.get(x, "c") == (x, "c") and items.get(y, "b") is None
+    assert items.remove_binding(x) == (x, "a") and items.get(x) == (x, "b")
+    items.append((x, "a"))
+    assert items == [(y, "a"), (x, "b"), (x, "c"), (x, "a")] and items.get(x) == (x, "b")
+    items.remove((x, "c"))
+    assert items.copy() == [(y, "a"), (x, "b"), (x, "a")] and type(items.copy()) is BindingList
+    assert (x, "a") in items and (x, "c") not in items
+    with pytest.raises(ValueError):
+        items.remove((y, "b"))
+    assert items.index((x, "b")) == 1 and items.count((x, "a")) == 1
+    items.insert(0, (z, "a"))
+    assert items[0] == (z, "a") and items.get(z) == (z, "a") and items.index((y, "a")) == 1
+    assert items.pop() == (x, "a") and items.get(x) == (x, "b")
+    assert items.pop(0) == (z, "a") and items.get(z) is None
+    items.extend([(z, "a"), (x, "b")])
+    assert items == [(y, "a"), (x, "b"), (z, "a"), (x, "b")]
+    items.remove((x, "b"))
+    assert items == [(y, "a"), (z, "a"), (x, "b")] and items.get(x) == (x, "b")
+    items.reverse()
+    assert items.get(x) == (x, "b") and items[0] == (x, "b")
+    del items[0]
+    assert items.get(x) is None and items == [(z, "a"), (y, "a")]
+    items[1] = (x, "d")
+    assert items.get(y) is None and items.get(x) == (x, "d")
+    items += [(y, "e")]
+    assert items.get(y) == (y, "e") and len(items) == 3
+    items.clear()
+    assert items == [] and items.get(x) is None
+
+    # Test positions stay correct across many removals from the middle (the index is rebuilt periodically)
+    objs = [BaseBinding() for _ in range(300)]
+    items = BindingList([(o, "a") for o in objs])
+    for o in objs[::2]:
+        items.remove_binding(o)
+    items.append((objs[0], "b"))
+    assert items == [(o, "a") for o in objs[1::2]] + [(objs[0], "b")]
+    assert all(items.get(o) == (o, "a") for o in objs[1::2]) and items.get(objs[0]) == (objs[0], "b")
+
+
+def test_weak_binding():
+    # 关闭循环垃圾回收, 只依靠引用计数释放对象
+    gc.disable()
+    try:
+        # Test dropping the last reference frees a weakly bound unit immediately
+        hub = BaseBinding(weak_binding=True)
+        unit = BaseBinding(weak_binding=True)
+        hub.bind([unit], self_key="hub")
+        assert hub.is_bound(unit)
+        assert unit.is_bound(hub, obj_key="hub")
+        unit_ref = weakref.ref(unit)
+        del unit
+        assert unit_ref() is None
+        assert hub.bindings["bindname"] == []
+        unit = BaseBinding(weak_binding=True)
+        hub.bind([unit], self_key="hub")
+        hub.bind([unit], self_key="hub2")
+        assert len(hub.bindings["bindname"]) == 2
+        del unit
+        assert hub.bindings["bindname"] == []
+
+        # Test unbinding through the stored proxy
+        unit = BaseBinding(weak_binding=True)
+        hub.bind([unit], self_key="hub")
+        hub.unbind(hub.bindings["bindname"][0][0])
+        assert not hub.is_bound(unit)
+        assert unit.bindings["hub"] is None
+
+        # Test memory does not grow over churn
+        def churn():
+            for _ in range(1000):
+                a = BaseBinding(weak_binding=True)
+                b = BaseBinding(weak_binding=True)
+                a.bind(b, self_key="partner", obj_key="partner")
+                hub.bind([a], self_key="hub")
+
+        tracemalloc.start()
+        churn()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in range(5):
+            churn()
+        growth = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        assert growth < 10000
+        assert len(hub.bindings["bindname"]) <= 1
+
+        # Test bindings hold proxies: identity needs _referent(), equality works directly, copying is refused
+        a = BaseBinding(weak_binding=True)
+        b = BaseBinding(weak_binding=True)
+        a.bind(b, "a", "b")
+        a.bind([b], "a2", "bs")
+        assert a.bindings["b"][0] is not b and a.bindings["b"][0] == b
+        assert a.bindings["b"][0]._referent() is b and a.bindings["bs"][0][0]._referent() is b
+        assert b.bindings["a"][0]._referent() is a and a.is_bound(b, "b") and a.is_bound(b, "bs")
+        for copier in (pickle.dumps, copy.copy, copy.deepcopy):
+            with pytest.raises(TypeError):
+                copier(a)
+        a.unbind()
+    finally:
+        gc.enable()
+
+def snapshot(objs):
+    """用对象在objs中的下标表示所有绑定, 便于比较两个结构相同的图"""
+    index = {id(obj): i for i, obj in enumerate(objs)}
+    result = []
+    for obj in objs:
+        state = {}
+        for key, value in obj.bindings.items():
+            if value is None or isinstance(value, tuple):
+                state[key] = value if value is None else (index[id(value[0])], value[1])
+            else:
+                state[key] = [(index[id(peer)], self_key) for peer, self_key in value]
+        result.append(state)
+    return result
+
+def build_random_graph(seed, bulk=False):
+    rng = random.Random(seed)
+    objs = [BaseBinding() for _ in range(40)]
+    for i, obj in enumerate(objs[:5]):
+        obj.bind(objs[5 + i * 7: 12 + i * 7], self_key="leader", obj_key="members")
+    pairs = [(rng.choice(objs), rng.choice(objs), "link%d" % rng.randrange(3), "link%d" % rng.randrange(3)) for _ in range(30)]
+    pairs = [pair for pair in pairs if pair[0] is not pair[1]]
+    if bulk:
+        BaseBinding.bind_many(pairs)
+    else:
+        for obj, peer, self_key, obj_key in pairs:
+            obj.bind(peer, self_key, obj_key)
+    return objs
+
+def test_bulk_operations():
+    # Test bind_many matches calling bind one by one
+    assert snapshot(build_random_graph(1)) == snapshot(build_random_graph(1, bulk=True))
+
+    # Test detach matches calling unbind() on every object of the group
+    for seed in range(5):
+        objs = build_random_graph(seed)
+        expected = build_random_graph(seed)
+        group = random.Random(seed).sample(range(40), 12)
+        for i in group:
+            expected[i].unbind()
+        BaseBinding.detach([objs[i] for i in group])
+        assert snapshot(objs) == snapshot(expected)
+
+    # Test unbind_many matches calling unbind one by one
+    hub = BaseBinding()
+    children = [BaseBinding() for _ in range(5)]
+    BaseBinding.bind_many([(hub, child, "hub", "child%d" % i) for i, child in enumerate(children)])
+    assert all(hub.is_bound(child, "child%d" % i) and child.is_bound(hub, "hub") for i, child in enumerate(children))
+    BaseBinding.unbind_many([(hub, child, "child%d" % i) for i, child in enumerate(children[:3])])
+    assert all(hub.bindings["child%d" % i] is None and children[i].bindings["hub"] is None for i in range(3))
+    assert hub.is_bound(children[3], "child3") and children[4].is_bound(hub, "hub")
+    with pytest.raises(Exception):
+        BaseBinding.unbind_many([(hub, children[0], "child0")])
+    with pytest.raises(UnexpectedBindingType):
+        BaseBinding.bind_many([(hub, "not a BaseBinding object")])
+
+
+def test_binding_graph():
+    # 已存在的绑定通过add_existing加入
+    a, b = BaseBinding(), BaseBinding()
+    a.bind(b, "a", "b")
+    graph = BindingGraph()
+    try:
+        graph.add_existing([a, b])
+        assert graph.neighbors(a, "b") == [b] and graph.neighbors(b, "a") == [a]
+        assert graph.edge_count == 2
+
+        # bind/unbind/detach的变化都会同步到图中
+        hub = BaseBinding()
+        children = [BaseBinding() for _ in range(5)]
+        hub.bind(children, "hub", "children")
+        hub.bind(a, "hub", "a")
+        assert graph.neighbors(hub, "children") == children
+        assert set(map(id, graph.objects_with_key("hub"))) == set(map(id, children + [a]))
+        assert set(map(id, graph.reachable(children[0]))) == set(map(id, children + [hub, a, b]))
+        assert graph.reachable(children[0], "hub") == [children[0], hub]
+        assert len(graph.connected_components()) == 1
+        assert len(graph.connected_components("children")) == 1
+        assert graph.edge_count == 2 + 2 * 6
+
+        hub.unbind(children[0], "children")
+        assert graph.neighbors(children[0]) == [] and children[0] not in graph.neighbors(hub)
+        hub.unbind(obj_key="a")
+        assert graph.neighbors(a) == [b]
+        assert len(graph.connected_components()) == 2
+        BaseBinding.detach([hub] + children[1:3])
+        assert graph.neighbors(hub) == [] and graph.neighbors(children[3]) == []
+        assert graph.edges("children") == [] and graph.objects_with_key("hub") == []
+        assert graph.edge_count == 2
+
+        # 重复绑定同一对象不会产生重复的边, 对象被回收后节点被释放
+        c = BaseBinding()
+        c.bind(a, "c", "a")
+        c.bind(a, "c", "a")
+        assert graph.neighbors(c) == [a] and graph.edge_count == 4
+        c.unbind()
+        size = len(graph)
+        del c
+        gc.collect()
+        assert len(graph) == size - 1 and graph.edge_count == 2
+
+        # 同一对象以多个self_key绑定时, 解除其中一个不影响其余的边
+        c = BaseBinding()
+        a.bind([c], "x", "kids")
+        a.bind([c], "y", "kids")
+        assert graph.neighbors(a, "kids") == [c] and graph.edge_count == 6
+        c.unbind(a, "y")
+        assert graph.neighbors(a, "kids") == [c] and graph.neighbors(c, "x") == [a]
+        assert graph.neighbors(c, "y") == [] and graph.edge_count == 4
+        a.unbind(c, "kids")
+        assert graph.neighbors(a, "kids") == [] and graph.edge_count == 2
+
+        # 列表中重复的绑定每个算作一条边
+        a.one_way_bind([c], "x", "kids")
+        a.one_way_bind([c], "x", "kids")
+        assert graph.neighbors(a, "kids") == [c] and graph.edge_count == 4
+        a.one_way_unbind(c, "kids")
+        assert graph.neighbors(a, "kids") == [c] and graph.edge_count == 3
+        a.one_way_unbind(c, "kids")
+        assert graph.neighbors(a, "kids") == [] and graph.edge_count == 2
+    finally:
+        graph.uninstall()
+    assert BaseBinding._binding_hooks == []
+
+    # 随机图上与bindings逐项比对
+    graph = BindingGraph()
+    try:
+        objs = build_random_graph(7)
+        for obj in objs:
+            for obj_key, value in obj.bindings.items():
+                if isinstance(value, tuple):
+                    assert graph.neighbors(obj, obj_key) == [value[0]]
+                elif isinstance(value, BindingList):
+                    assert graph.neighbors(obj, obj_key) == [o for o, _ in value]
+    finally:
+        graph.uninstall()
+
+
+def test_binding_checker():
+    # 修复模式下check_one_way_binding补上反向绑定
+    a, b = BaseBinding(), BaseBinding()
+    a.bind(b, "a", "b")
+    b.bindings["a"] = None
+    assert not a.check_one_way_binding(fix=True)
+    assert b.is_bound(a, "a") and a.check_one_way_binding(fix=False)
+
+    objs = build_random_graph(3)
+    assert find_violations(objs) == []
+    checker = BindingChecker()
+    try:
+        # 制造三种问题: 缺少单个反向绑定、缺少列表中的反向绑定、反向绑定的key不一致
+        leader = objs[0]
+        member = leader.bindings["members"][0][0]
+        member.bindings["leader"] = None
+        member2 = leader.bindings["members"][1][0]
+        leader.bindings["members"].remove(leader.bindings["members"][1])
+        x, y = BaseBinding(), BaseBinding()
+        x.bind(y, "x", "y")
+        y.bindings["x"] = (x, "other")
+        violations = checker.check(objs + [x, y])
+        assert sorted((v.kind, v.obj_key) for v in violations) == [("conflict", "y"), ("missing", "leader"), ("missing", "members"), ("missing", "x")]
+
+        checker.check(objs + [x, y], fix=True)
+        assert find_violations(objs + [x, y]) == []
+        assert member.is_bound(leader, "leader") and leader.is_bound(member2, "members")
+        # key不一致时删除冲突的单向绑定, 并补上另一方向缺少的绑定
+        assert not x.is_bound(y, "y") and y.is_bound(x, "x") and x.is_bound(y, "other")
+
+        # 增量模式只检查发生过绑定变化的对象
+        checker.check_dirty()
+        assert checker.dirty_count == 0
+        objs[1].bind(objs[2], "p", "q")
+        assert checker.dirty_count == 2 and checker.check_dirty() == []
+        objs[2].bindings["p"] = None # 直接修改不会被记录
+        assert checker.check_dirty() == []
+        checker.mark_dirty(objs[1])
+        assert [(v.kind, v.obj_key) for v in checker.check_dirty(fix=True)] == [("missing", "q")]
+        assert checker.check(objs) == []
+
+        # 列表中的同一对象以多个key绑定时, 按(owner, key)分别检查
+        hub, child = BaseBinding(), BaseBinding()
+        child.bind([hub], "hub", "kids")
+        child.bind([hub], "hub2", "kids")
+        assert checker.check([hub, child]) == []
+        child.bindings["kids"].remove((hub, "hub2"))
+        assert [(v.kind, v.obj_key) for v in checker.check([hub, child], fix=True)] == [("missing", "hub2")]
+        assert child.bindings["kids"] == [(hub, "hub"), (hub, "hub2")] and checker.check([hub, child]) == []
+    finally:
+        checker.uninstall()
+
+
+def test_snapshot():
+    objs = build_random_graph(5)
+    objs[0].bindings["empty"] = None
+    objs[1].bindings["empty_list"] = BindingList()
+    expected = snapshot(objs)
+    # 快照中只包含objs时恢复出的结构相同, 新建的对象类型和bindname与原对象相同
+    restored = load_snapshot_bytes(dump_snapshot(objs))
+    assert len(restored) == len(objs) and snapshot(restored) == expected
+    assert all(type(obj) is BaseBinding and obj.bindname == "bindname" for obj in restored)
+    assert isinstance(restored[0].bindings["members"], BindingList)
+    assert find_violations(restored) == []
+
+    # 只给出一个对象时, 通过绑定发现的对象追加在后面
+    restored = load_snapshot_bytes(dump_snapshot(objs[:1]))
+    assert len(restored) == len(objs) - sum(1 for obj in objs if not obj.bindings)
+
+    # 恢复到已存在的对象上, 并通过mmap读取文件
+    targets = [BaseBinding() for _ in objs]
+    fd, path = tempfile.mkstemp(suffix=".bin")
+    os.close(fd)
+    try:
+        save_snapshot(objs, path)
+        assert load_snapshot(path, targets) == targets
+        assert snapshot(targets) == expected
+        assert snapshot(load_snapshot(path, use_mmap=False)) == expected
+    finally:
+        os.remove(path)
+
+    # 弱引用模式的节点恢复后仍为弱引用模式
+    gc.disable()
+    try:
+        hub = BaseBinding(weak_binding=True)
+        children = [BaseBinding(weak_binding=True) for _ in range(3)]
+        hub.bind(children, "hub", "children")
+        restored = load_snapshot_bytes(dump_snapshot([hub] + children))
+        assert restored[0].weak_binding and restored[0].is_bound(restored[1], "children")
+        del restored[3]
+        assert len(restored[0].bindings["children"]) == 2
+    finally:
+        gc.enable()
+
+    with pytest.raises(ValueError):
+        load_snapshot_bytes(b"not a snapshot" * 4)
+
+    # pickle后BindingList以新对象的id为键
+    restored = pickle.loads(pickle.dumps(objs))
+    assert snapshot(restored) == expected
+    leader = restored[0]
+    member = leader.bindings["members"][0][0]
+    leader.unbind(member, "members")
+    assert not member.is_bound(leader, "leader")
+
+    # 恢复到已存在的对象时, 先解除其原有的绑定, 快照外的对象和钩子都会同步
+    a, b = BaseBinding(), BaseBinding()
+    empty = dump_snapshot([BaseBinding()])
+    graph = BindingGraph()
+    try:
+        a.bind(b, "a", "b")
+        load_snapshot_bytes(empty, [a])
+        assert a.bindings == {} and b.bindings["a"] is None
+        assert graph.neighbors(a, "b") == [] and graph.neighbors(b, "a") == [] and graph.edge_count == 0
+    finally:
+        graph.uninstall()
+
+
+def test_event_bus():
+    bus = BindingEventBus()
+    received = []
+    members_received = []
+    a, b = BaseBinding(), BaseBinding()
+    a.bind(b, "a", "b") # 没有监听者时不记录
+    assert BaseBinding._binding_hooks == [] and bus.pending_count == 0
+
+    bus.subscribe(received.append)
+    bus.subscribe(members_received.append, "members")
+    try:
+        leader = BaseBinding()
+        members = [BaseBinding() for _ in range(3)]
+        leader.bind(members, "leader", "members")
+        a.unbind(b, "b")
+        assert bus.pending_count == 3 * 2 + 2 and received == []
+        assert bus.flush() == 8 and bus.flush() == 0
+        assert len(received) == 1 and len(received[0]) == 8
+        assert [(e.kind, e.obj_key) for e in members_received[0]] == [("bind", "members")] * 3
+        assert members_received[0][0].owner is leader and members_received[0][0].obj is members[0]
+        assert {(e.kind, e.obj_key) for e in received[0][6:]} == {("unbind", "b"), ("unbind", "a")}
+
+        # 同一批中先绑定后解除的边相互抵消
+        leader.unbind(members[0], "members")
+        leader.bind([members[0]], "leader", "members")
+        c = BaseBinding()
+        c.bind(a, "c", "a")
+        c.unbind(a, "a")
+        assert bus.flush() == 0 and len(received) == 1
+    finally:
+        bus.unsubscribe(received.append)
+        bus.unsubscribe(members_received.append, "members")
+    assert BaseBinding._binding_hooks == []
+
+    # 只订阅部分key时, 其他key的变化不进入队列
+    bus = BindingEventBus(coalesce=False)
+    bus.subscribe(members_received.append, "members")
+    try:
+        a.bind(b, "a", "b")
+        assert bus.pending_count == 0
+        leader.unbind(members[1], "members")
+        leader.bind([members[1]], "leader", "members")
+        assert bus.flush() == 2
+        assert [e.kind for e in members_received[-1]] == ["unbind", "bind"]
+    finally:
+        bus.unsubscribe(members_received.append, "members")
+
+
+def test_transaction():
+    # 事务的结果与依次调用bind/unbind相同
+    def run(use_transaction):
+        objs = [BaseBinding() for _ in range(6)]
+        ops = [("bind", 0, objs[1:4], "leader", "members"), ("bind", 4, objs[5], "a", "b"),
+               ("unbind", 0, objs[2], "members"), ("bind", 4, objs[1], "a", "b"),
+               ("bind", 0, objs[1:2], "leader", "members"), ("bind", 0, [objs[5]], "leader", "members")]
+        if use_transaction:
+            with BindingTransaction() as tx:
+                for op in ops:
+                    getattr(tx, op[0])(objs[op[1]], *op[2:])
+        else:
+            for op in ops:
+                getattr(objs[op[1]], op[0])(*op[2:])
+        return snapshot(objs)
+    assert run(True) == run(False)
+
+    # 钩子在应用之后按槽位通知事务前后的差异, 事务中先绑定后解除的绑定不产生通知
+    class Recorder:
+        def __init__(self):
+            self.events = []
+        def on_bind(self, owner, obj_key, obj, self_key):
+            self.events.append(("bind", owner, obj_key, obj, self_key))
+        def on_unbind(self, owner, obj_key, obj, self_key):
+            self.events.append(("unbind", owner, obj_key, obj, self_key))
+    a, b, c = BaseBinding(), BaseBinding(), BaseBinding()
+    a.bind(b, "a", "b")
+    recorder = Recorder()
+    BaseBinding.add_binding_hook(recorder)
+    try:
+        with BindingTransaction() as tx:
+            tx.bind(a, [c], "a", "cs")
+            tx.unbind(a, [c], "cs")
+            tx.bind(a, c, "a", "b")
+        assert sorted(recorder.events, key=lambda e: (e[0], id(e[1]))) == sorted([
+            ("unbind", a, "b", b, "a"), ("unbind", b, "a", a, "b"), ("bind", a, "b", c, "a"), ("bind", c, "a", a, "b")],
+            key=lambda e: (e[0], id(e[1])))
+        assert a.bindings["cs"] == [] and c.bindings["a"] == (a, "b") and b.bindings["a"] is None
+    finally:
+        BaseBinding.remove_binding_hook(recorder)
+    a.unbind()
+
+    objs = build_random_graph(11)
+    expected = snapshot(objs)
+    graph = BindingGraph()
+    graph.add_existing(objs)
+    edges = graph.edge_count
+    try:
+        # 类型检查在修改任何绑定之前完成
+        tx = BindingTransaction()
+        tx.bind(objs[0], objs[20], "x", "y")
+        tx.bind(objs[1], [objs[2], "not a BaseBinding object"], "x", "y")
+        with pytest.raises(UnexpectedBindingType):
+            tx.commit()
+        assert len(tx) == 2 and snapshot(objs) == expected
+
+        # 应用过程中出错时恢复全部修改, 包括替换单个绑定时对原绑定对象的解除, 并通知其他钩子
+        target = next(obj for obj in objs if isinstance(obj.bindings.get("link0"), tuple))
+        tx.discard()
+        tx.bind(objs[0], objs[20], "x", "y")
+        tx.bind(target, objs[39], "z", "link0")
+        tx.bind(objs[3], objs[1:5], "q", "group")
+        tx.unbind(objs[6], objs[7], "no such key")
+        with pytest.raises(Exception, match="unbind error"):
+            tx.commit()
+        assert snapshot(objs) == expected and "y" not in objs[0].bindings and "group" not in objs[3].bindings
+        assert graph.edge_count == edges and graph.neighbors(objs[0], "y") == []
+
+        # with块中抛出异常时不应用任何操作
+        with pytest.raises(RuntimeError):
+            with BindingTransaction() as tx:
+                tx.bind(objs[0], objs[20], "x", "y")
+                raise RuntimeError()
+        assert snapshot(objs) == expected
+    finally:
+        graph.uninstall()
+    assert BaseBinding._binding_hooks == []
+
+    # 没有钩子时直接写入bindings, 出错时同样恢复
+    tx = BindingTransaction()
+    tx.bind(objs[3], objs[1:5], "q", "group")
+    tx.bind(target, objs[39], "z", "link0")
+    tx.unbind(objs[6], objs[7], "no such key")
+    with pytest.raises(Exception, match="unbind error"):
+        tx.commit()
+    assert snapshot(objs) == expected
+
+
+def run_binding_workers(objs, thread_num, op_num, seed):
+    """多个线程随机对objs做bind/unbind/detach, 返回各线程中出现的非预期异常"""
+    errors = []
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        try:
+            for _ in range(op_num):
+                a, b = rng.sample(objs, 2)
+                op = rng.random()
+                if op < 0.4:
+                    a.bind(b, "link%d" % rng.randrange(3), "link%d" % rng.randrange(3))
+                elif op < 0.6:
+                    # 同一对象可能以不同的self_key重复绑定在members中
+                    a.bind([b], "leader%d" % rng.randrange(2), "members")
+                elif op < 0.95:
+                    try:
+                        a.unbind(obj_key=rng.choice(["link0", "link1", "link2", "members", "leader0", "leader1"]))
+                    except Exception as e:
+                        if str(e) != "unbind error": # 没有绑定时的异常是预期的
+                            raise
+                else:
+                    BaseBinding.detach([a])
+        except BaseException as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_num)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def test_thread_safety():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # 频繁切换线程, 使竞争更容易出现
+    enable_thread_safety(stripe_num=8)
+    try:
+        for seed in range(3):
+            objs = [BaseBinding() for _ in range(30)]
+            assert run_binding_workers(objs, thread_num=8, op_num=1500, seed=seed) == []
+            assert find_violations(objs) == []
+
+        # binding_lock中的组合操作对其他线程整体原子, 修改未锁定的对象时抛出异常
+        a, b = BaseBinding(), BaseBinding()
+        with binding_lock([a, b]):
+            a.bind(b, "a", "b")
+            with BindingTransaction() as tx:
+                tx.unbind(a, b, "b")
+                tx.bind(a, [b], "a", "members")
+        assert a.is_bound(b, "members") and b.is_bound(a, "a")
+        # 修改未锁定的对象时, 若其锁被其他线程占用则抛出异常
+        candidates = [BaseBinding() for _ in range(20)]
+        c = next(obj for obj in candidates if not binding_locks._locks.stripes([obj]) <= binding_locks._locks.stripes([a, b]))
+        locked, release = threading.Event(), threading.Event()
+        def hold_c():
+            with binding_lock([c]):
+                locked.set()
+                release.wait()
+        thread = threading.Thread(target=hold_c)
+        thread.start()
+        locked.wait()
+        try:
+            with pytest.raises(RuntimeError):
+                with binding_lock([a, b]):
+                    a.bind(c, "a", "c")
+        finally:
+            release.set()
+            thread.join()
+        assert not a.is_bound(c, "c")
+        with binding_lock([a, b]):
+            a.bind(c, "a", "c")
+        assert a.is_bound(c, "c") and c.is_bound(a, "a")
+
+        # 持有锁时被回收的对象, 其绑定的对象的锁被其他线程占用时推迟到之后的加锁操作中解除绑定
+        held = binding_locks._locks.stripes([a, b])
+        candidates = [BaseBinding(weak_binding=True) for _ in range(20)]
+        d = next(obj for obj in candidates if not binding_locks._locks.stripes([obj]) <= held)
+        x = BaseBinding()
+        x.bind(d, "x", "d")
+        locked.clear()
+        release.clear()
+        def hold_d():
+            with binding_lock([d]):
+                locked.set()
+                release.wait()
+        thread = threading.Thread(target=hold_d)
+        thread.start()
+        locked.wait()
+        try:
+            with binding_lock([a, b]):
+                del x
+                assert len(binding_locks._deferred) == 1 and d.bindings["x"] is not None
+                release.set()
+        finally:
+            release.set()
+            thread.join()
+        assert binding_locks._deferred == [] and d.bindings["x"] is None
+    finally:
+        disable_thread_safety()
+        sys.setswitchinterval(switch_interval)
+    assert "wrapper" not in BaseBinding.bind.__code__.co_name
+
+
+def test_instrumentation():
+    hub = BaseBinding()
+    children = [BaseBinding() for _ in range(4)]
+    original_bind = BaseBinding.bind
+    stats = enable_instrumentation()
+    try:
+        assert get_stats() is stats and enable_instrumentation() is stats
+        hub.bind(children[:2], "hub", "children")
+        hub.bind(children[2:], "hub", "children")
+        hub.is_bound(children[0], "children")
+        hub.unbind(children[0], "children")
+        # bind内部解除原绑定的unbind不单独计数
+        children[1].bind(children[2], "x", "y")
+        children[1].bind(children[3], "x", "y")
+        result = stats.snapshot()
+        assert result["operations"]["bind"]["count"] == 4
+        assert result["operations"]["unbind"]["count"] == 1
+        assert result["operations"]["is_bound"]["count"] == 1
+        assert sum(result["operations"]["bind"]["histogram"].values()) == 4
+        # 扇出按导出时各槽位的当前绑定计算, 包括单个绑定和被解除后的空槽位
+        assert result["fanout"]["children"] == {"slots": 1, "mean": 3.0, "max": 3}
+        assert result["fanout"]["hub"] == {"slots": 4, "mean": 0.75, "max": 1}
+        assert result["fanout"]["x"] == {"slots": 2, "mean": 0.5, "max": 1}
+        assert json.loads(stats.to_json(reset=True)) == result
+        assert stats.snapshot() == {"operations": {}, "fanout": result["fanout"]}
+        hub.unbind(children[1], "children")
+        assert stats.snapshot()["fanout"]["children"] == {"slots": 1, "mean": 2.0, "max": 2}
+        # __del__单独计数, 其中的unbind不计入unbind
+        peer = BaseBinding(weak_binding=True) # 不持有temp的强引用, temp失去外部引用后立即被回收
+        temp = BaseBinding()
+        temp.bind(peer, "temp", "peer")
+        del temp
+        result = stats.snapshot(reset=True)
+        assert result["operations"]["__del__"]["count"] == 1
+        assert result["operations"]["unbind"]["count"] == 1
+        assert result["fanout"]["temp"] == {"slots": 1, "mean": 0.0, "max": 0}
+    finally:
+        disable_instrumentation()
+    assert get_stats() is None and BaseBinding.bind is original_bind
+    hub.bind(children[0], "children", "hub")
+    assert stats.snapshot()["operations"] == {}
+
+    # 线程安全模式和统计可以按任意顺序开启和关闭
+    original_del = BaseBinding.__dict__["__del__"]
+    for first, second in ((disable_thread_safety, disable_instrumentation), (disable_instrumentation, disable_thread_safety)):
+        enable_thread_safety()
+        stats = enable_instrumentation()
+        first()
+        hub.bind(children[3], "children", "hub")
+        hub.unbind(children[3], "hub")
+        recorded = stats.snapshot()["operations"]
+        second()
+        assert ("bind" in recorded) == (first is disable_thread_safety)
+        hub.bind(children[3], "children", "hub")
+        assert stats.snapshot()["operations"] == recorded
+        hub.unbind(children[3], "hub")
+        assert BaseBinding.bind is original_bind and BaseBinding.__dict__["__del__"] is original_del
+        assert BaseBinding._method_layers == [] and BaseBinding._original_methods == {}
 
 
 if __name__ == "__main__":
@@ -107,4 +852,14 @@ if __name__ == "__main__":
     test_unbind()
     test_bind_errors()
     test_unbind_errors()
+    test_binding_list()
+    test_weak_binding()
+    test_bulk_operations()
+    test_binding_graph()
+    test_binding_checker()
+    test_snapshot()
+    test_event_bus()
+    test_transaction()
+    test_thread_safety()
+    test_instrumentation()
     print("All tests passed!")
\ No newline at end of file
@@ -0,0 +1,299 @@
+import gc
+import os
+import sys
+import time
+import pickle
+import tempfile
+import threading
+from base_binding import BaseBinding
+from binding_graph import BindingGraph
+from binding_checker import BindingChecker, find_violations
+from binding_snapshot import save_snapshot, load_snapshot
+from binding_events import BindingEventBus
+from binding_transaction import BindingTransaction
+from binding_stats import enable_instrumentation, disable_instrumentation
+from binding_locks import enable_thread_safety, disable_thread_safety
+
+
+# 计时工具，返回函数执行的秒数
+def timeit(func, repeat=3):
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# 一个hub绑定n个子对象, 测量is_bound、逐个unbind和一次unbind整个列表的耗时
+def bench_hub_unbind(hub_sizes=(10, 100, 1000, 10000, 100000)):
+    for size in hub_sizes:
+        hub = BaseBinding()
+        children = [BaseBinding() for _ in range(size)]
+        hub.bind(children)
+        t_is_bound = timeit(lambda: [hub.is_bound(child) for child in children], repeat=1)
+        t_single = timeit(lambda: [hub.unbind(child) for child in children], repeat=1)
+        hub.bind(children)
+        t_bulk = timeit(lambda: hub.unbind(children), repeat=1)
+        print(f"hub size={size:<8} is_bound: {t_is_bound / size * 1e6:.2f}us/obj  "
+              f"unbind one by one: {t_single / size * 1e6:.2f}us/obj  unbind list: {t_bulk / size * 1e6:.2f}us/obj")
+
+
+# 解散k个小队: 每个单位逐个调用unbind() vs 一次调用detach
+def bench_detach(squad_num=1000, squad_size=10):
+    def build():
+        world = BaseBinding()
+        squads = []
+        for i in range(squad_num):
+            leader = BaseBinding()
+            members = [BaseBinding() for _ in range(squad_size)]
+            leader.bind(members, self_key="leader", obj_key="members")
+            world.bind([leader], self_key="world", obj_key="squads")
+            squads.append([leader] + members)
+        return world, squads
+
+    world, squads = build()
+    start = time.perf_counter()
+    for squad in squads:
+        for unit in squad:
+            unit.unbind()
+    t_single = time.perf_counter() - start
+    world, squads = build()
+    start = time.perf_counter()
+    for squad in squads:
+        BaseBinding.detach(squad)
+    t_bulk = time.perf_counter() - start
+    print(f"squads={squad_num} size={squad_size + 1}  unbind() per unit: {t_single * 1000:.1f}ms  "
+          f"detach per squad: {t_bulk * 1000:.1f}ms")
+
+    def new_pairs():
+        return [(BaseBinding(), BaseBinding(), "a", "b") for _ in range(squad_num * squad_size)]
+
+    pairs = new_pairs()
+    t_bind = timeit(lambda: [obj.bind(peer, self_key, obj_key) for obj, peer, self_key, obj_key in pairs], repeat=1)
+    pairs = new_pairs()
+    t_bind_many = timeit(lambda: BaseBinding.bind_many(pairs), repeat=1)
+    print(f"pairs={len(pairs)}  bind: {t_bind * 1000:.1f}ms  bind_many: {t_bind_many * 1000:.1f}ms")
+
+
+# 安装BindingGraph前后bind的耗时, 以及在图上按key遍历和求连通分量的耗时
+def bench_binding_graph(squad_num=10000, squad_size=10):
+    def build():
+        leaders = []
+        for i in range(squad_num):
+            leader = BaseBinding()
+            leader.bind([BaseBinding() for _ in range(squad_size)], self_key="leader", obj_key="members")
+            leaders.append(leader)
+        return leaders
+
+    t_plain = timeit(build, repeat=1)
+    graph = BindingGraph()
+    try:
+        leaders = []
+        t_graph = timeit(lambda: leaders.extend(build()), repeat=1)
+        t_reachable = timeit(lambda: [graph.reachable(leader, "members") for leader in leaders], repeat=1)
+        t_components = timeit(lambda: graph.connected_components(), repeat=1)
+    finally:
+        graph.uninstall()
+    print(f"edges={graph.edge_count}  bind without graph: {t_plain * 1000:.1f}ms  with graph: {t_graph * 1000:.1f}ms  "
+          f"reachable per squad: {t_reachable / squad_num * 1e6:.2f}us  connected_components: {t_components * 1000:.1f}ms")
+
+
+# 对一个hub和n个子对象, 逐个对象调用check_one_way_binding vs find_violations一次检查全图, 以及增量检查的耗时
+def bench_checker(hub_sizes=(100, 1000, 3000)):
+    for size in hub_sizes:
+        hub = BaseBinding()
+        children = [BaseBinding() for _ in range(size)]
+        hub.bind(children, self_key="hub", obj_key="children")
+        objs = [hub] + children
+        t_per_obj = timeit(lambda: [obj.check_one_way_binding(fix=False) for obj in objs], repeat=1)
+        t_scan = timeit(lambda: find_violations(objs), repeat=1)
+        checker = BindingChecker()
+        try:
+            children[0].unbind()
+            hub.bind([children[0]], "hub", "children")
+            t_dirty = timeit(checker.check_dirty, repeat=1)
+        finally:
+            checker.uninstall()
+        print(f"hub size={size:<8} check_one_way_binding per object: {t_per_obj * 1000:.2f}ms  "
+              f"find_violations: {t_scan * 1000:.2f}ms  check_dirty after one change: {t_dirty * 1000:.2f}ms")
+
+
+# 10^6条边(50000个hub各绑定10个子对象, 双向共100万条)的快照保存和恢复 vs pickle
+def bench_snapshot(hub_num=50000, hub_size=10):
+    objs = []
+    for i in range(hub_num):
+        hub = BaseBinding()
+        children = [BaseBinding() for _ in range(hub_size)]
+        hub.bind(children, self_key="hub", obj_key="children")
+        objs.append(hub)
+        objs.extend(children)
+    directory = tempfile.mkdtemp()
+    snapshot_path = os.path.join(directory, "world.bin")
+    pickle_path = os.path.join(directory, "world.pickle")
+    try:
+        t_save = timeit(lambda: save_snapshot(objs, snapshot_path), repeat=1)
+        t_load = timeit(lambda: load_snapshot(snapshot_path), repeat=1)
+        t_load_copy = timeit(lambda: load_snapshot(snapshot_path, use_mmap=False), repeat=1)
+
+        def dump_pickle():
+            with open(pickle_path, "wb") as f:
+                pickle.dump(objs, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+
+        t_pickle_save = timeit(dump_pickle, repeat=1)
+        t_pickle_load = timeit(load_pickle, repeat=1)
+        print(f"edges={hub_num * hub_size * 2}  snapshot: save {t_save * 1000:.0f}ms load(mmap) {t_load * 1000:.0f}ms "
+              f"load(read) {t_load_copy * 1000:.0f}ms size {os.path.getsize(snapshot_path) / 2 ** 20:.1f}MB  "
+              f"pickle: save {t_pickle_save * 1000:.0f}ms load {t_pickle_load * 1000:.0f}ms "
+              f"size {os.path.getsize(pickle_path) / 2 ** 20:.1f}MB")
+    finally:
+        for path in (snapshot_path, pickle_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(directory)
+
+
+# 没有监听者、订阅其他key、订阅所有变化时bind + unbind的耗时, 以及flush的耗时
+def bench_events(pair_num=100000):
+    def run():
+        pairs = [(BaseBinding(), BaseBinding()) for _ in range(pair_num)]
+        start = time.perf_counter()
+        for obj, peer in pairs:
+            obj.bind(peer, "a", "b")
+        for obj, peer in pairs:
+            obj.unbind(peer, "b")
+        return time.perf_counter() - start
+
+    t_none = run()
+    bus = BindingEventBus(coalesce=False)
+    batches = []
+    bus.subscribe(batches.append, "other")
+    t_other_key = run()
+    bus.subscribe(batches.append)
+    t_global = run()
+    t_flush = timeit(bus.flush, repeat=1)
+    bus.unsubscribe(batches.append)
+    bus.unsubscribe(batches.append, "other")
+    print(f"pairs={pair_num}  bind+unbind per pair: no listener {t_none / pair_num * 1e6:.2f}us  "
+          f"other key {t_other_key / pair_num * 1e6:.2f}us  global {t_global / pair_num * 1e6:.2f}us  "
+          f"flush {len(batches[0])} events: {t_flush * 1000:.1f}ms")
+
+
+# 同一组操作(每个小队的成员绑定到队长, 并在队长之间建立单个绑定)逐个调用 vs 放在一个事务中
+def bench_transaction(squad_num=10000, squad_size=10):
+    def new_squads():
+        return [(BaseBinding(), [BaseBinding() for _ in range(squad_size)]) for _ in range(squad_num)]
+
+    def individual(squads):
+        for i, (leader, members) in enumerate(squads):
+            leader.bind(members, "leader", "members")
+            leader.bind(squads[i - 1][0], "next", "prev")
+
+    def transaction(squads):
+        with BindingTransaction() as tx:
+            for i, (leader, members) in enumerate(squads):
+                tx.bind(leader, members, "leader", "members")
+                tx.bind(leader, squads[i - 1][0], "next", "prev")
+
+    # 两种方式都在开启垃圾回收且没有遗留垃圾的状态下计时
+    squads = new_squads()
+    gc.collect()
+    t_individual = timeit(lambda: individual(squads), repeat=1)
+    squads = new_squads()
+    gc.collect()
+    t_transaction = timeit(lambda: transaction(squads), repeat=1)
+    print(f"squads={squad_num} size={squad_size}  individual calls: {t_individual * 1000:.1f}ms  "
+          f"transaction: {t_transaction * 1000:.1f}ms")
+
+
+def bench_threads(thread_nums=(1, 2, 4, 8), pair_num=20000):
+    # 每个线程反复绑定和解除自己的一组对象, 统计总吞吐量; 受GIL限制, 多线程下的吞吐量主要反映锁的开销和冲突
+    # disjoint: 各线程的对象互不相交, 未加锁时同样安全, 作为对照; shared hub: 各线程都绑定到同一个对象, 竞争同一个锁
+    def work(pairs):
+        for a, b in pairs:
+            a.bind(b, "a", "b")
+        for a, b in pairs:
+            a.unbind(b, "b")
+
+    def work_hub(hub, objs):
+        for obj in objs:
+            hub.bind([obj], "hub", "members")
+        for obj in objs:
+            hub.unbind(obj, "members")
+
+    def run(thread_num, shared=False):
+        n = pair_num // thread_num
+        if shared:
+            hub = BaseBinding()
+            args = [(hub, [BaseBinding() for _ in range(n)]) for _ in range(thread_num)]
+        else:
+            args = [([(BaseBinding(), BaseBinding()) for _ in range(n)],) for _ in range(thread_num)]
+        threads = [threading.Thread(target=work_hub if shared else work, args=arg) for arg in args]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def throughput(thread_num, shared=False):
+        return pair_num / min(run(thread_num, shared) for _ in range(3)) / 1000
+
+    plain = [throughput(thread_num) for thread_num in thread_nums]
+    enable_thread_safety()
+    try:
+        locked = [throughput(thread_num) for thread_num in thread_nums]
+        hub = [throughput(thread_num, shared=True) for thread_num in thread_nums]
+    finally:
+        disable_thread_safety()
+    print(f"pairs={pair_num}  throughput in k pairs/s")
+    print("threads  unlocked disjoint  locked disjoint  locked shared hub")
+    for thread_num, t_plain, t_locked, t_hub in zip(thread_nums, plain, locked, hub):
+        print(f"{thread_num:>7}  {t_plain:>17.0f}  {t_locked:>15.0f}  {t_hub:>17.0f}")
+
+
+def bench_instrumentation(pair_num=100000):
+    def work(pairs):
+        for a, b in pairs:
+            a.bind(b, "a", "b")
+        for a, b in pairs:
+            a.is_bound(b, "b")
+        for a, b in pairs:
+            a.unbind(b, "b")
+
+    pairs = [(BaseBinding(), BaseBinding()) for _ in range(pair_num)]
+    t_plain = timeit(lambda: work(pairs))
+    stats = enable_instrumentation()
+    try:
+        t_enabled = timeit(lambda: work(pairs))
+    finally:
+        disable_instrumentation()
+    t_disabled = timeit(lambda: work(pairs))
+    print(f"pairs={pair_num}  before enable: {t_plain * 1000:.1f}ms  enabled: {t_enabled * 1000:.1f}ms  "
+          f"after disable: {t_disabled * 1000:.1f}ms")
+    print(f"bind p50/p99: {stats.operations['bind'].percentile(0.5)}/{stats.operations['bind'].percentile(0.99)}ns")
+
+
+BENCHMARKS = {
+    'hub_unbind': bench_hub_unbind,
+    'detach': bench_detach,
+    'binding_graph': bench_binding_graph,
+    'checker': bench_checker,
+    'snapshot': bench_snapshot,
+    'events': bench_events,
+    'transaction': bench_transaction,
+    'threads': bench_threads,
+    'instrumentation': bench_instrumentation,
+}
+
+
+if __name__ == '__main__':
+    # 用法: python base_binding_benchmark.py [benchmark名称 ...], 不指定时运行全部
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -0,0 +1,129 @@
+import weakref
+from collections import namedtuple
+
+from base_binding import BaseBinding, _unwrap
+
+
+# owner.bindings[obj_key]中存在与obj的绑定(obj访问owner的key为self_key), 但obj.bindings[self_key]中没有对应的反向绑定
+# kind为'missing'时obj.bindings[self_key]中没有(owner, obj_key), 为'conflict'时obj.bindings[self_key]是被其他对象占用的单个绑定, 或单个绑定中owner的key不是obj_key
+# 列表中的同一对象可以以多个key绑定, 因此列表中只有owner以其他key的绑定时为'missing'
+BindingViolation = namedtuple('BindingViolation', ['kind', 'owner', 'obj_key', 'obj', 'self_key'])
+
+
+def _peer_state(owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str) -> str:
+    """返回obj对owner的反向绑定的状态: 'ok', 'missing'或'conflict'"""
+    value = obj.bindings.get(self_key)
+    if value is None:
+        return 'missing'
+    if type(value) is tuple:
+        if value[0] != owner:
+            return 'conflict'
+        return 'ok' if value[1] == obj_key else 'conflict'
+    if isinstance(value, list):
+        return 'ok' if obj._list_binding(self_key).get(owner, obj_key) is not None else 'missing'
+    return 'conflict'
+
+
+def find_violations(objs) -> list[BindingViolation]:
+    """
+    检查objs中每个对象的所有绑定是否都有对应的反向绑定, 每条边只做O(1)次查询, 返回所有问题
+    param objs: 要检查的对象, 只检查这些对象发出的绑定, 被绑定的对象不必在objs中
+    """
+    violations = []
+    for owner in objs:
+        owner = _unwrap(owner)
+        for obj_key, value in owner.bindings.items():
+            if type(value) is tuple:
+                items = (value,)
+            elif isinstance(value, list):
+                items = value
+            else:
+                continue
+            for obj, self_key in items:
+                obj = _unwrap(obj)
+                state = _peer_state(owner, obj_key, obj, self_key)
+                if state != 'ok':
+                    violations.append(BindingViolation(state, owner, obj_key, obj, self_key))
+    return violations
+
+
+def repair_violation(violation: BindingViolation) -> bool:
+    """
+    修复一个问题, 返回是否修改了绑定
+    'missing'时为obj补上反向绑定; 'conflict'时无法补上反向绑定, 删除owner的单向绑定
+    修复前会重新检查状态, 因此按顺序修复find_violations的结果是安全的
+    """
+    _, owner, obj_key, obj, self_key = violation
+    if not owner.is_bound(obj, obj_key):
+        return False
+    state = _peer_state(owner, obj_key, obj, self_key)
+    if state == 'ok':
+        return False
+    if state == 'missing':
+        value = obj.bindings.get(self_key)
+        if isinstance(value, list):
+            obj._append_binding(self_key, owner, obj_key)
+        else:
+            obj.bindings[self_key] = None
+            obj._set_binding(self_key, owner, obj_key)
+    else:
+        owner._remove_binding(obj_key, obj, self_key)
+    return True
+
+
+class BindingChecker:
+    """
+    全图的双向绑定一致性检查
+    注册为绑定钩子后, 记录自上次检查以来绑定发生变化的对象, check_dirty只检查这些对象, 可以在调试模式下每帧调用
+    直接修改bindings或弱引用模式下对象被回收导致的变化不会被记录, 需要用check做全量检查
+    """
+    def __init__(self, install: bool = True):
+        """
+        param install: 是否立即注册为绑定钩子
+        """
+        self._dirty = weakref.WeakValueDictionary() # {id(obj): obj}
+        if install:
+            self.install()
+
+    def install(self):
+        """注册为绑定钩子"""
+        BaseBinding.add_binding_hook(self)
+
+    def uninstall(self):
+        """注销绑定钩子"""
+        BaseBinding.remove_binding_hook(self)
+
+    def on_bind(self, owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str):
+        self._dirty[id(owner)] = owner
+        self._dirty[id(obj)] = obj
+
+    on_unbind = on_bind
+
+    def mark_dirty(self, obj: BaseBinding):
+        """手动标记需要在下次check_dirty时检查的对象"""
+        obj = _unwrap(obj)
+        self._dirty[id(obj)] = obj
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def check(self, objs, fix: bool = False) -> list[BindingViolation]:
+        """
+        全量检查objs, 返回所有问题
+        param fix: 是否修复检查到的问题, 返回值仍为修复前的问题
+        """
+        violations = find_violations(objs)
+        if fix:
+            for violation in violations:
+                repair_violation(violation)
+        return violations
+
+    def check_dirty(self, fix: bool = False) -> list[BindingViolation]:
+        """
+        只检查自上次检查以来被标记的对象, 并清空标记
+        修复产生的绑定变化会重新标记相关对象, 下次检查时再确认
+        """
+        objs = list(self._dirty.values())
+        self._dirty.clear()
+        return self.check(objs, fix)
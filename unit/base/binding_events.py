@@ -0,0 +1,104 @@
+from collections import namedtuple
+from typing import Optional
+
+from base_binding import BaseBinding
+
+# 一次单向绑定的变化, kind为'bind'或'unbind', 含义与BaseBinding.add_binding_hook的参数相同:
+# owner.bindings[obj_key]中增加或删除了与obj的绑定, obj访问owner的key为self_key
+BindingEvent = namedtuple('BindingEvent', ['kind', 'owner', 'obj_key', 'obj', 'self_key'])
+
+
+class BindingEventBus:
+    """
+    绑定变化的订阅, 变化先缓存在队列中, 调用flush时(例如每帧结束时)按批通知监听者
+    只有存在监听者时才注册为绑定钩子, 没有监听者时bind/unbind没有额外开销
+    只订阅了部分key时, 其他key的变化不会进入队列
+    队列中的事件持有对象的强引用, 直到flush为止
+    """
+    def __init__(self, coalesce: bool = True):
+        """
+        param coalesce: flush时是否抵消同一批中同一条边先绑定后解除(或先解除后绑定)的事件对
+        """
+        self.coalesce = coalesce
+        self._global_listeners = []
+        self._key_listeners = {} # {obj_key: [listener, ...]}
+        self._pending = []
+        self._installed = False
+
+    def subscribe(self, listener, obj_key: Optional[str] = None):
+        """
+        订阅绑定变化, listener(events)在flush时以该批事件的列表调用
+        param obj_key: 只接收该key上的事件, 为None时接收所有事件
+        """
+        if obj_key is None:
+            self._global_listeners = self._global_listeners + [listener]
+        else:
+            self._key_listeners[obj_key] = self._key_listeners.get(obj_key, []) + [listener]
+        if not self._installed:
+            BaseBinding.add_binding_hook(self)
+            self._installed = True
+
+    def unsubscribe(self, listener, obj_key: Optional[str] = None):
+        """取消订阅, 参数须与subscribe时相同; 最后一个监听者取消后注销绑定钩子并丢弃未发送的事件"""
+        if obj_key is None:
+            self._global_listeners = [l for l in self._global_listeners if l != listener]
+        else:
+            listeners = [l for l in self._key_listeners.get(obj_key, ()) if l != listener]
+            if listeners:
+                self._key_listeners[obj_key] = listeners
+            else:
+                self._key_listeners.pop(obj_key, None)
+        if self._installed and not self._global_listeners and not self._key_listeners:
+            BaseBinding.remove_binding_hook(self)
+            self._installed = False
+            self._pending = []
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def on_bind(self, owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str):
+        if self._global_listeners or obj_key in self._key_listeners:
+            self._pending.append(BindingEvent('bind', owner, obj_key, obj, self_key))
+
+    def on_unbind(self, owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str):
+        if self._global_listeners or obj_key in self._key_listeners:
+            self._pending.append(BindingEvent('unbind', owner, obj_key, obj, self_key))
+
+    def _coalesce(self, events: list[BindingEvent]) -> list[BindingEvent]:
+        """抵消同一条边上相邻的一对相反事件, 保留其余事件的顺序"""
+        kept = [] # 被抵消的位置为None
+        last = {} # {(id(owner), obj_key, id(obj)): kept中该边最后一个事件的位置}
+        for event in events:
+            edge = (id(event.owner), event.obj_key, id(event.obj))
+            index = last.get(edge)
+            if index is not None and kept[index].kind != event.kind and kept[index].self_key == event.self_key:
+                kept[index] = None
+                del last[edge]
+                continue
+            last[edge] = len(kept)
+            kept.append(event)
+        return [event for event in kept if event is not None]
+
+    def flush(self) -> int:
+        """
+        将缓存的事件按批通知监听者, 返回本批事件数
+        监听者在处理过程中产生的新事件进入下一批
+        """
+        if not self._pending:
+            return 0
+        events, self._pending = self._pending, []
+        if self.coalesce:
+            events = self._coalesce(events)
+        if self._key_listeners:
+            by_key = {}
+            for event in events:
+                if event.obj_key in self._key_listeners:
+                    by_key.setdefault(event.obj_key, []).append(event)
+            for obj_key, key_events in by_key.items():
+                for listener in self._key_listeners.get(obj_key, ()):
+                    listener(key_events)
+        if events and self._global_listeners:
+            for listener in self._global_listeners:
+                listener(events)
+        return len(events)
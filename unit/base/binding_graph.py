@@ -0,0 +1,263 @@
+import weakref
+from collections import deque
+from typing import Optional
+
+from base_binding import BaseBinding, _unwrap
+
+
+def _edge_num(keys) -> int:
+    """邻接表中一项对应的边数"""
+    return len(keys) if type(keys) is tuple else 1
+
+
+class BindingGraph:
+    """
+    全局绑定关系图, 通过BaseBinding.add_binding_hook镜像所有bind/unbind操作
+    每个对象分配一个整数节点id, 按obj_key保存邻接关系, 支持按key查询邻居、广度优先遍历和连通分量
+    图中只保存对象的弱引用, 对象被回收后节点id会被回收复用
+    """
+    def __init__(self, install: bool = True):
+        """
+        param install: 是否立即注册为绑定钩子, 注册后创建的绑定才会被记录, 已有的绑定可以通过add_existing加入
+        """
+        self._ids = {} # {id(obj): node}
+        self._nodes = [] # node -> weakref.ref(obj), 已释放的节点为None
+        self._free = [] # 可复用的节点id
+        # node -> {obj_key: {dst_node: self_key}}, 用dict保持插入顺序
+        # 同一对象多次绑定在同一obj_key上时值为self_key的元组(与BindingList相同, 可以重复), 每个元素算作一条边
+        self._adjacency = []
+        self._incoming = [] # node -> {src_node: 入边数}, 用于释放节点时删除指向它的边
+        self._key_index = {} # {obj_key: {src_node: 出边数}}
+        self._edge_count = 0
+        if install:
+            self.install()
+
+    def install(self):
+        """注册为绑定钩子"""
+        BaseBinding.add_binding_hook(self)
+
+    def uninstall(self):
+        """注销绑定钩子, 之后的绑定变化不再记录"""
+        BaseBinding.remove_binding_hook(self)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def edge_count(self) -> int:
+        """图中有向边的数目, 一次双向绑定对应两条边"""
+        return self._edge_count
+
+    def _node(self, obj: BaseBinding) -> int:
+        """返回obj的节点id, 不存在时分配新的节点"""
+        node = self._ids.get(id(obj))
+        if node is not None:
+            return node
+        ref = weakref.ref(obj, self._release_callback(id(obj)))
+        if self._free:
+            node = self._free.pop()
+            self._nodes[node] = ref
+            self._adjacency[node] = {}
+            self._incoming[node] = {}
+        else:
+            node = len(self._nodes)
+            self._nodes.append(ref)
+            self._adjacency.append({})
+            self._incoming.append({})
+        self._ids[id(obj)] = node
+        return node
+
+    def _release_callback(self, obj_id: int):
+        graph_ref = weakref.ref(self)
+        def callback(ref):
+            graph = graph_ref()
+            if graph is not None:
+                graph._release(obj_id, ref)
+        return callback
+
+    def _release(self, obj_id: int, ref):
+        """对象被回收时删除其节点及相关的边"""
+        node = self._ids.get(obj_id)
+        if node is None or self._nodes[node] is not ref:
+            return
+        for obj_key, dsts in self._adjacency[node].items():
+            total = 0
+            for dst, keys in dsts.items():
+                count = _edge_num(keys)
+                self._drop_incoming(dst, node, count)
+                total += count
+            self._drop_key_index(obj_key, node, total)
+            self._edge_count -= total
+        for src in self._incoming[node]:
+            for obj_key, dsts in list(self._adjacency[src].items()):
+                if node in dsts:
+                    count = _edge_num(dsts.pop(node))
+                    self._edge_count -= count
+                    self._drop_key_index(obj_key, src, count)
+                    if not dsts:
+                        del self._adjacency[src][obj_key]
+        del self._ids[obj_id]
+        self._nodes[node] = None
+        self._adjacency[node] = None
+        self._incoming[node] = None
+        self._free.append(node)
+
+    def _drop_incoming(self, dst: int, src: int, count: int = 1):
+        incoming = self._incoming[dst]
+        if incoming[src] == count:
+            del incoming[src]
+        else:
+            incoming[src] -= count
+
+    def _drop_key_index(self, obj_key: str, src: int, count: int):
+        sources = self._key_index[obj_key]
+        if sources[src] == count:
+            del sources[src]
+            if not sources:
+                del self._key_index[obj_key]
+        else:
+            sources[src] -= count
+
+    def on_bind(self, owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str):
+        src = self._node(owner)
+        dst = self._node(obj)
+        dsts = self._adjacency[src].setdefault(obj_key, {})
+        keys = dsts.get(dst)
+        if keys is None:
+            dsts[dst] = self_key
+        else:
+            dsts[dst] = (keys if type(keys) is tuple else (keys,)) + (self_key,)
+        incoming = self._incoming[dst]
+        incoming[src] = incoming.get(src, 0) + 1
+        sources = self._key_index.setdefault(obj_key, {})
+        sources[src] = sources.get(src, 0) + 1
+        self._edge_count += 1
+
+    def on_unbind(self, owner: BaseBinding, obj_key: str, obj: BaseBinding, self_key: str):
+        src = self._ids.get(id(owner))
+        dst = self._ids.get(id(obj))
+        if src is None or dst is None:
+            return
+        dsts = self._adjacency[src].get(obj_key)
+        keys = None if dsts is None else dsts.get(dst)
+        if keys is None:
+            return
+        if type(keys) is tuple:
+            if self_key not in keys:
+                return
+            i = keys.index(self_key)
+            keys = keys[:i] + keys[i + 1:]
+            dsts[dst] = keys[0] if len(keys) == 1 else keys
+        elif keys != self_key:
+            return
+        else:
+            del dsts[dst]
+        if not dsts:
+            del self._adjacency[src][obj_key]
+        self._drop_incoming(dst, src)
+        self._drop_key_index(obj_key, src, 1)
+        self._edge_count -= 1
+
+    def add_existing(self, objs):
+        """将安装钩子之前就已存在的绑定加入图中, 重复加入的边会被忽略"""
+        for obj in objs:
+            obj = _unwrap(obj)
+            self._node(obj)
+            for obj_key, value in obj.bindings.items():
+                if type(value) is tuple:
+                    self.on_bind(obj, obj_key, _unwrap(value[0]), value[1])
+                elif isinstance(value, list):
+                    for o, self_key in value:
+                        self.on_bind(obj, obj_key, _unwrap(o), self_key)
+
+    def node_id(self, obj: BaseBinding) -> Optional[int]:
+        """返回obj的节点id, 不在图中时返回None"""
+        return self._ids.get(id(_unwrap(obj)))
+
+    def _object(self, node: int) -> BaseBinding:
+        return self._nodes[node]()
+
+    def neighbors(self, obj: BaseBinding, obj_key: Optional[str] = None) -> list[BaseBinding]:
+        """
+        返回obj通过obj_key绑定的对象, obj_key为None时返回所有绑定的对象(去重)
+        """
+        node = self.node_id(obj)
+        if node is None:
+            return []
+        adjacency = self._adjacency[node]
+        if obj_key is not None:
+            return [self._object(dst) for dst in adjacency.get(obj_key, ())]
+        dsts = {}
+        for key_dsts in adjacency.values():
+            dsts.update(key_dsts)
+        return [self._object(dst) for dst in dsts]
+
+    def objects_with_key(self, obj_key: str) -> list[BaseBinding]:
+        """返回所有在obj_key上存在绑定的对象"""
+        return [self._object(src) for src in self._key_index.get(obj_key, ())]
+
+    def edges(self, obj_key: str) -> list[tuple[BaseBinding, BaseBinding]]:
+        """返回obj_key上的所有边(owner, obj), 同一对象多次绑定时只返回一次"""
+        return [(self._object(src), self._object(dst))
+                for src in self._key_index.get(obj_key, ()) for dst in self._adjacency[src][obj_key]]
+
+    def _successors(self, node: int, obj_key: Optional[str]):
+        adjacency = self._adjacency[node]
+        if obj_key is not None:
+            return adjacency.get(obj_key, ())
+        return (dst for key_dsts in adjacency.values() for dst in key_dsts)
+
+    def _bfs(self, start: int, obj_key: Optional[str], visited: set) -> list[int]:
+        visited.add(start)
+        order = [start]
+        queue = deque(order)
+        while queue:
+            for dst in self._successors(queue.popleft(), obj_key):
+                if dst not in visited:
+                    visited.add(dst)
+                    order.append(dst)
+                    queue.append(dst)
+        return order
+
+    def reachable(self, obj: BaseBinding, obj_key: Optional[str] = None) -> list[BaseBinding]:
+        """
+        广度优先遍历从obj出发可达的对象(包括obj本身), 按访问顺序返回
+        param obj_key: 只沿该key的边遍历, 为None时沿所有边遍历
+        """
+        node = self.node_id(obj)
+        if node is None:
+            return [_unwrap(obj)]
+        return [self._object(n) for n in self._bfs(node, obj_key, set())]
+
+    def connected_components(self, obj_key: Optional[str] = None) -> list[list[BaseBinding]]:
+        """
+        返回图的连通分量(边视为无向), 不包括没有任何边的孤立节点
+        param obj_key: 只考虑该key的边, 为None时考虑所有边
+        """
+        # 构建无向邻接, 双向绑定时两个方向的边都已存在, 单向绑定时需要补上反向边
+        undirected = {}
+        for src, adjacency in enumerate(self._adjacency):
+            if adjacency is None:
+                continue
+            for key, dsts in adjacency.items():
+                if obj_key is not None and key != obj_key:
+                    continue
+                for dst in dsts:
+                    undirected.setdefault(src, set()).add(dst)
+                    undirected.setdefault(dst, set()).add(src)
+        visited = set()
+        components = []
+        for start in undirected:
+            if start in visited:
+                continue
+            visited.add(start)
+            component = [start]
+            queue = deque(component)
+            while queue:
+                for dst in undirected[queue.popleft()]:
+                    if dst not in visited:
+                        visited.add(dst)
+                        component.append(dst)
+                        queue.append(dst)
+            components.append([self._object(n) for n in component])
+        return components
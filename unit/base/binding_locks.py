@@ -0,0 +1,297 @@
+"""
+线程安全模式: enable_thread_safety后, BaseBinding中会修改绑定的公开方法通过BaseBinding.add_method_layer包装为加锁的版本,
+disable后注销该层, 未开启时没有额外开销; 与其他包装层(例如binding_stats)可以按任意顺序开启和关闭
+每个对象按id映射到固定数目的锁之一(条带锁), 一次操作先找出会被修改的所有对象(包括被替换的单个绑定的原绑定对象),
+按锁的编号从小到大获取对应的锁, 获取后再次确认涉及的对象没有变化, 否则释放后重试, 因此多个线程之间不会死锁
+加锁的方法内部再调用其他加锁的方法时, 只尝试获取当前线程尚未持有的锁, 不会阻塞
+BindingTransaction.commit等组合操作需要放在binding_lock中才能保证整体的原子性
+"""
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Optional
+
+from base_binding import BaseBinding, _unwrap
+
+
+class StripedLocks:
+    def __init__(self, stripe_num: int = 64):
+        """
+        param stripe_num: 锁的数目, 越多则不同线程操作不同对象时冲突越少
+        """
+        self._locks = [threading.Lock() for _ in range(stripe_num)]
+        self._local = threading.local() # 当前线程已持有的锁编号
+
+    def stripes(self, objs) -> set:
+        """返回objs对应的锁编号"""
+        n = len(self._locks)
+        # 同样大小的对象的地址间隔固定, 直接取模会集中在少数几个锁上, 先用斐波那契散列打散
+        return {(((id(_unwrap(obj)) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % n for obj in objs}
+
+    def held(self) -> Optional[set]:
+        """当前线程已持有的锁编号, 未持有时为None"""
+        return getattr(self._local, 'held', None)
+
+    def acquire(self, involved) -> tuple[bool, list]:
+        """
+        锁定involved()返回的对象, 获取锁后再次调用involved()确认没有变化, 否则释放后重试
+        当前线程已持有锁时, 按顺序阻塞获取其他锁可能死锁, 因此只尝试获取尚未持有的锁, 被其他线程占用时抛出RuntimeError
+        (例如在加锁的方法中修改了未锁定的对象)
+        返回(是否为最外层, 本次获取的锁编号), 用于release
+        """
+        locks = self._locks
+        held = self.held()
+        if held is not None:
+            missing = self.stripes(involved()) - held
+            if not missing:
+                return False, []
+            acquired = []
+            for i in sorted(missing):
+                if not locks[i].acquire(blocking=False):
+                    self._release(acquired)
+                    raise RuntimeError('binding lock error: objects outside the locked set are modified by another thread')
+                acquired.append(i)
+            held.update(acquired)
+            return False, acquired
+        while True:
+            stripes = self.stripes(involved())
+            acquired = sorted(stripes)
+            # 获取锁的过程中垃圾回收可能触发__del__, 先记录为已持有, 使__del__不会再阻塞获取当前线程已持有的锁
+            self._local.held = stripes
+            for i in acquired:
+                locks[i].acquire()
+            if self.stripes(involved()) <= stripes:
+                return True, acquired
+            self._release(acquired)
+            self._local.held = None
+
+    def release(self, outermost: bool, acquired: list):
+        """释放acquire获取的锁"""
+        # 先释放锁再更新记录, 理由同acquire
+        self._release(acquired)
+        if outermost:
+            self._local.held = None
+        elif acquired:
+            self._local.held.difference_update(acquired)
+
+    def _release(self, acquired: list):
+        locks = self._locks
+        for i in reversed(acquired):
+            locks[i].release()
+
+    @contextmanager
+    def hold(self, involved):
+        """acquire/release的上下文管理器形式"""
+        outermost, acquired = self.acquire(involved)
+        try:
+            yield
+        finally:
+            self.release(outermost, acquired)
+
+
+_locks: Optional[StripedLocks] = None
+_LAYER = 'binding_locks' # 在BaseBinding中注册的包装层
+# 持有锁时被回收、且其绑定的对象的锁被其他线程占用的对象, 由之后最外层的加锁操作在释放锁后解除其绑定
+_deferred = []
+
+
+def _slot_objs(value) -> list:
+    """返回槽位中绑定的对象"""
+    if type(value) is tuple:
+        return [value[0]]
+    if isinstance(value, list):
+        return [item[0] for item in value]
+    return []
+
+
+def _occupant(obj, obj_key) -> list:
+    """若obj.bindings[obj_key]为单个绑定, 返回其绑定的对象(绑定新对象时会被解除)"""
+    value = obj.bindings.get(obj_key) if hasattr(obj, "bindings") else None
+    return [value[0]] if type(value) is tuple else []
+
+
+def _bind_objs(self, obj, self_key=None, obj_key=None) -> list:
+    peers = obj if isinstance(obj, list) else ([] if obj is None else [obj])
+    if obj_key is None and peers:
+        obj_key = getattr(peers[0], "bindname", None)
+    if self_key is None:
+        self_key = self.bindname
+    objs = [self] + peers + _occupant(self, obj_key)
+    for peer in peers:
+        objs += _occupant(peer, self_key)
+    return objs
+
+
+def _unbind_objs(self, obj=None, obj_key=None) -> list:
+    if obj is not None:
+        return [self] + (obj if isinstance(obj, list) else [obj])
+    objs = [self]
+    for key, value in list(self.bindings.items()):
+        if obj_key is None or key == obj_key:
+            objs += _slot_objs(value)
+    return objs
+
+
+def _check_objs(self, obj=None, obj_key=None, fix=True) -> list:
+    # 修复时会为绑定的对象补上单个绑定, 可能解除其原绑定
+    objs = [self]
+    for value in list(self.bindings.values()):
+        if type(value) is tuple:
+            objs += [value[0]] + _occupant(value[0], value[1])
+        elif isinstance(value, list):
+            for peer, self_key in value:
+                objs += [peer] + _occupant(peer, self_key)
+    return objs
+
+
+def _bind_many_objs(bindings) -> list:
+    objs = []
+    for item in bindings:
+        obj, peer = item[0], item[1]
+        objs += [obj, peer]
+        if hasattr(obj, "bindname") and hasattr(peer, "bindname"):
+            self_key = item[2] if len(item) > 2 and item[2] is not None else obj.bindname
+            obj_key = item[3] if len(item) > 3 and item[3] is not None else peer.bindname
+            objs += _occupant(obj, obj_key) + _occupant(peer, self_key)
+    return objs
+
+
+def _unbind_many_objs(bindings) -> list:
+    return [obj for item in bindings for obj in item[:2]]
+
+
+def _detach_objs(objs) -> list:
+    result = list(objs)
+    for obj in objs:
+        for value in list(obj.bindings.values()):
+            result += _slot_objs(value)
+    return result
+
+
+def _drain_deferred():
+    """解除_deferred中的对象的绑定, 只在当前线程未持有锁时调用"""
+    while _deferred:
+        try:
+            obj = _deferred.pop()
+        except IndexError: # 被其他线程取走
+            break
+        obj.unbind()
+
+
+def _locked_method(involved):
+    def wrap(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            locks = _locks
+            # 已关闭时直接调用, 例如关闭前取得的方法引用
+            if locks is None:
+                return method(*args, **kwargs)
+            outermost, acquired = locks.acquire(lambda: involved(*args, **kwargs))
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                locks.release(outermost, acquired)
+            if outermost and _deferred:
+                _drain_deferred()
+            return result
+        return wrapper
+    return wrap
+
+
+def _locked_staticmethod(involved):
+    def wrap(method):
+        # 参数可能是迭代器, 先转换为列表, 使计算涉及的对象和执行操作时看到相同的内容
+        @functools.wraps(method)
+        def wrapper(items):
+            locks = _locks
+            if locks is None:
+                return method(items)
+            items = list(items)
+            outermost, acquired = locks.acquire(lambda: involved(items))
+            try:
+                result = method(items)
+            finally:
+                locks.release(outermost, acquired)
+            if outermost and _deferred:
+                _drain_deferred()
+            return result
+        return wrapper
+    return wrap
+
+
+def _locked_del(method):
+    @functools.wraps(method)
+    def wrapper(self):
+        locks = _locks
+        if locks is None or locks.held() is None:
+            # method中调用的unbind正常加锁
+            return method(self)
+        # 当前线程持有锁时垃圾回收触发了__del__: 被回收的对象已不可达, 但其绑定的对象仍可能被其他线程访问,
+        # 阻塞获取它们的锁可能死锁, 只尝试获取; 被其他线程占用时保留对象, 推迟到之后的加锁操作中解除绑定
+        try:
+            outermost, acquired = locks.acquire(lambda: _unbind_objs(self))
+        except RuntimeError:
+            _deferred.append(self)
+            return
+        try:
+            method(self)
+        finally:
+            locks.release(outermost, acquired)
+    return wrapper
+
+
+_LOCKED_METHODS = {
+    'bind': _bind_objs,
+    'unbind': _unbind_objs,
+    'check_one_way_binding': _check_objs,
+}
+_LOCKED_STATICMETHODS = {
+    'bind_many': _bind_many_objs,
+    'unbind_many': _unbind_many_objs,
+    'detach': _detach_objs,
+}
+
+
+def enable_thread_safety(stripe_num: int = 64):
+    """开启线程安全模式, 已开启时不做任何事"""
+    global _locks
+    if _locks is not None:
+        return
+    _locks = StripedLocks(stripe_num)
+    wrappers = {name: _locked_method(involved) for name, involved in _LOCKED_METHODS.items()}
+    wrappers.update({name: _locked_staticmethod(involved) for name, involved in _LOCKED_STATICMETHODS.items()})
+    wrappers['__del__'] = _locked_del
+    BaseBinding.add_method_layer(_LAYER, wrappers)
+
+
+def disable_thread_safety():
+    """关闭线程安全模式, 恢复原方法, 调用时不应有其他线程正在修改绑定"""
+    global _locks
+    if _locks is None:
+        return
+    BaseBinding.remove_method_layer(_LAYER)
+    _locks = None
+    # 推迟解除的绑定此时直接解除
+    _drain_deferred()
+
+
+def thread_safety_enabled() -> bool:
+    return _locks is not None
+
+
+@contextmanager
+def binding_lock(objs):
+    """
+    锁定一组对象, 使其中的多个操作(例如BindingTransaction.commit)对其他线程整体原子
+    objs应包含操作会修改的所有对象, with块中修改其他对象时其锁若被其他线程占用则抛出RuntimeError; 未开启线程安全模式时不做任何事
+    """
+    if _locks is None:
+        yield
+        return
+    objs = list(objs)
+    locks = _locks
+    outermost = locks.held() is None
+    with locks.hold(lambda: objs):
+        yield
+    if outermost and _deferred:
+        _drain_deferred()
@@ -0,0 +1,190 @@
+"""
+绑定关系图的二进制快照, 只保存绑定关系(不保存对象的其他属性), 格式如下, 所有整数均为小端uint32:
+    头部: magic, 版本, 节点数, 槽位数, 边数, 字符串表长度
+    字符串表: utf-8编码的json, {"keys": [...], "types": [...]}, 所有obj_key/self_key/bindname都驻留在keys中
+    节点表: 类型下标[节点数], bindname下标[节点数], 标志位[节点数]
+    槽位表(每个对象的每个obj_key为一个槽位, 按节点排列): 节点下标[槽位数], key下标[槽位数], 类型[槽位数], 边的起始下标[槽位数 + 1]
+    边表(按槽位排列): 被绑定的节点下标[边数], self_key下标[边数]
+"""
+import sys
+import json
+import mmap
+import struct
+import importlib
+import functools
+from array import array
+from typing import Optional
+
+from base_binding import BaseBinding, BindingList, _unwrap
+
+SNAPSHOT_MAGIC = b'BNDSNAP\0'
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('<8sIIIII')
+
+# 槽位类型
+_SLOT_NONE = 0
+_SLOT_SINGLE = 1
+_SLOT_LIST = 2
+
+# 节点标志位
+_FLAG_WEAK = 1
+
+assert array('I').itemsize == 4
+
+
+def _uint32_bytes(values) -> bytes:
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _type_name(cls) -> str:
+    return cls.__module__ + ':' + cls.__qualname__
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_type(name: str):
+    module, qualname = name.split(':')
+    return functools.reduce(getattr, qualname.split('.'), importlib.import_module(module))
+
+
+def dump_snapshot(objs) -> bytes:
+    """
+    将objs及其直接或间接绑定的所有对象之间的绑定关系编码为快照
+    param objs: 对象列表, 快照的前len(objs)个节点与objs一一对应, 之后为通过绑定发现的其他对象
+    """
+    nodes = [_unwrap(obj) for obj in objs]
+    node_ids = {}
+    for obj in nodes:
+        node_ids.setdefault(id(obj), len(node_ids))
+    if len(node_ids) != len(nodes):
+        raise ValueError('objs should not contain duplicate objects')
+    keys = {}
+    types = {}
+    node_type, node_bindname, node_flags = [], [], []
+    slot_node, slot_key, slot_kind, slot_start = [], [], [], [0]
+    edge_dst, edge_key = [], []
+    # nodes在遍历过程中增长, 被绑定的新对象追加到末尾
+    i = 0
+    while i < len(nodes):
+        obj = nodes[i]
+        node_type.append(types.setdefault(_type_name(type(obj)), len(types)))
+        node_bindname.append(keys.setdefault(obj.bindname, len(keys)))
+        node_flags.append(_FLAG_WEAK if obj.weak_binding else 0)
+        for obj_key, value in obj.bindings.items():
+            if value is None:
+                kind, items = _SLOT_NONE, ()
+            elif type(value) is tuple:
+                kind, items = _SLOT_SINGLE, (value,)
+            elif isinstance(value, list):
+                kind, items = _SLOT_LIST, value
+            else:
+                raise TypeError(f'dump_snapshot error: Unexpected Binding Type {type(value)}')
+            slot_node.append(i)
+            slot_key.append(keys.setdefault(obj_key, len(keys)))
+            slot_kind.append(kind)
+            for peer, self_key in items:
+                peer = _unwrap(peer)
+                node = node_ids.get(id(peer))
+                if node is None:
+                    node = node_ids[id(peer)] = len(nodes)
+                    nodes.append(peer)
+                edge_dst.append(node)
+                edge_key.append(keys.setdefault(self_key, len(keys)))
+            slot_start.append(len(edge_dst))
+        i += 1
+
+    strings = json.dumps({'keys': list(keys), 'types': list(types)}).encode('utf-8')
+    strings += b'\0' * (-len(strings) % 4)
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(nodes), len(slot_node), len(edge_dst), len(strings))
+    return b''.join([header, strings] + [_uint32_bytes(values) for values in (
+        node_type, node_bindname, node_flags, slot_node, slot_key, slot_kind, slot_start, edge_dst, edge_key)])
+
+
+def save_snapshot(objs, path: str):
+    """将dump_snapshot的结果写入文件"""
+    with open(path, 'wb') as f:
+        f.write(dump_snapshot(objs))
+
+
+def load_snapshot_bytes(data, objs: Optional[list[BaseBinding]] = None) -> list[BaseBinding]:
+    """
+    由快照重建绑定关系, 返回按节点顺序排列的对象列表
+    param data: 快照数据, 可以是bytes或mmap等支持缓冲区协议的对象
+    param objs: 已存在的对象, 按节点顺序对应快照的前len(objs)个节点, 其bindings会被替换,
+        替换前先解除其现有的所有绑定(与BaseBinding.detach相同, 其他对象中的反向绑定也被解除, 并通知绑定钩子);
+        其余节点按快照中记录的类型新建(不调用子类的__init__, 只设定BaseBinding的属性)
+    """
+    view = memoryview(data)
+    magic, version, node_count, slot_count, edge_count, strings_len = _HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError('load_snapshot error: not a binding snapshot or unsupported version')
+    offset = _HEADER.size
+    strings = json.loads(bytes(view[offset:offset + strings_len]).rstrip(b'\0').decode('utf-8'))
+    offset += strings_len
+    keys = strings['keys']
+
+    def read(count):
+        nonlocal offset
+        values = view[offset:offset + 4 * count].cast('I')
+        offset += 4 * count
+        if sys.byteorder != 'little':
+            values = array('I', values)
+            values.byteswap()
+        return values.tolist()
+
+    node_type, node_bindname, node_flags = read(node_count), read(node_count), read(node_count)
+    slot_node, slot_key, slot_kind, slot_start = read(slot_count), read(slot_count), read(slot_count), read(slot_count + 1)
+    edge_dst, edge_key = read(edge_count), read(edge_count)
+    view.release()
+
+    objs = [] if objs is None else [_unwrap(obj) for obj in objs]
+    if len(objs) > node_count:
+        raise ValueError('load_snapshot error: more objs than nodes in the snapshot')
+    types = [_resolve_type(name) for name in strings['types']]
+    nodes = objs
+    BaseBinding.detach(objs)
+    for obj in objs:
+        obj.bindings = {}
+    for node in range(len(objs), node_count):
+        obj = types[node_type[node]].__new__(types[node_type[node]])
+        BaseBinding.__init__(obj, weak_binding=bool(node_flags[node] & _FLAG_WEAK))
+        obj.bindname = keys[node_bindname[node]]
+        nodes.append(obj)
+
+    hooks = BaseBinding._binding_hooks
+    for slot in range(slot_count):
+        owner = nodes[slot_node[slot]]
+        obj_key = keys[slot_key[slot]]
+        start, end = slot_start[slot], slot_start[slot + 1]
+        if hooks:
+            for edge in range(start, end):
+                for hook in hooks:
+                    hook.on_bind(owner, obj_key, nodes[edge_dst[edge]], keys[edge_key[edge]])
+        kind = slot_kind[slot]
+        if kind == _SLOT_NONE:
+            owner.bindings[obj_key] = None
+        elif kind == _SLOT_SINGLE:
+            obj = nodes[edge_dst[start]]
+            owner.bindings[obj_key] = (owner._ref(obj, obj_key) if owner.weak_binding else obj, keys[edge_key[start]])
+        else:
+            binding_list = BindingList()
+            if owner.weak_binding:
+                binding_list.extend([(owner._ref(nodes[edge_dst[edge]], obj_key), keys[edge_key[edge]]) for edge in range(start, end)])
+            else:
+                binding_list.extend(zip([nodes[dst] for dst in edge_dst[start:end]], [keys[k] for k in edge_key[start:end]]))
+            owner.bindings[obj_key] = binding_list
+    return nodes
+
+
+def load_snapshot(path: str, objs: Optional[list[BaseBinding]] = None, use_mmap: bool = True) -> list[BaseBinding]:
+    """
+    从文件读取快照并重建绑定关系, 参数和返回值见load_snapshot_bytes
+    param use_mmap: 是否使用内存映射读取文件, 避免将整个文件复制到内存中
+    """
+    with open(path, 'rb') as f:
+        if not use_mmap:
+            return load_snapshot_bytes(f.read(), objs)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return load_snapshot_bytes(data, objs)
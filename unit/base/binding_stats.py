@@ -0,0 +1,225 @@
+"""
+绑定操作的统计: enable_instrumentation后, BaseBinding的bind/unbind/is_bound/check_one_way_binding/__del__通过
+BaseBinding.add_method_layer包装为计时的版本, disable后注销该层, 未开启时没有额外开销; 与线程安全模式可以按任意顺序开启和关闭
+只统计最外层的调用, 例如bind内部解除原绑定时调用的unbind不单独计数, 其耗时计入bind; 同样, __del__中的unbind计入__del__
+"""
+import json
+import time
+import threading
+import functools
+import weakref
+from typing import Optional
+
+from base_binding import BaseBinding, _unwrap
+
+
+class OperationStats:
+    """一种操作的调用次数和耗时, 耗时直方图按2的幂划分区间"""
+    __slots__ = ('count', 'total_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = {} # {i: 耗时在[2 ** (i - 1), 2 ** i)纳秒内的调用次数}
+
+    def record(self, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        bucket = elapsed_ns.bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q: float) -> int:
+        """返回耗时的q分位数(0 <= q <= 1)所在区间的上界(纳秒), 没有调用时为0"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** bucket, self.max_ns)
+        return self.max_ns
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ns': self.total_ns,
+            'mean_ns': self.total_ns / self.count if self.count else 0.0,
+            'max_ns': self.max_ns,
+            'p50_ns': self.percentile(0.5),
+            'p99_ns': self.percentile(0.99),
+            # json的键只能是字符串, 以区间上界表示
+            'histogram': {str(2 ** bucket): n for bucket, n in sorted(self.buckets.items())},
+        }
+
+
+class FanoutStats:
+    """一个key下当前各槽位绑定的对象数目, 单个绑定为1, 空槽位为0"""
+    __slots__ = ('slots', 'total', 'max')
+
+    def __init__(self):
+        self.slots = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, length: int):
+        self.slots += 1
+        self.total += length
+        if length > self.max:
+            self.max = length
+
+    def as_dict(self) -> dict:
+        return {
+            'slots': self.slots,
+            'mean': self.total / self.slots if self.slots else 0.0,
+            'max': self.max,
+        }
+
+
+class BindingStats:
+    """
+    统计数据, 可以随时导出或清零(例如每帧结束时调用snapshot(reset=True))
+    多个线程同时调用时由一个锁保护
+    """
+    def __init__(self):
+        # 持有锁时分配内存可能触发垃圾回收, 在同一线程中调用计时的__del__再次获取锁, 因此使用可重入锁
+        self._lock = threading.RLock()
+        self._local = threading.local() # 当前线程是否在计时的调用中
+        # 开启统计后bind过的对象{id: 弱引用}, 导出时按其当前的绑定计算扇出, 清零时保留
+        # 不使用WeakSet: 其__contains__每次都创建新的弱引用, 在bind的热路径上开销过大
+        self._objects = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.operations = {} # {操作名: OperationStats}
+
+    def record(self, name: str, elapsed_ns: int):
+        with self._lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats()
+            stats.record(elapsed_ns)
+
+    def track(self, objs):
+        """记录需要统计扇出的对象"""
+        objects = self._objects
+        for obj in objs:
+            obj = _unwrap(obj)
+            ref = objects.get(id(obj))
+            if (ref is None or ref() is not obj) and hasattr(obj, "bindings"):
+                with self._lock:
+                    objects[id(obj)] = weakref.ref(obj, functools.partial(self._forget, id(obj)))
+
+    def _forget(self, obj_id: int, ref: weakref.ref):
+        """弱引用的回调: 对象被回收时删除记录, 同一id可能已被新的对象占用"""
+        with self._lock:
+            if self._objects.get(obj_id) is ref:
+                del self._objects[obj_id]
+
+    def fanout(self) -> dict:
+        """按记录的对象当前的绑定计算各key的扇出: {obj_key: FanoutStats}, 耗时与对象和槽位的数目成正比"""
+        with self._lock:
+            objs = [ref() for ref in self._objects.values()]
+        result = {}
+        for obj in objs:
+            if obj is None:
+                continue
+            for obj_key, value in list(obj.bindings.items()):
+                stats = result.get(obj_key)
+                if stats is None:
+                    stats = result[obj_key] = FanoutStats()
+                stats.record(len(value) if isinstance(value, list) else (0 if value is None else 1))
+        return result
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        返回统计数据的字典: {'operations': {操作名: {...}}, 'fanout': {obj_key: {...}}}
+        operations为累计值, fanout为导出时的当前值
+        param reset: 导出后是否清零
+        """
+        fanout = self.fanout()
+        with self._lock:
+            result = {
+                'operations': {name: stats.as_dict() for name, stats in self.operations.items()},
+                'fanout': {obj_key: stats.as_dict() for obj_key, stats in fanout.items()},
+            }
+        if reset:
+            self.reset()
+        return result
+
+    def to_json(self, reset: bool = False, **kwargs) -> str:
+        """snapshot的json形式, kwargs传给json.dumps"""
+        return json.dumps(self.snapshot(reset), **kwargs)
+
+
+_stats: Optional[BindingStats] = None
+_LAYER = 'binding_stats' # 在BaseBinding中注册的包装层
+
+
+def _bind_objs(args, kwargs) -> list:
+    """返回bind的双方, 只有bind会增加槽位中的绑定, 因此只记录bind过的对象"""
+    obj = args[1] if len(args) > 1 else kwargs.get('obj')
+    if isinstance(obj, list):
+        return [args[0]] + obj
+    return [args[0]] if obj is None else [args[0], obj]
+
+
+def _timed_method(name):
+    perf_counter_ns = time.perf_counter_ns
+    def wrap(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stats = _stats
+            # 已关闭时直接调用, 例如关闭前取得的方法引用
+            if stats is None:
+                return method(*args, **kwargs)
+            local = stats._local
+            if getattr(local, 'active', False):
+                return method(*args, **kwargs)
+            local.active = True
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                local.active = False
+                stats.record(name, elapsed)
+                if name == 'bind':
+                    stats.track(_bind_objs(args, kwargs))
+        return wrapper
+    return wrap
+
+
+_TIMED_METHODS = ('bind', 'unbind', 'is_bound', 'check_one_way_binding', '__del__')
+
+
+def enable_instrumentation() -> BindingStats:
+    """开启统计并返回统计数据, 已开启时返回当前的统计数据"""
+    global _stats
+    if _stats is not None:
+        return _stats
+    _stats = BindingStats()
+    BaseBinding.add_method_layer(_LAYER, {name: _timed_method(name) for name in _TIMED_METHODS})
+    return _stats
+
+
+def disable_instrumentation():
+    """关闭统计, 恢复原方法"""
+    global _stats
+    if _stats is None:
+        return
+    BaseBinding.remove_method_layer(_LAYER)
+    _stats = None
+
+
+def instrumentation_enabled() -> bool:
+    return _stats is not None
+
+
+def get_stats() -> Optional[BindingStats]:
+    """当前的统计数据, 未开启时为None"""
+    return _stats
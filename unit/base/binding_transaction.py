@@ -0,0 +1,259 @@
+from typing import Optional, Union
+
+from base_binding import BaseBinding, BindingList, UnexpectedBindingType, _PROXY_TYPES, _unwrap
+
+_BIND = 0
+_UNBIND = 1
+_MISSING = object() # 槽位原本不存在
+
+
+def _slot_items(value):
+    """返回槽位中的绑定(obj, self_key)"""
+    if type(value) is tuple:
+        return (value,)
+    if isinstance(value, list):
+        return value
+    return ()
+
+
+def _slot_diff(old, new) -> tuple[list, list]:
+    """比较槽位的原值和新值, 返回(被删除的绑定, 新增的绑定), 与BindingList相同, 重复的绑定按个数比较"""
+    counts = {}
+    for obj, self_key in _slot_items(new):
+        edge = (id(_unwrap(obj)), self_key)
+        counts[edge] = counts.get(edge, 0) + 1
+    removed = []
+    for item in _slot_items(old):
+        edge = (id(_unwrap(item[0])), item[1])
+        if counts.get(edge):
+            counts[edge] -= 1
+        else:
+            removed.append(item)
+    added = []
+    for item in _slot_items(new):
+        edge = (id(_unwrap(item[0])), item[1])
+        if counts.get(edge):
+            counts[edge] -= 1
+            added.append(item)
+    return removed, added
+
+
+class BindingTransaction:
+    """
+    绑定事务, 缓存一批bind/unbind操作, 在commit时一次性应用
+    commit先对整批操作做类型检查和key的推断, 检查通过后在一次遍历中直接修改各对象的bindings, 不再逐个经过BaseBinding的方法;
+    应用过程中出错时恢复所有被修改的绑定并重新抛出异常
+    绑定钩子在整批操作应用之后按槽位通知, 只通知每个槽位在事务前后的差异(先删除后新增), 不通知中间状态
+    作为上下文管理器使用时, 正常退出时commit, with块中抛出异常时丢弃缓存的操作
+    只有通过事务的bind/unbind加入的操作属于该事务, with块中直接调用BaseBinding.bind等方法不受事务控制
+    """
+    def __init__(self):
+        self._ops = []
+
+    def __enter__(self) -> 'BindingTransaction':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+    def __len__(self):
+        return len(self._ops)
+
+    def bind(self, obj: BaseBinding, peer: Union[BaseBinding, list[BaseBinding]], self_key: Optional[str] = None, obj_key: Optional[str] = None):
+        """加入一个绑定操作, 结果与obj.bind(peer, self_key, obj_key)相同"""
+        self._ops.append((_BIND, obj, peer, self_key, obj_key))
+
+    def unbind(self, obj: BaseBinding, peer: Union[BaseBinding, list[BaseBinding]], obj_key: Optional[str] = None):
+        """加入一个解除绑定操作, 结果与obj.unbind(peer, obj_key)相同"""
+        self._ops.append((_UNBIND, obj, peer, None, obj_key))
+
+    def discard(self):
+        """丢弃缓存的操作"""
+        self._ops = []
+
+    def _validate(self):
+        """
+        检查整批操作的类型并确定key, 在self._ops中原地替换为确定了key的操作, 对象为弱引用代理时替换为对象本身
+        替换后的操作与原操作等价, 检查不通过时已替换的操作仍可再次commit
+        """
+        ops = self._ops
+        for i, (kind, obj, peer, self_key, obj_key) in enumerate(ops):
+            name = 'bind' if kind == _BIND else 'unbind'
+            if not hasattr(obj, "bindname"):
+                raise UnexpectedBindingType(f'{name} error: Unexpected Binding Type {type(obj)}')
+            if hasattr(peer, "bindname"):
+                if obj_key is None:
+                    obj_key = peer.bindname
+                if type(peer) in _PROXY_TYPES:
+                    peer = _unwrap(peer)
+            elif isinstance(peer, list) and peer:
+                proxies = False
+                for o in peer:
+                    if not hasattr(o, "bindname"):
+                        raise UnexpectedBindingType(f'{name} error: Unexpected Binding Type {type(o)}')
+                    if type(o) in _PROXY_TYPES:
+                        proxies = True
+                if obj_key is None:
+                    obj_key = peer[0].bindname
+                    for o in peer:
+                        if o.bindname != obj_key:
+                            raise UnexpectedBindingType(f'{name} error: Unexpected Binding Type {type(o)}')
+                if proxies:
+                    peer = [_unwrap(o) for o in peer]
+            else:
+                raise UnexpectedBindingType(f'{name} error: Unexpected Binding Type {type(peer)}')
+            if self_key is None:
+                self_key = obj.bindname
+            if type(obj) in _PROXY_TYPES:
+                obj = _unwrap(obj)
+            op = ops[i]
+            if obj is not op[1] or peer is not op[2] or self_key is not op[3] or obj_key is not op[4]:
+                ops[i] = (kind, obj, peer, self_key, obj_key)
+
+    def commit(self):
+        """
+        检查并应用缓存的所有操作, 出错时恢复到commit前的状态后重新抛出异常
+        检查不通过时缓存的操作保留, 可以在修正后再次commit或discard; 检查通过后缓存的操作被清空
+        钩子抛出异常时同样恢复所有绑定, 但已经发出的通知不会撤回
+        """
+        self._validate()
+        ops = self._ops
+        self._ops = []
+        # 撤销日志: 每次修改槽位前依次记录owner, obj_key, 原值(不存在该key时为_MISSING), 三项平铺在一个列表中
+        # 同一槽位可能被记录多次, 恢复时按相反的顺序进行, 最后恢复的是第一次记录的原值
+        # 每条记录不产生新的容器对象, 避免应用大批操作时频繁触发循环垃圾回收
+        log = []
+        copied = set() # 事务中新建或复制的列表的id, 列表只需在第一次修改前复制一次; 被替换的列表保留在日志中, id不会被复用
+
+        def writable_list(owner, obj_key, value) -> BindingList:
+            """返回可以修改的列表, 第一次修改bindings中原有的列表前先记录并复制"""
+            if id(value) in copied:
+                return value
+            log.extend((owner, obj_key, value))
+            value = owner.bindings[obj_key] = value.copy() if type(value) is BindingList else BindingList(value)
+            copied.add(id(value))
+            return value
+
+        def remove(owner, obj_key, obj, self_key=None) -> Optional[str]:
+            """与owner._remove_binding(obj_key, obj, self_key)相同, 返回obj访问owner的key, 不存在该绑定时返回None"""
+            bindings = owner.bindings
+            value = bindings.get(obj_key)
+            if type(value) is tuple:
+                if _unwrap(value[0]) is not obj:
+                    return None
+                log.extend((owner, obj_key, value))
+                bindings[obj_key] = None
+                return value[1]
+            if not isinstance(value, list):
+                return None
+            value = writable_list(owner, obj_key, value)
+            item = (value.get(obj, self_key) if self_key is not None else None) or value.get(obj)
+            if item is None:
+                return None
+            value.remove_binding(obj, item[1])
+            return item[1]
+
+        def unbind_peer(owner, obj_key, value):
+            """替换owner的单个绑定value前, 与owner.unbind(obj_key=obj_key)相同, 解除对方的反向绑定"""
+            if type(value) is not tuple:
+                raise UnexpectedBindingType(f'unbind error: Unexpected Binding Type {type(value)}')
+            if remove(_unwrap(value[0]), value[1], owner, obj_key) is None:
+                raise Exception('unbind error') # 不存在绑定
+
+        def bind_one(owner, obj_key, obj, self_key):
+            """与owner._bind_one(obj, self_key, obj_key)相同"""
+            bindings = owner.bindings
+            value = bindings.get(obj_key, _MISSING)
+            item = (owner._ref(obj, obj_key) if owner.weak_binding else obj, self_key)
+            if isinstance(value, list):
+                writable_list(owner, obj_key, value).append(item)
+                return
+            if value is not None and value is not _MISSING:
+                unbind_peer(owner, obj_key, value)
+            log.extend((owner, obj_key, value))
+            bindings[obj_key] = item
+
+        try:
+            for kind, obj, peers, self_key, obj_key in ops:
+                as_list = type(peers) is list
+                if kind == _BIND:
+                    if as_list:
+                        # 与one_way_bind相同, 先将所有对象加入列表, 再逐个建立反向绑定
+                        value = obj.bindings.get(obj_key, _MISSING)
+                        if obj.weak_binding:
+                            items = [(obj._ref(peer, obj_key), self_key) for peer in peers]
+                        else:
+                            items = [(peer, self_key) for peer in peers]
+                        if isinstance(value, list):
+                            writable_list(obj, obj_key, value).extend(items)
+                        else:
+                            if value is not None and value is not _MISSING:
+                                unbind_peer(obj, obj_key, value)
+                            log.extend((obj, obj_key, value))
+                            value = obj.bindings[obj_key] = BindingList(items)
+                            copied.add(id(value))
+                        item = (obj, obj_key)
+                        for peer in peers:
+                            # 反向绑定的槽位为空时直接写入, 其余情况与_bind_one相同
+                            bindings = peer.bindings
+                            value = bindings.get(self_key, _MISSING)
+                            if (value is None or value is _MISSING) and not peer.weak_binding:
+                                log.extend((peer, self_key, value))
+                                bindings[self_key] = item
+                            else:
+                                bind_one(peer, self_key, obj, obj_key)
+                    else:
+                        bind_one(obj, obj_key, peers, self_key)
+                        bind_one(peers, self_key, obj, obj_key)
+                else:
+                    # 与unbind相同, 任一方向的绑定不存在时出错
+                    if as_list and type(obj.bindings.get(obj_key)) is tuple:
+                        raise Exception('unbind error') # 试图从单个对象中解除列表中的所有对象
+                    for peer in (peers if as_list else (peers,)):
+                        peer_key = remove(obj, obj_key, peer)
+                        if peer_key is None or remove(peer, peer_key, obj, obj_key) is None:
+                            raise Exception('unbind error') # 不存在绑定
+            hooks = BaseBinding._binding_hooks
+            if hooks:
+                self._notify(hooks, log)
+        except BaseException:
+            _restore(log)
+            raise
+
+    @staticmethod
+    def _notify(hooks, log: list):
+        """按槽位向钩子通知事务前后的差异, 槽位的原值为日志中第一次记录的值"""
+        owners, keys, olds = log[0::3], log[1::3], log[2::3]
+        # 倒序构造{(id(owner), obj_key): 下标}, 较早的记录覆盖较晚的记录, 得到每个槽位第一次记录的下标
+        first = dict(zip(zip(map(id, reversed(owners)), reversed(keys)), range(len(owners) - 1, -1, -1)))
+        for i in sorted(first.values()):
+            owner, obj_key, old = owners[i], keys[i], olds[i]
+            new = owner.bindings.get(obj_key)
+            if old is None or old is _MISSING:
+                # 原来为空的槽位只有新增的绑定
+                removed, added = (), _slot_items(new)
+            else:
+                removed, added = _slot_diff(old, new)
+            weak = owner.weak_binding
+            for obj, self_key in removed:
+                obj = _unwrap(obj) if weak else obj
+                for hook in hooks:
+                    hook.on_unbind(owner, obj_key, obj, self_key)
+            for obj, self_key in added:
+                obj = _unwrap(obj) if weak else obj
+                for hook in hooks:
+                    hook.on_bind(owner, obj_key, obj, self_key)
+
+
+def _restore(log: list):
+    """按撤销日志恢复所有被修改的槽位"""
+    for i in range(len(log) - 3, -1, -3):
+        owner, obj_key, value = log[i], log[i + 1], log[i + 2]
+        if value is _MISSING:
+            owner.bindings.pop(obj_key, None)
+        else:
+            owner.bindings[obj_key] = value